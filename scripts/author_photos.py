@@ -4,6 +4,7 @@ Author Photos from Wikipedia
 =============================
 Hledá fotky autorů na Wikipedii (CS → EN) a nahrává je do Strapi.
 Zpracovává POUZE autory BEZ stávající fotky. Existující fotky nemazá.
+Fotky se k autorům přiřazují po dávkách (POST /api/books/bulk).
 
 Použití:
     py author_photos.py
@@ -17,7 +18,8 @@ import time
 import re
 import os
 
-import requests
+from mlp_http import HttpPool, StrapiClient
+from mlp_strapi import BulkWriter, describe_error, iter_rows
 
 if hasattr(sys.stdout, "reconfigure"):
     sys.stdout.reconfigure(encoding="utf-8", errors="replace")
@@ -30,53 +32,35 @@ TOKEN = os.getenv("STRAPI_TOKEN", "f336ce288b5630eaa259b8013754b07982841afcdbaa2
 
 DELAY_WIKI  = 0.4   # pauza mezi Wiki dotazy
 DELAY_STRAPI = 0.5  # pauza mezi Strapi operacemi
+PHOTO_BATCH = 20    # autorů v jednom hromadném zápisu fotek
 
-SESSION = requests.Session()
-SESSION.headers.update({"User-Agent": "eknihyzdarma.cz/1.0 (public library; contact@eknihyzdarma.cz)"})
+# Keep-alive spojení (Strapi, Wikipedia, obrázky) – jedna session na host
+POOL = HttpPool(headers={"User-Agent": "eknihyzdarma.cz/1.0 (public library; contact@eknihyzdarma.cz)"})
+_strapi = StrapiClient(STRAPI_URL, TOKEN, pool=POOL)
 
 # ── Strapi helpers ────────────────────────────────────────
 
-def strapi_headers():
-    return {"Authorization": f"Bearer {TOKEN}", "Content-Type": "application/json"}
-
-
-def get_authors_without_photo(start_page=1):
+def get_authors_without_photo():
     """Vrátí všechny autory bez fotky jako list dictů {name, documentId, slug}."""
     authors = []
-    page = start_page
-    while True:
-        r = SESSION.get(f"{STRAPI_URL}/api/authors", params={
-            "pagination[page]": page,
-            "pagination[pageSize]": 100,
+    for a in iter_rows(_strapi, "/api/authors", {
             "fields[0]": "name",
             "fields[1]": "slug",
             "populate[photo][fields][0]": "url",
-            "sort": "name:asc",
-        }, headers={"Authorization": f"Bearer {TOKEN}"}, timeout=20)
-        r.raise_for_status()
-        data = r.json()
-        batch = data.get("data", [])
-        if not batch:
-            break
-        for a in batch:
-            if not a.get("photo"):
-                authors.append({
-                    "name": a["name"],
-                    "documentId": a["documentId"],
-                    "slug": a.get("slug", ""),
-                })
-        total_pages = data.get("meta", {}).get("pagination", {}).get("pageCount", 1)
-        if page >= total_pages:
-            break
-        page += 1
-        time.sleep(0.2)
+            "sort": "name:asc"}, timeout=20):
+        if not a.get("photo"):
+            authors.append({
+                "name": a["name"],
+                "documentId": a["documentId"],
+                "slug": a.get("slug", ""),
+            })
     return authors
 
 
 def upload_image(image_bytes: bytes, filename: str, mime: str) -> int | None:
     """Nahraje obrázek do Strapi media library, vrátí numeric id."""
     try:
-        r = SESSION.post(
+        r = POOL.post(
             f"{STRAPI_URL}/api/upload",
             headers={"Authorization": f"Bearer {TOKEN}"},
             files={"files": (filename, image_bytes, mime)},
@@ -92,15 +76,9 @@ def upload_image(image_bytes: bytes, filename: str, mime: str) -> int | None:
         return None
 
 
-def set_author_photo(doc_id: str, file_id: int) -> bool:
-    """Nastaví photo pole u autora."""
-    r = SESSION.put(
-        f"{STRAPI_URL}/api/authors/{doc_id}",
-        headers=strapi_headers(),
-        json={"data": {"photo": file_id}},
-        timeout=15,
-    )
-    return r.ok
+def set_author_photo(writer: BulkWriter, doc_id: str, file_id: int, on_done) -> None:
+    """Nastaví photo pole u autora – zapíše se s dávkou, on_done(documentId, error)."""
+    writer.add({"documentId": doc_id, "photo": file_id}, on_done)
 
 
 # ── Jméno → zobrazitelná forma ─────────────────────────────
@@ -145,7 +123,7 @@ def wikipedia_thumbnail(name: str) -> tuple[str, str] | None:
 
         for lang in ("cs", "en"):
             try:
-                r = SESSION.get(
+                r = POOL.get(
                     f"https://{lang}.wikipedia.org/api/rest_v1/page/summary/{wiki_title}",
                     timeout=10,
                 )
@@ -171,7 +149,7 @@ def wikipedia_thumbnail(name: str) -> tuple[str, str] | None:
 def download_image(url: str) -> tuple[bytes, str] | None:
     """Stáhne obrázek, vrátí (bytes, mime_type) nebo None."""
     try:
-        r = SESSION.get(url, timeout=20)
+        r = POOL.get(url, timeout=20)
         if r.ok and r.headers.get("content-type", "").startswith("image/"):
             return r.content, r.headers["content-type"].split(";")[0]
     except Exception:
@@ -207,50 +185,57 @@ def main():
     skipped = 0
     errors = 0
 
-    for i, author in enumerate(authors, 1 + args.start):
-        name = author["name"]
-        doc_id = author["documentId"]
-
-        result = wikipedia_thumbnail(name)
-        if not result:
-            print(f"[{i:>4}/{total}] — {name[:50]}", flush=True)
-            skipped += 1
-            continue
-
-        thumb_url, lang = result
-        print(f"[{i:>4}/{total}] ✓ {name[:50]} | {lang}.wiki", flush=True)
+    def photo_done(name: str):
+        def on_done(doc_id, error):
+            nonlocal found, errors
+            if doc_id:
+                found += 1
+            else:
+                print(f"         ✗ set_photo selhal ({name[:40]}): {describe_error(error)}")
+                errors += 1
+        return on_done
+
+    writer = BulkWriter(_strapi, "authors", size=PHOTO_BATCH)
+    with writer:    # na konci (i po Ctrl+C) zapíše zbytek dávky
+        for i, author in enumerate(authors, 1 + args.start):
+            name = author["name"]
+            doc_id = author["documentId"]
+
+            result = wikipedia_thumbnail(name)
+            if not result:
+                print(f"[{i:>4}/{total}] — {name[:50]}", flush=True)
+                skipped += 1
+                continue
+
+            thumb_url, lang = result
+            print(f"[{i:>4}/{total}] ✓ {name[:50]} | {lang}.wiki", flush=True)
+
+            if args.dry_run:
+                found += 1
+                continue
+
+            # Stáhnout obrázek
+            img_data = download_image(thumb_url)
+            if not img_data:
+                print(f"         ✗ nelze stáhnout: {thumb_url[:60]}")
+                errors += 1
+                continue
+            img_bytes, mime = img_data
+            ext = mime.split("/")[-1].replace("jpeg", "jpg")
+            filename = f"author_{author['slug'] or doc_id}.{ext}"
+
+            # Nahrát do Strapi
+            file_id = upload_image(img_bytes, filename, mime)
+            if not file_id:
+                print(f"         ✗ upload selhal")
+                errors += 1
+                time.sleep(DELAY_STRAPI)
+                continue
+
+            # Aktualizovat autora (s dávkou)
+            set_author_photo(writer, doc_id, file_id, photo_done(name))
 
-        if args.dry_run:
-            found += 1
-            continue
-
-        # Stáhnout obrázek
-        img_data = download_image(thumb_url)
-        if not img_data:
-            print(f"         ✗ nelze stáhnout: {thumb_url[:60]}")
-            errors += 1
-            continue
-        img_bytes, mime = img_data
-        ext = mime.split("/")[-1].replace("jpeg", "jpg")
-        filename = f"author_{author['slug'] or doc_id}.{ext}"
-
-        # Nahrát do Strapi
-        file_id = upload_image(img_bytes, filename, mime)
-        if not file_id:
-            print(f"         ✗ upload selhal")
-            errors += 1
             time.sleep(DELAY_STRAPI)
-            continue
-
-        # Aktualizovat autora
-        ok = set_author_photo(doc_id, file_id)
-        if ok:
-            found += 1
-        else:
-            print(f"         ✗ set_photo selhal")
-            errors += 1
-
-        time.sleep(DELAY_STRAPI)
 
     print()
     print("=" * 60)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+MLP Bench – mikrobenchmark parsování MARC21
+===========================================
+Z knih v mlp_books.json (výstup scraperu) sestaví syntetickou OAI-PMH
+stránku ListRecords s MARC21 záznamy (včetně běžných polí, která parser
+nečte – 020, 040, 080, 260, 300, 500, …) a změří zpracování jednoho
+záznamu:
+
+    legacy  – původní extraktory, každé pole vlastním `.//datafield[@tag=...]`
+    index   – mlp_oai.parse_fields nad MarcIndex (jeden průchod poli)
+
+Obě varianty musí vrátit stejné knihy, jinak skript skončí chybou.
+Dál změří celou stránku (iterparse + parse_fields) pro každý dostupný
+XML backend (mlp_xml: lxml / etree).
+
+--check je kontrola shody backendů: stránku zpracuje harvester s každým
+backendem a knihy porovná jako JSON bajt po bajtu (skončí s kódem 1,
+pokud se liší). Stránka obsahuje i smazané záznamy a záznamy bez linků.
+
+Spuštění:
+    python3 mlp_bench.py                      # 2000 záznamů, 5 kol
+    python3 mlp_bench.py --records 10000 --rounds 3
+    python3 mlp_bench.py --input mlp_books_filtered.json
+    python3 mlp_bench.py --check              # lxml a etree dávají stejné knihy
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Callable, Optional
+from xml.sax.saxutils import escape
+
+import mlp_oai
+import mlp_xml
+from mlp_oai import FORMAT_MAP, LINK_ORDER, NS_MARC, NS_OAI, PRIORITY_FORMATS
+from mlp_types import Book
+
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+
+BOOKS_FILE = Path(__file__).parent / "mlp_books.json"
+
+
+# ──────────────────────────────────────────────
+# Syntetická OAI stránka
+# ──────────────────────────────────────────────
+
+def _datafield(tag: str, subfields: list[tuple[str, str]]) -> str:
+    return (f'<datafield tag="{tag}" ind1=" " ind2=" ">'
+            + "".join(f'<subfield code="{code}">{escape(value)}</subfield>'
+                      for code, value in subfields)
+            + "</datafield>")
+
+
+def marc_record(book: dict, i: int) -> str:
+    """MARC21 <record> pro knihu ve tvaru, v jakém ho vrací MLP."""
+    year = book.get("year") or 1900 + i % 120
+    fields = [
+        _datafield("020", [("a", f"978-80-{i:06d}-0")]),
+        _datafield("040", [("a", "ABA001"), ("b", "cze"), ("e", "rda")]),
+        _datafield("072", [("a", "821.162.3"), ("x", "Česká literatura"), ("2", "Konspekt")]),
+        _datafield("080", [("a", "821.162.3-31"), ("2", "MRF")]),
+    ]
+    if book.get("author"):
+        fields.append(_datafield("100", [("a", book["author"] + ","), ("d", "1890-1938"),
+                                         ("7", f"jk01{i:06d}"), ("4", "aut")]))
+    title = [("a", book["title"] + (" :" if i % 4 == 0 else " /"))]
+    if i % 4 == 0:
+        title.append(("b", "výbor /"))
+    title.append(("c", book.get("author") or ""))
+    fields.append(_datafield("245", title))
+    fields += [
+        _datafield("250", [("a", "1. vydání")]),
+        _datafield("260", [("a", "Praha :"), ("b", "Městská knihovna v Praze,"), ("c", str(year))]),
+        _datafield("300", [("a", "1 online zdroj")]),
+        _datafield("336", [("a", "text"), ("b", "txt"), ("2", "rdacontent")]),
+        _datafield("337", [("a", "počítač"), ("b", "c"), ("2", "rdamedia")]),
+        _datafield("500", [("a", "Elektronická kniha ve volném přístupu.")]),
+    ]
+    if book.get("description"):
+        fields.append(_datafield("520", [("a", book["description"])]))
+    for topic in book.get("topics") or ["české romány", "česká literatura"][: i % 3]:
+        fields.append(_datafield("650", [("a", topic + "."), ("7", "ph000000"), ("2", "czenas")]))
+    fields.append(_datafield("655", [("a", "elektronické knihy"), ("2", "czenas")]))
+    fields.append(_datafield("700", [("a", "Ilustrátor, Jan,"), ("4", "ill")]))
+    if book.get("coverUrl"):
+        fields.append(_datafield("856", [("u", book["coverUrl"]), ("z", "obálka")]))
+    for link in book.get("allLinks") or []:
+        fields.append(_datafield("856", [("u", link["url"]), ("z", link.get("label") or ""),
+                                         ("q", link["ext"])]))
+
+    controls = (f'<controlfield tag="001">mlp{i:07d}</controlfield>'
+                f'<controlfield tag="005">20240101120000.0</controlfield>'
+                f'<controlfield tag="008">240101s{year}    xr ||||| |||||||||||cze d</controlfield>')
+    return (f'<record xmlns="{NS_MARC}"><leader>-----nam-a22------a-4500</leader>'
+            + controls + "".join(fields) + "</record>")
+
+
+def oai_page(books: list[dict], count: int) -> bytes:
+    """
+    OAI ListRecords stránka s `count` záznamy (knihy se opakují dokola).
+    Každý 13. záznam je smazaný, každý 11. nemá stažitelné formáty.
+    """
+    records = []
+    for i in range(count):
+        book = books[i % len(books)]
+        header = (f"<identifier>oai:www.mlp.cz:{1000000 + i}</identifier>"
+                  f"<datestamp>2024-01-01T00:00:00Z</datestamp><setSpec>ebook</setSpec>")
+        if i % 13 == 12:
+            records.append(f'<record><header status="deleted">{header}</header></record>')
+            continue
+        if i % 11 == 10:
+            book = {**book, "allLinks": [lnk for lnk in book.get("allLinks") or []
+                                         if lnk["ext"] not in PRIORITY_FORMATS]}
+        records.append(f"<record><header>{header}</header>"
+                       f"<metadata>{marc_record(book, i)}</metadata></record>")
+    return (f'<?xml version="1.0" encoding="UTF-8"?><OAI-PMH xmlns="{NS_OAI}">'
+            f"<responseDate>2024-01-01T00:00:00Z</responseDate><request>bench</request>"
+            f"<ListRecords>{''.join(records)}</ListRecords></OAI-PMH>").encode("utf-8")
+
+
+# ──────────────────────────────────────────────
+# Původní extraktory (XPath pro každé pole)
+# ──────────────────────────────────────────────
+
+def legacy_get_subfield(record: ET.Element, tag: str, code: str) -> Optional[str]:
+    for field in record.findall(f".//{{{NS_MARC}}}datafield[@tag='{tag}']"):
+        sf = field.find(f"{{{NS_MARC}}}subfield[@code='{code}']")
+        if sf is not None and sf.text:
+            return sf.text.strip()
+    return None
+
+
+def legacy_get_all_subfields(record: ET.Element, tag: str, code: str) -> list[str]:
+    results = []
+    for field in record.findall(f".//{{{NS_MARC}}}datafield[@tag='{tag}']"):
+        sf = field.find(f"{{{NS_MARC}}}subfield[@code='{code}']")
+        if sf is not None and sf.text:
+            results.append(sf.text.strip())
+    return results
+
+
+def legacy_parse_856_fields(record: ET.Element) -> tuple[list[dict], Optional[str]]:
+    links = []
+    cover_url = None
+    for field in record.findall(f".//{{{NS_MARC}}}datafield[@tag='856']"):
+        url_el = field.find(f"{{{NS_MARC}}}subfield[@code='u']")
+        label_el = field.find(f"{{{NS_MARC}}}subfield[@code='z']")
+        if url_el is None or not url_el.text:
+            continue
+        url = url_el.text.strip()
+        label = label_el.text.strip() if label_el is not None and label_el.text else ""
+        if url.endswith(".jpg") or "obálka" in label.lower() or "obalka" in label.lower():
+            cover_url = url
+            continue
+        ext = url.rsplit(".", 1)[-1].lower() if "." in url else ""
+        if ext in FORMAT_MAP:
+            links.append({"url": url, "format": FORMAT_MAP[ext], "ext": ext, "label": label})
+    links.sort(key=lambda x: LINK_ORDER.index(x["ext"]) if x["ext"] in LINK_ORDER else 99)
+    return links, cover_url
+
+
+def legacy_parse_fields(record_el: ET.Element) -> Optional[dict]:
+    header = record_el.find(f"{{{NS_OAI}}}header")
+    if header is not None and header.get("status") == "deleted":
+        return None
+    marc = record_el.find(f".//{{{NS_MARC}}}record")
+    if marc is None:
+        return None
+    id_el = header.find(f"{{{NS_OAI}}}identifier") if header is not None else None
+    oai_id = id_el.text.strip() if id_el is not None else None
+
+    title_a = legacy_get_subfield(marc, "245", "a") or ""
+    title_b = legacy_get_subfield(marc, "245", "b") or ""
+    title = (title_a.rstrip("/ :") + (" " + title_b.rstrip("/ :") if title_b else "")).strip()
+    if not title:
+        return None
+    author = legacy_get_subfield(marc, "100", "a") or legacy_get_subfield(marc, "700", "a")
+    if author:
+        author = author.rstrip(",. ").strip()
+    description = legacy_get_subfield(marc, "520", "a")
+
+    year = None
+    ctrl008 = marc.find(f".//{{{NS_MARC}}}controlfield[@tag='008']")
+    if ctrl008 is not None and ctrl008.text and len(ctrl008.text) >= 11:
+        year_str = ctrl008.text[7:11].strip()
+        if year_str.isdigit():
+            year = int(year_str)
+
+    topics = [t.rstrip(".,;") for t in legacy_get_all_subfields(marc, "650", "a") if t]
+    links, cover_url = legacy_parse_856_fields(marc)
+    main_links = [lnk for lnk in links if lnk["ext"] in PRIORITY_FORMATS]
+    if not main_links:
+        return None
+    return {"mlpId": oai_id, "title": title, "author": author, "description": description,
+            "year": year, "topics": topics, "coverUrl": cover_url,
+            "links": main_links, "allLinks": links}
+
+
+# ──────────────────────────────────────────────
+# Měření
+# ──────────────────────────────────────────────
+
+def best_time(parse: Callable, records: list, rounds: int) -> float:
+    """Nejlepší čas (s) zpracování všech záznamů ze `rounds` kol."""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for record in records:
+            parse(record)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def harvest_page(page: bytes, backend: str) -> list[Book]:
+    """Knihy ze stránky tak, jak je vrací harvester (iterparse + parse_fields)."""
+    mlp_xml.use(backend)
+    harvest = mlp_oai.OAIHarvest({"verb": "ListRecords"}, parse=mlp_oai.parse_fields)
+    return list(harvest._iter_page(io.BytesIO(page)))
+
+
+def check(page: bytes) -> bool:
+    """Porovná výstup všech backendů (JSON bajt po bajtu) i s původními extraktory."""
+    root = ET.fromstring(page)
+    legacy = [b for b in map(legacy_parse_fields, root.iter(f"{{{NS_OAI}}}record")) if b]
+    expected = json.dumps(legacy, ensure_ascii=False, indent=2).encode("utf-8")
+    ok = True
+    for backend in mlp_xml.BACKENDS:
+        books = harvest_page(page, backend)
+        output = json.dumps([b.to_dict() for b in books],
+                            ensure_ascii=False, indent=2).encode("utf-8")
+        same = output == expected
+        ok = ok and same
+        print(f"  {backend:<8} {len(books):>6} knih  {len(output):>10} B  "
+              f"{'shodné ✓' if same else '✗ LIŠÍ SE'}")
+    if len(mlp_xml.BACKENDS) < 2:
+        print("  ⚠ lxml není nainstalované – ověřen jen backend etree")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mikrobenchmark parsování MARC21")
+    parser.add_argument("--input", default=str(BOOKS_FILE),
+                        help=f"JSON knih jako vzor záznamů (default: {BOOKS_FILE.name})")
+    parser.add_argument("--records", type=int, default=2000, help="Počet záznamů (default: 2000)")
+    parser.add_argument("--rounds", type=int, default=5, help="Počet kol měření (default: 5)")
+    parser.add_argument("--check", action="store_true",
+                        help="Jen ověřit, že všechny XML backendy dávají stejné knihy")
+    args = parser.parse_args()
+
+    with open(args.input, encoding="utf-8") as f:
+        books = json.load(f)
+    if not books:
+        print("  ✗ Vstup neobsahuje žádné knihy")
+        sys.exit(1)
+
+    page = oai_page(books, args.records)
+    if args.check:
+        print(f"  Kontrola XML backendů ({args.records} záznamů):")
+        if not check(page):
+            sys.exit(1)
+        return
+
+    root = ET.fromstring(page)
+    records = list(root.iter(f"{{{NS_OAI}}}record"))
+
+    legacy = [legacy_parse_fields(r) for r in records]
+    indexed = [b and b.to_dict() for b in map(mlp_oai.parse_fields, records)]
+    if legacy != indexed:
+        bad = next(i for i, (a, b) in enumerate(zip(legacy, indexed)) if a != b)
+        print(f"  ✗ Výstupy se liší u záznamu {bad}:\n    legacy: {legacy[bad]}\n    index:  {indexed[bad]}")
+        sys.exit(1)
+
+    fields = sum(1 for _ in root.iter(f"{{{NS_MARC}}}datafield")) / len(records)
+    print("=" * 60)
+    print("  MLP Bench – parsování MARC21 záznamu")
+    print("=" * 60)
+    print(f"  Vzor:      {args.input} ({len(books)} knih)")
+    print(f"  Záznamů:   {len(records)}  (~{fields:.0f} datapolí/záznam, {len(page) / 1e6:.1f} MB)")
+    print(f"  Výstupy:   shodné ✓  ({sum(1 for b in indexed if b)} knih)")
+    print(f"  Backendy:  {', '.join(mlp_xml.BACKENDS)}")
+    print()
+
+    t_legacy = best_time(legacy_parse_fields, records, args.rounds)
+    t_index = best_time(mlp_oai.parse_fields, records, args.rounds)
+    for name, t in (("legacy (XPath)", t_legacy), ("index", t_index)):
+        print(f"  {name:<16} {t * 1e6 / len(records):8.1f} µs/záznam   {t:6.3f} s celkem")
+    print(f"\n  Zrychlení:  {t_legacy / t_index:.1f}×")
+
+    # Celá stránka: parsování XML + zpracování záznamů
+    print()
+    for backend in mlp_xml.BACKENDS:
+        t = best_time(lambda _: harvest_page(page, backend), [None], args.rounds)
+        print(f"  stránka {backend:<8} {t * 1e6 / len(records):8.1f} µs/záznam   {t:6.3f} s celkem")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+MLP kategorizace
+================
+Výběr kategorie knihy podle pravidel (témata MARC 650, titul, autor).
+Tabulky pravidel jsou na konci modulu – jedna sada pro mlp_import_v2.py,
+mlp_sync.py i mlp_recategorize.py – a jednou při načtení se zkompilují:
+
+    KeywordMatcher – tabulka (klíčové slovo, hodnota) → jeden regex;
+                     vrací hodnotu pravidla s nejvyšší prioritou (pořadí
+                     v tabulce), ne toho, které je v textu nejdřív
+    Categorizer    – pick_category nad tabulkami, s LRU cache
+    CATEGORIZER    – Categorizer se sdílenými tabulkami (pick_category)
+
+Výsledek je stejný jako u původních smyček `keyword in t` přes celou
+tabulku, ale každý text se projde jedním regexem.
+
+Hodně knih má stejná témata i autora, takže Categorizer si výsledky
+pamatuje podle (témata, autor, titul). Cache jde uložit a v dalším běhu
+načíst (--category-cache); platí jen pro stejná pravidla – klíčem je
+otisk tabulek (rules_fingerprint), jakákoli úprava TOPIC_EXACT,
+TOPIC_KEYWORDS, TITLE_GENRE_KEYWORDS nebo FOREIGN_SURNAMES ji zneplatní.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Generic, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+FALLBACK_CATEGORY = "Česká literatura"
+FOREIGN_CATEGORY = "Světová literatura"
+
+# Verze algoritmu pick – je součástí otisku pravidel, takže změna logiky
+# (ne jen tabulek) zneplatní uložené cache také
+_RULES_VERSION = 1
+
+# Kolik výsledků si Categorizer pamatuje (LRU)
+CACHE_SIZE = 8192
+
+# Koncovky ruského patronyma (Michajlovič, Nikolajevna, Fjodorovna...)
+_PATRONYMIC_ENDINGS = ("ič", "evna", "ovna", "jevna")
+
+
+class KeywordMatcher(Generic[T]):
+    """
+    Hledání podřetězců z tabulky pravidel (klíčové slovo, hodnota) v pořadí
+    priority. Klíčová slova jsou malými písmeny, text převádí volající.
+    """
+
+    def __init__(self, rules: Iterable[tuple[str, T]]):
+        self.values: list[T] = []
+        priority: dict[str, int] = {}
+        for keyword, value in rules:
+            priority.setdefault(keyword, len(self.values))
+            self.values.append(value)
+        self._priority = priority
+        alternation = "|".join(re.escape(k) for k in sorted(priority, key=priority.get))
+        # Alternativy jsou seřazené podle priority, takže na dané pozici regex
+        # vrátí nejprioritnější slovo, které tam začíná. První výskyt najde
+        # _first, zbytek textu projde _overlapping (lookahead = i překryvy,
+        # např. "biografi" uvnitř "autobiografi").
+        self._first = re.compile(alternation) if priority else None
+        self._overlapping = re.compile(f"(?=({alternation}))") if priority else None
+
+    def match(self, text: str) -> Optional[T]:
+        """Hodnota nejprioritnějšího pravidla, jehož slovo je v textu, nebo None."""
+        if self._first is None:
+            return None
+        found = self._first.search(text)
+        if found is None:
+            return None
+        priority = self._priority
+        best = priority[found.group()]
+        if best:
+            for found in self._overlapping.finditer(text, found.start() + 1):
+                index = priority[found.group(1)]
+                if index < best:
+                    best = index
+                    if not best:
+                        break
+        return self.values[best]
+
+
+def rules_fingerprint(topic_exact: dict[str, str],
+                      topic_keywords: Iterable[tuple[str, str]],
+                      title_genre_keywords: Iterable[tuple[list[str], str]],
+                      foreign_surnames: set[str]) -> str:
+    """Otisk tabulek pravidel – změní se s každou úpravou kterékoli z nich."""
+    rules = [
+        _RULES_VERSION,
+        sorted(topic_exact.items()),
+        [[keyword, category] for keyword, category in topic_keywords],   # pořadí = priorita
+        [[list(keywords), genre] for keywords, genre in title_genre_keywords],
+        sorted(foreign_surnames),
+    ]
+    data = json.dumps(rules, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+class Categorizer:
+    """
+    Pravidla kategorizace zkompilovaná při vytvoření.
+    pick() je thread-safe a výsledky drží v LRU cache (`cache_size`).
+    """
+
+    def __init__(self, topic_exact: dict[str, str],
+                 topic_keywords: Iterable[tuple[str, str]],
+                 title_genre_keywords: Iterable[tuple[list[str], str]],
+                 foreign_surnames: set[str], cache_size: int = CACHE_SIZE):
+        topic_keywords = list(topic_keywords)
+        title_genre_keywords = list(title_genre_keywords)
+        self.topic_exact = topic_exact
+        self.foreign_surnames = foreign_surnames
+        self.fingerprint = rules_fingerprint(topic_exact, topic_keywords,
+                                             title_genre_keywords, foreign_surnames)
+        self.topic_matcher = KeywordMatcher(topic_keywords)
+        # Skupiny slov v titulu mají prioritu podle pořadí skupin
+        self.title_matcher = KeywordMatcher(
+            (keyword, genre) for keywords, genre in title_genre_keywords
+            for keyword in keywords)
+
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[tuple, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def genre_from_title(self, title: str) -> Optional[str]:
+        """Detekuje žánr z klíčových slov v titulu."""
+        return self.title_matcher.match(title.lower())
+
+    def is_foreign_author(self, author: Optional[str]) -> bool:
+        """Detekuje zahraničního autora."""
+        if not author:
+            return False
+        parts = author.split(",")
+        # Příjmení (část před čárkou)
+        if parts[0].lower().strip() in self.foreign_surnames:
+            return True
+        # Ruský patronym ve zbytku jména
+        if len(parts) > 1:
+            for word in parts[1].lower().split()[1:]:
+                if word.endswith(_PATRONYMIC_ENDINGS):
+                    return True
+        # Německé "von" / francouzské "de" / španělské "del/de la"
+        low = author.lower()
+        return " von " in low or " de " in low or " del " in low
+
+    def pick(self, topics: Iterable[str], author: Optional[str] = None,
+             title: Optional[str] = None) -> str:
+        """Vybere kategorii v pořadí: témata → titul → autor → fallback."""
+        key = (tuple(topics), author, title)
+        with self._lock:
+            category = self._cache.get(key)
+            if category is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return category
+
+        category = self._pick(*key)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = category
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return category
+
+    def _pick(self, topics: tuple[str, ...], author: Optional[str],
+              title: Optional[str]) -> str:
+        topics = [topic.lower() for topic in topics]
+
+        # 1. Přesná shoda v tématu
+        for topic in topics:
+            category = self.topic_exact.get(topic.strip().rstrip(".,;"))
+            if category:
+                return category
+
+        # 2. Částečná shoda v tématu
+        for topic in topics:
+            category = self.topic_matcher.match(topic)
+            if category:
+                return category
+
+        # 3. Klíčová slova v titulu
+        if title:
+            genre = self.genre_from_title(title)
+            if genre:
+                return genre
+
+        # 4. Zahraniční autor
+        if self.is_foreign_author(author):
+            return FOREIGN_CATEGORY
+
+        # 5. Fallback
+        return FALLBACK_CATEGORY
+
+    # ── Uložená cache (--category-cache) ───────────────────────────────────────
+
+    def load_cache(self, path) -> int:
+        """
+        Načte výsledky uložené minulým během. Cache jiných pravidel (jiný
+        otisk) se zahodí. Vrátí počet načtených výsledků.
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if data.get("fingerprint") != self.fingerprint:
+            print(f"  ⚠ Pravidla kategorizace se změnila – uložená cache {path} neplatí")
+            return 0
+        entries = data.get("entries") or []
+        with self._lock:
+            for topics, author, title, category in entries[-self.cache_size:]:
+                self._cache[(tuple(topics), author, title)] = category
+            return len(self._cache)
+
+    def save_cache(self, path) -> None:
+        """Atomicky uloží cache spolu s otiskem pravidel."""
+        with self._lock:
+            entries = [[list(topics), author, title, category]
+                       for (topics, author, title), category in self._cache.items()]
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "entries": entries}, f,
+                      ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+# ── Pravidla kategorizace ─────────────────────────────────────────────────────
+# Jediná sada pro všechny skripty (mlp_import_v2.py, mlp_sync.py,
+# mlp_recategorize.py) – importy i re-kategorizace tak řadí knihy stejně.
+
+# Přesná shoda (lowercase topic → název kategorie)
+TOPIC_EXACT = {
+    "česká literatura": "Česká literatura",
+    "slovenská literatura": "Slovenská literatura",
+    "světová literatura": "Světová literatura",
+    "anglická literatura": "Světová literatura",
+    "americká literatura": "Světová literatura",
+    "francouzská literatura": "Světová literatura",
+    "německá literatura": "Světová literatura",
+    "ruská literatura": "Světová literatura",
+    "polská literatura": "Světová literatura",
+    "italská literatura": "Světová literatura",
+    "španělská literatura": "Světová literatura",
+    "skandinávská literatura": "Světová literatura",
+    "maďarská literatura": "Světová literatura",
+    "japonská literatura": "Světová literatura",
+    "norská literatura": "Světová literatura",
+    "detektivní literatura": "Detektivní",
+    "detektivky": "Detektivní",
+    "kriminální literatura": "Detektivní",
+    "krimi": "Detektivní",
+    "science fiction": "Sci-fi",
+    "vědeckofantastická literatura": "Sci-fi",
+    "sci-fi": "Sci-fi",
+    "fantasy": "Fantasy",
+    "fantasy literatura": "Fantasy",
+    "horor": "Horor",
+    "horory": "Horor",
+    "hororová literatura": "Horor",
+    "thriller": "Thriller",
+    "thrillery": "Thriller",
+    "dobrodružná literatura": "Dobrodružná",
+    "romantická literatura": "Romance",
+    "romance": "Romance",
+    "milostná literatura": "Romance",
+    "historická literatura": "Historická beletrie",
+    "historická beletrie": "Historická beletrie",
+    "historický román": "Historická beletrie",
+    "literatura faktu": "Literatura faktu",
+    "populárně naučná literatura": "Literatura faktu",
+    "populárně-naučná literatura": "Literatura faktu",
+    "naučná literatura": "Literatura faktu",
+    "dětská literatura": "Dětská literatura",
+    "literatura pro děti a mládež": "Dětská literatura",
+    "pohádky": "Dětská literatura",
+    "bajky": "Dětská literatura",
+    "biografie": "Biografie",
+    "autobiografie": "Biografie",
+    "memoáry": "Biografie",
+    "paměti": "Biografie",
+    "životopis": "Biografie",
+    "cestovní literatura": "Cestování",
+    "cestopisy": "Cestování",
+    "humor": "Humor",
+    "humoristická literatura": "Humor",
+    "satira": "Humor",
+    "poezie": "Poezie",
+    "básně": "Poezie",
+    "lyrika": "Poezie",
+    "drama": "Drama",
+    "divadelní hry": "Drama",
+    "divadlo": "Drama",
+    "beletrie": "Beletrie",
+    "próza": "Beletrie",
+    "eseje": "Esejistika",
+    "esejistika": "Esejistika",
+    "publicistika": "Publicistika",
+    "filosofie": "Filosofie",
+    "filozofie": "Filosofie",
+    "psychologie": "Psychologie",
+    "erotická literatura": "Erotická literatura",
+}
+
+# Klíčová slova pro částečnou shodu v tématu
+TOPIC_KEYWORDS = [
+    ("česká lit", "Česká literatura"),
+    ("slovenská lit", "Slovenská literatura"),
+    ("světová lit", "Světová literatura"),
+    ("anglická lit", "Světová literatura"),
+    ("americká lit", "Světová literatura"),
+    ("francouzská lit", "Světová literatura"),
+    ("německá lit", "Světová literatura"),
+    ("ruská lit", "Světová literatura"),
+    ("detektiv", "Detektivní"),
+    ("kriminál", "Detektivní"),
+    ("science fiction", "Sci-fi"),
+    ("vědeckofant", "Sci-fi"),
+    ("fantasy", "Fantasy"),
+    ("horor", "Horor"),
+    ("thriller", "Thriller"),
+    ("dobrodruž", "Dobrodružná"),
+    ("romantick", "Romance"),
+    ("milostn", "Romance"),
+    ("historick", "Historická beletrie"),
+    ("populárně", "Literatura faktu"),
+    ("naučná", "Literatura faktu"),
+    ("dětská", "Dětská literatura"),
+    ("pro děti", "Dětská literatura"),
+    ("pohádky", "Dětská literatura"),
+    ("biografi", "Biografie"),
+    ("autobiografi", "Biografie"),
+    ("memoár", "Biografie"),
+    ("paměti", "Biografie"),
+    ("cestopi", "Cestování"),
+    ("cestovní", "Cestování"),
+    ("humor", "Humor"),
+    ("satir", "Humor"),
+    ("básn", "Poezie"),
+    ("poezie", "Poezie"),
+    ("lyrik", "Poezie"),
+    ("drama", "Drama"),
+    ("divadel", "Drama"),
+    ("erotick", "Erotická literatura"),
+    ("filosofi", "Filosofie"),
+    ("filozofi", "Filosofie"),
+    ("psychologi", "Psychologie"),
+]
+
+# Klíčová slova v titulu → žánr
+TITLE_GENRE_KEYWORDS = [
+    # Poezie
+    (["zpěvy", "básn", "balada", "epigramy", "haiku", "elegie", "apostrofy",
+      "sonety", "lyrik", "verše", "verš", "žalmy", "óda"], "Poezie"),
+    # Drama
+    (["komedie o", "tragédie", "zpěvohra", "fraška", "drama o", "hra o",
+      "divadeln"], "Drama"),
+    # Dětská
+    (["pohádky", "pohádka", "pohádkové", "pohádkový", "pro děti",
+      "pro mládež"], "Dětská literatura"),
+    # Dobrodružná
+    (["dobrodružství", "dobrodružný", "dobrodružná"], "Dobrodružná"),
+    # Biografie/paměti
+    (["paměti", "memoáry", "zápisky", "deník"], "Biografie"),
+    # Cestování
+    (["cesta do", "cesta kolem", "cesty do", "cesty kolem", "cestopis",
+      "expedice"], "Cestování"),
+]
+
+# Příjmení zahraničních autorů (lowercase)
+FOREIGN_SURNAMES = {
+    # Ruští
+    "dostojevskij", "tolstoj", "turgenev", "bulgakov", "čechov", "zamjatin",
+    "puškin", "gogol", "gorkij", "ostrovskij", "bunin", "jevtušenko",
+    "saltykov-ščedrin", "lermontov", "kuprin", "andrejev",
+    # Němečtí/Rakouští
+    "goethe", "schiller", "kafka", "mann", "rilke", "hesse", "brecht",
+    "schnitzler", "musil", "zweig", "werfel", "grimmelshausen",
+    "fontane", "kleist", "tieck", "löns", "storm",
+    # Francouzi
+    "hugo", "proust", "flaubert", "zola", "balzac", "molière", "voltaire",
+    "dumas", "maupassant", "rolland", "stendhal", "rostand", "jarry",
+    "chevallier", "gide", "colette", "racine", "corneille", "beaumarchais",
+    "france", "gautier", "mérimée", "nerval", "verne", "allais",
+    "barbey", "rachilde",
+    # Angličané/Irové/Velšané
+    "dickens", "hardy", "joyce", "woolf", "lawrence", "kipling",
+    "thackeray", "austen", "wilde", "swift", "shakespeare", "shelley",
+    "keats", "blake", "yeats", "synge", "browning", "meredith", "sterne",
+    "fielding", "defoe", "chaucer", "pope", "gay", "radcliffe", "maturin",
+    "lewis", "beckford", "james", "carroll", "jerome", "wharton",
+    "doyle", "chesterton", "galsworthy", "bennett", "lonsdale", "hilton",
+    "stevenson", "lear", "hazlitt", "thomas", "dylan",
+    # Američané
+    "poe", "london", "fitzgerald", "hemingway", "dreiser", "crane",
+    "melville", "lardner", "heyward", "bierce", "saki", "burns",
+    "twain", "whitman", "faulkner", "o'neill", "stein", "mitchell",
+    "cooper", "hawthorne", "james", "sinclair", "dreiser",
+    # Poláci
+    "sienkiewicz", "ossendowski", "choynowski",
+    # Norové/Skandinávci
+    "ibsen", "hamsun", "andersen", "strindberg", "heidenstam", "munthe",
+    "strindberg", "bjørnson",
+    # Italové
+    "pirandello", "goldoni", "boccaccio", "leopardi", "carducci",
+    "alfieri", "vergilius", "gozzi", "chiarelli", "goldsmith", "sheridan",
+    "della porta", "dovizi", "carletti",
+    # Španělé/Latin Amerika
+    "cervantes", "lorca", "vega", "gracián", "unamuno", "valle-inclán",
+    "camões", "ruiz", "alfieri", "calderón", "tirso",
+    # Antičtí/Latinisté
+    "homéros", "sofokles", "euripidés", "aristofanés",
+    "ovidius", "catullus", "tacitus", "caesar", "vergilius",
+    "cicero", "seneca", "boëthius", "epiktétos",
+    # Maďaři/Ostatní střední Evropa
+    # Ostatní
+    "scott", "synge",
+    "sienkiewicz", "della porta", "dovizi",
+    # Různé
+    "hearn", "alain-fournier", "unamuno",
+}
+
+
+# Tabulky zkompilované jednou při načtení
+CATEGORIZER = Categorizer(TOPIC_EXACT, TOPIC_KEYWORDS, TITLE_GENRE_KEYWORDS, FOREIGN_SURNAMES)
+
+
+def pick_category(topics: list, author: Optional[str] = None,
+                  title: Optional[str] = None) -> str:
+    """Vybere kategorii v pořadí: témata → titul → autor → fallback."""
+    return CATEGORIZER.pick(topics, author=author, title=title)
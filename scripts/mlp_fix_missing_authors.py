@@ -3,26 +3,38 @@
 MLP Fix Missing Authors
 =======================
 Projde všechny knihy ve Strapi bez autora (ale s mlpId),
-stáhne originální záznam z MLP přes OAI-PMH GetRecord,
-extrahuje autora a doplní ho do Strapi.
+najde autora v lokálním zrcadle MLP (mlp_store.sqlite), případně stáhne
+originální záznamy z MLP přes OAI-PMH, a doplní ho do Strapi.
+
+Hromadně: chybějící záznamy se stáhnou najednou (pár kusů přes GetRecord,
+víc jedním průchodem ListRecords přes sadu ebook), každý autor se ve Strapi
+hledá/zakládá jen jednou a aktualizace knih běží souběžně (--workers).
 
 Spuštění:
     python3 mlp_fix_missing_authors.py --url http://localhost:1337 --token <TOKEN>
     python3 mlp_fix_missing_authors.py --dry-run   # simulace, nic nezapisuje
+    python3 mlp_fix_missing_authors.py --no-store  # ignorovat lokální zrcadlo
+    python3 mlp_fix_missing_authors.py --workers 8 # souběžných Strapi požadavků
 """
 
 import argparse
 import os
 import re
 import sys
-import time
 import unicodedata
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Optional
 
 import requests
 
+import mlp_oai
+from mlp_http import StrapiClient
+from mlp_oai import NS_MARC, NS_OAI, OAI_PREFIX, OAI_SET, OAIHarvest
+from mlp_store import RecordStore
+from mlp_strapi import iter_rows
+
 # ── Encoding fix (Windows) ───────────────────────────────────────────────────
 if hasattr(sys.stdout, "reconfigure"):
     sys.stdout.reconfigure(encoding="utf-8", errors="replace")
@@ -30,17 +42,15 @@ if hasattr(sys.stderr, "reconfigure"):
     sys.stderr.reconfigure(encoding="utf-8", errors="replace")
 
 # ── Konfigurace ───────────────────────────────────────────────────────────────
-OAI_BASE   = "http://web2.mlp.cz/cgi/oai"
-OAI_PREFIX = "marc21"
-
 STRAPI_URL   = os.getenv("STRAPI_URL",   "http://localhost:1337")
 STRAPI_TOKEN = os.getenv("STRAPI_TOKEN", "")
 
-DELAY     = 0.5   # pauza mezi Strapi požadavky (s)
-OAI_DELAY = 1.0   # pauza mezi OAI požadavky (s)
+OAI_DELAY = 1.0   # výchozí rozestup OAI požadavků (s), limiter ho pak přizpůsobí
+WORKERS   = 4     # souběžné Strapi požadavky
 
-NS_OAI  = "http://www.openarchives.org/OAI/2.0/"
-NS_MARC = "http://www.loc.gov/MARC21/slim"
+# Do kolika chybějících záznamů stahovat po jednom (GetRecord),
+# nad tento počet se projde celá sada jedním ListRecords
+GETRECORD_MAX = 20
 
 
 # ── Pomocné funkce ────────────────────────────────────────────────────────────
@@ -61,28 +71,25 @@ def now_iso() -> str:
 
 # ── Strapi API ─────────────────────────────────────────────────────────────────
 
-def _headers() -> dict:
-    h = {"Content-Type": "application/json"}
-    if STRAPI_TOKEN:
-        h["Authorization"] = f"Bearer {STRAPI_TOKEN}"
-    return h
+# Keep-alive spojení na Strapi (po --url/--token se vytvoří znovu v main)
+_strapi = StrapiClient(STRAPI_URL, STRAPI_TOKEN)
 
 
 def strapi_get(path: str, params: dict = None) -> dict:
-    resp = requests.get(f"{STRAPI_URL}{path}", headers=_headers(), params=params, timeout=20)
+    resp = _strapi.request("GET", path, params=params, timeout=20)
     resp.raise_for_status()
     return resp.json()
 
 
 def strapi_post(path: str, data: dict) -> dict:
-    resp = requests.post(f"{STRAPI_URL}{path}", headers=_headers(), json=data, timeout=20)
+    resp = _strapi.request("POST", path, json=data, timeout=20)
     if not resp.ok:
         raise Exception(f"POST {path} → {resp.status_code}: {resp.text[:300]}")
     return resp.json()
 
 
 def strapi_put(path: str, data: dict) -> dict:
-    resp = requests.put(f"{STRAPI_URL}{path}", headers=_headers(), json=data, timeout=20)
+    resp = _strapi.request("PUT", path, json=data, timeout=20)
     if not resp.ok:
         raise Exception(f"PUT {path} → {resp.status_code}: {resp.text[:300]}")
     return resp.json()
@@ -92,41 +99,29 @@ def strapi_put(path: str, data: dict) -> dict:
 
 def load_books_without_author() -> list:
     """Vrátí seznam knih (documentId, title, mlpId) bez autora."""
-    books = []
-    page = 1
-    while True:
-        res = strapi_get("/api/books", {
-            "filters[mlpId][$notNull]": "true",
-            "filters[author][id][$null]": "true",
-            "fields[0]": "title",
-            "fields[1]": "mlpId",
-            "fields[2]": "documentId",
-            "pagination[page]": str(page),
-            "pagination[pageSize]": "100",
-            "publicationState": "preview",   # vrátí i drafty
-        })
-        data = res.get("data", [])
-        if not data:
-            break
-        books.extend(data)
-        meta = res.get("meta", {}).get("pagination", {})
-        if page >= meta.get("pageCount", 1):
-            break
-        page += 1
-    return books
+    return list(iter_rows(_strapi, "/api/books", {
+        "filters[mlpId][$notNull]": "true",
+        "filters[author][id][$null]": "true",
+        "fields[0]": "title",
+        "fields[1]": "mlpId",
+        "fields[2]": "documentId",
+        "publicationState": "preview",   # vrátí i drafty
+    }))
 
 
 # ── OAI-PMH: stáhni jeden záznam podle mlpId ──────────────────────────────────
 
-def fetch_oai_author(mlp_id: str) -> Optional[str]:
-    """Stáhne OAI GetRecord pro dané mlpId a vrátí jméno autora nebo None."""
+def fetch_oai_author(mlp_id: str, store: Optional[RecordStore] = None) -> Optional[str]:
+    """
+    Stáhne OAI GetRecord pro dané mlpId a vrátí jméno autora nebo None.
+    Stažený záznam uloží i do lokálního zrcadla.
+    """
     try:
-        resp = requests.get(OAI_BASE, params={
+        resp = mlp_oai.oai_get({
             "verb":           "GetRecord",
             "identifier":     mlp_id,
             "metadataPrefix": OAI_PREFIX,
         }, timeout=30)
-        resp.raise_for_status()
     except requests.RequestException as e:
         print(f"    ⚠ OAI chyba pro {mlp_id}: {e}", flush=True)
         return None
@@ -137,18 +132,60 @@ def fetch_oai_author(mlp_id: str) -> Optional[str]:
         print(f"    ⚠ XML parse chyba pro {mlp_id}: {e}", flush=True)
         return None
 
+    record_el = root.find(f".//{{{NS_OAI}}}record")
+    if record_el is not None and store is not None:
+        store.put_record(record_el, mlp_oai.parse_fields(record_el))
+        store.commit()
+
     marc = root.find(f".//{{{NS_MARC}}}record")
     if marc is None:
         return None
 
     # MARC pole 100 $a = primární autor, 700 $a = vedlejší
-    for tag in ("100", "700"):
-        for field in marc.findall(f".//{{{NS_MARC}}}datafield[@tag='{tag}']"):
-            sf = field.find(f"{{{NS_MARC}}}subfield[@code='a']")
-            if sf is not None and sf.text:
-                author = sf.text.strip().rstrip(",. ")
-                return author
-    return None
+    return mlp_oai.marc_author(marc)
+
+
+def fetch_oai_authors(mlp_ids: list, store: Optional[RecordStore] = None) -> dict:
+    """
+    Hromadně zjistí autory pro daná mlpId → {mlpId: autor nebo None}.
+    Pár záznamů stáhne přes GetRecord, jinak jedním průchodem ListRecords
+    přes sadu ebook (skončí, jakmile najde všechny hledané).
+    """
+    if len(mlp_ids) <= GETRECORD_MAX:
+        authors = {}
+        for mlp_id in mlp_ids:
+            authors[mlp_id] = fetch_oai_author(mlp_id, store)
+        return authors
+
+    wanted = set(mlp_ids)
+    authors = {}
+
+    def parse(record_el: ET.Element) -> Optional[tuple]:
+        if store is not None:
+            store.put_record(record_el, mlp_oai.parse_fields(record_el))
+        header = mlp_oai.record_header(record_el)
+        if header is None or header["identifier"] not in wanted:
+            return None
+        marc = record_el.find(f".//{{{NS_MARC}}}record")
+        return header["identifier"], (mlp_oai.marc_author(marc) if marc is not None else None)
+
+    def on_page(harvest: OAIHarvest) -> None:
+        if store is not None:
+            store.commit()
+        print(f"  ↺  Stránka {harvest.page} – nalezeno {len(authors)}/{len(wanted)}", flush=True)
+
+    harvest = OAIHarvest({"verb": "ListRecords", "set": OAI_SET, "metadataPrefix": OAI_PREFIX},
+                         parse=parse, on_page=on_page)
+    for mlp_id, author in harvest:
+        authors[mlp_id] = author
+        if len(authors) == len(wanted):
+            break
+    if store is not None:
+        store.commit()
+    if harvest.error:
+        code, message = harvest.error
+        print(f"  ⚠ OAI chyba [{code}]: {message}", flush=True)
+    return authors
 
 
 # ── Strapi: najdi nebo vytvoř autora ─────────────────────────────────────────
@@ -196,13 +233,18 @@ def main():
     parser.add_argument("--token",    default="", help="Strapi API token (přepíše env STRAPI_TOKEN)")
     parser.add_argument("--dry-run",  action="store_true", help="Simulace – nic nezapisuje")
     parser.add_argument("--limit",    type=int, default=0, help="Max počet knih ke zpracování (0 = vše)")
+    parser.add_argument("--no-store", action="store_true", help="Nepoužívat lokální zrcadlo MLP")
+    parser.add_argument("--workers",  type=int, default=WORKERS,
+                        help=f"Souběžných Strapi požadavků (default: {WORKERS})")
     args = parser.parse_args()
+    mlp_oai.LIMITER.reset(OAI_DELAY)
 
-    global STRAPI_URL, STRAPI_TOKEN
+    global STRAPI_URL, STRAPI_TOKEN, _strapi
     if args.url:
         STRAPI_URL = args.url
     if args.token:
         STRAPI_TOKEN = args.token
+    _strapi = StrapiClient(STRAPI_URL, STRAPI_TOKEN)
 
     run_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print("=" * 65, flush=True)
@@ -231,52 +273,64 @@ def main():
         print("=" * 65, flush=True)
         return
 
-    fixed = skipped = errors = 0
-
-    for i, book in enumerate(books, 1):
-        doc_id  = book["documentId"]
-        title   = (book.get("title") or "")[:55]
-        mlp_id  = book.get("mlpId", "")
-
-        print(f"  [{i}/{len(books)}] {title}", flush=True)
+    # 1. Autoři z lokálního zrcadla – jeden SQL dotaz místo GetRecord pro každou knihu
+    store = None if args.no_store else RecordStore()
+    mlp_ids = [b["mlpId"] for b in books if b.get("mlpId")]
+    authors = {}
+    if store is not None:
+        authors = store.authors(mlp_ids)
+        print(f"  ✓ Lokální zrcadlo zná {len(authors)}/{len(mlp_ids)} záznamů", flush=True)
+
+    # 2. Zbytek hromadně z MLP
+    missing = [mlp_id for mlp_id in mlp_ids if mlp_id not in authors]
+    if missing:
+        print(f"  Stahuji {len(missing)} záznamů z MLP...", flush=True)
+        authors.update(fetch_oai_authors(missing, store))
+    if store is not None:
+        store.close()
+
+    # 3. Každý autor jen jednou (najdi/vytvoř ve Strapi)
+    names = sorted({name for name in authors.values() if name})
+    print(f"  ✓ {len(names)} různých autorů pro {len(books)} knih\n", flush=True)
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        author_ids = dict(zip(names, pool.map(
+            lambda name: find_or_create_author(name, args.dry_run), names)))
+
+    # 4. Aktualizace knih (souběžně, nejvýš --workers najednou)
+    def fix_book(item: tuple) -> tuple:
+        i, book = item
+        doc_id = book["documentId"]
+        title  = (book.get("title") or "")[:55]
+        mlp_id = book.get("mlpId", "")
+        prefix = f"  [{i}/{len(books)}] {title}"
 
         if not mlp_id:
-            print(f"    ⏭  Bez mlpId – přeskočeno", flush=True)
-            skipped += 1
-            continue
-
-        # Stáhni autora z MLP
-        author_name = fetch_oai_author(mlp_id)
-        time.sleep(OAI_DELAY)
-
+            return "skip", f"{prefix}\n    ⏭  Bez mlpId – přeskočeno"
+        author_name = authors.get(mlp_id)
         if not author_name:
-            print(f"    ⏭  MLP autora nenašel (instrumentální dílo nebo anonymní)", flush=True)
-            skipped += 1
-            continue
-
-        print(f"    → Autor z MLP: {author_name}", flush=True)
-
-        # Najdi/vytvoř autora ve Strapi
-        author_doc_id = find_or_create_author(author_name, args.dry_run)
+            return "skip", f"{prefix}\n    ⏭  MLP autora nenašel (instrumentální dílo nebo anonymní)"
+        author_doc_id = author_ids.get(author_name)
         if not author_doc_id:
-            errors += 1
-            continue
-
+            return "error", f"{prefix}\n    ✗ Autor '{author_name}' není ve Strapi"
         if args.dry_run:
-            print(f"    [DRY] Přiřadil by autora {author_name} ke knize {doc_id}", flush=True)
-            fixed += 1
-            continue
-
-        # Aktualizuj knihu
+            return "ok", (f"{prefix}\n    [DRY] Přiřadil by autora {author_name} "
+                          f"ke knize {doc_id}")
         try:
             strapi_put(f"/api/books/{doc_id}", {"data": {"author": author_doc_id}})
-            print(f"    ✓ Autor přiřazen", flush=True)
-            fixed += 1
+            return "ok", f"{prefix}\n    ✓ Autor přiřazen: {author_name}"
         except Exception as e:
-            print(f"    ✗ Chyba při aktualizaci: {e}", flush=True)
-            errors += 1
+            return "error", f"{prefix}\n    ✗ Chyba při aktualizaci: {e}"
 
-        time.sleep(DELAY)
+    fixed = skipped = errors = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for result, message in pool.map(fix_book, enumerate(books, 1)):
+            print(message, flush=True)
+            if result == "ok":
+                fixed += 1
+            elif result == "skip":
+                skipped += 1
+            else:
+                errors += 1
 
     print(flush=True)
     print("=" * 65, flush=True)
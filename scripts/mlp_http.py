@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+MLP HTTP – sdílené spojení pro OAI a Strapi
+===========================================
+Jedna requests.Session na host (keep-alive, pool spojení, gzip), takže
+se TCP/TLS handshake platí jednou za běh, ne za každý požadavek – u malých
+JSON volání na Strapi (Render) je to většina latence.
+
+    HttpPool      – sessions podle hostu, výchozí timeout a opakování
+    StrapiClient  – Strapi REST nad HttpPool (URL + token jen jednou)
+
+Použití:
+    strapi = StrapiClient(STRAPI_URL, STRAPI_TOKEN)
+    resp = strapi.request("GET", "/api/books", params={...})
+    resp = POOL.get("https://cs.wikipedia.org/...")
+"""
+
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Velikost poolu spojení na host – musí pokrýt souběžné workery skriptů
+POOL_SIZE = 16
+
+# Výchozí timeout (připojení, čtení) v sekundách
+TIMEOUT = (5, 30)
+
+# Opakování na úrovni spojení: chyby připojení a 502/503/504 (Render při
+# probouzení). Jen idempotentní metody – POST se neopakuje (duplicity).
+RETRIES = 3
+RETRY_STATUS = (502, 503, 504)
+
+
+class HttpPool:
+    """Sessions s keep-alive podle hostu (scheme://host:port), thread-safe."""
+
+    def __init__(self, retries: int = RETRIES, pool_size: int = POOL_SIZE,
+                 timeout=TIMEOUT, headers: Optional[dict] = None):
+        self.retries = retries
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.headers = headers or {}
+        self._sessions: dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def session(self, url: str) -> requests.Session:
+        """Session pro host dané URL (vytvoří se při prvním použití)."""
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = self._sessions[key] = self._new_session()
+        return session
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.headers.update({"Accept-Encoding": "gzip, deflate",
+                                "Connection": "keep-alive"})
+        session.headers.update(self.headers)
+        retry = Retry(total=self.retries, connect=self.retries, read=0,
+                      status=self.retries if self.retries else 0,
+                      status_forcelist=RETRY_STATUS if self.retries else (),
+                      allowed_methods=frozenset({"GET", "HEAD", "PUT", "DELETE"}),
+                      backoff_factor=0.5, respect_retry_after_header=True,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                              max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session(url).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+# Sdílený pool pro Strapi a ostatní HTTP (Wikipedia, obrázky)
+POOL = HttpPool()
+
+
+class StrapiClient:
+    """Strapi REST API přes sdílený pool – hlavičky se sestaví jednou."""
+
+    def __init__(self, url: str, token: str = "", pool: HttpPool = POOL,
+                 timeout=TIMEOUT):
+        self.url = url.rstrip("/")
+        self.pool = pool
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json"}
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Požadavek na `path` (např. "/api/books"); vrací Response bez kontroly stavu."""
+        headers = self.headers
+        if "headers" in kwargs:
+            # None hlavičku odebere (např. Content-Type u multipart uploadu)
+            headers = {k: v for k, v in {**headers, **kwargs.pop("headers")}.items()
+                       if v is not None}
+        kwargs.setdefault("timeout", self.timeout)
+        return self.pool.request(method, f"{self.url}{path}", headers=headers, **kwargs)
@@ -23,7 +23,6 @@ Prerekvizity:
 """
 
 import argparse
-import json
 import os
 import re
 import sys
@@ -31,7 +30,9 @@ import time
 import unicodedata
 from typing import Optional
 
-import requests
+from mlp_http import StrapiClient
+from mlp_strapi import SlugRegistry
+from mlp_types import Book, load_books
 
 # Oprava Windows cp1250 encoding
 if hasattr(sys.stdout, "reconfigure"):
@@ -54,21 +55,18 @@ DELAY = 0.3
 # Strapi API helpers
 # ──────────────────────────────────────────────
 
-def headers() -> dict:
-    h = {"Content-Type": "application/json"}
-    if STRAPI_TOKEN:
-        h["Authorization"] = f"Bearer {STRAPI_TOKEN}"
-    return h
+# Keep-alive spojení na Strapi (po --url/--token se vytvoří znovu v main)
+_strapi = StrapiClient(STRAPI_URL, STRAPI_TOKEN)
 
 
 def strapi_get(path: str, params: dict = None) -> dict:
-    resp = requests.get(f"{STRAPI_URL}{path}", headers=headers(), params=params, timeout=15)
+    resp = _strapi.request("GET", path, params=params, timeout=15)
     resp.raise_for_status()
     return resp.json()
 
 
 def strapi_post(path: str, data: dict) -> dict:
-    resp = requests.post(f"{STRAPI_URL}{path}", headers=headers(), json=data, timeout=15)
+    resp = _strapi.request("POST", path, json=data, timeout=15)
     if not resp.ok:
         print(f"  ✗ POST {path} → {resp.status_code}: {resp.text[:200]}")
         resp.raise_for_status()
@@ -191,35 +189,22 @@ def book_exists(mlp_id: str) -> bool:
 # Slug uniqueness
 # ──────────────────────────────────────────────
 
-def make_unique_slug(base_slug: str) -> str:
-    """Zajistí unikátnost slugu přidáním sufixu pokud je potřeba."""
-    slug = base_slug
-    counter = 1
-    while True:
-        try:
-            result = strapi_get("/api/books", {
-                "filters[slug][$eq]": slug,
-                "fields[0]": "slug",
-            })
-            if not result.get("data"):
-                return slug
-        except Exception:
-            return slug
-        slug = f"{base_slug}-{counter}"
-        counter += 1
+# Obsazené slugy načtené jednou v main (mlp_strapi.SlugRegistry) –
+# unikátní sufix se přidělí lokálně, bez GET na každého kandidáta
+_slugs: Optional[SlugRegistry] = None
 
 
 # ──────────────────────────────────────────────
 # Import jedné knihy
 # ──────────────────────────────────────────────
 
-def import_book(book: dict, category_id: Optional[str], dry_run: bool) -> bool:
+def import_book(book: Book, category_id: Optional[str], dry_run: bool) -> bool:
     """
     Importuje jednu knihu do Strapi.
     Vrátí True při úspěchu.
     """
-    mlp_id = book.get("mlpId", "")
-    title = book.get("title", "").strip()
+    mlp_id = book.mlp_id or ""
+    title = book.title.strip()
 
     if not title:
         print(f"  ✗ Přeskočeno (chybí název)")
@@ -232,23 +217,23 @@ def import_book(book: dict, category_id: Optional[str], dry_run: bool) -> bool:
 
     # Autor
     author_id = None
-    if book.get("author"):
-        author_id = find_or_create_author(book["author"], dry_run)
+    if book.author:
+        author_id = find_or_create_author(book.author, dry_run)
 
     # Slug
-    base_slug = book.get("slug") or slugify(title)
-    slug = base_slug if dry_run else make_unique_slug(base_slug)
+    base_slug = book.slug or slugify(title)
+    slug = base_slug if dry_run else _slugs.allocate(base_slug)
 
     # Data pro Strapi
     data = {
         "title": title,
         "slug": slug,
-        "description": book.get("description") or "",
+        "description": book.description or "",
         "isFree": True,
         "isFeatured": False,
         "downloads": 0,
-        "externalLinks": book.get("links", []),
-        "coverExternalUrl": book.get("coverUrl"),
+        "externalLinks": book.link_dicts(),
+        "coverExternalUrl": book.cover_url,
         "mlpId": mlp_id,
     }
 
@@ -259,11 +244,11 @@ def import_book(book: dict, category_id: Optional[str], dry_run: bool) -> bool:
         data["category"] = category_id
 
     if dry_run:
-        print(f"  [DRY] {title[:60]} | autor: {book.get('author', '—')} | formáty: {[l['format'] for l in book.get('links', [])]}")
+        print(f"  [DRY] {title[:60]} | autor: {book.author or '—'} | formáty: {[l.format for l in book.links]}")
         return True
 
     try:
-        result = strapi_post("/api/books", {"data": data})
+        result = _slugs.create("/api/books", data, base_slug)
         new_id = result.get("data", {}).get("documentId", "?")
         print(f"  ✓ [{new_id}] {title[:60]}")
         return True
@@ -290,11 +275,12 @@ def main():
                         help="Strapi URL (default: http://localhost:1337)")
     args = parser.parse_args()
 
-    global STRAPI_URL, STRAPI_TOKEN
+    global STRAPI_URL, STRAPI_TOKEN, _strapi, _slugs
     if args.url:
         STRAPI_URL = args.url
     if args.token:
         STRAPI_TOKEN = args.token
+    _strapi = StrapiClient(STRAPI_URL, STRAPI_TOKEN)
 
     print("=" * 60)
     print("  MLP → Strapi Import")
@@ -314,8 +300,7 @@ def main():
 
     # Načíst vstupní soubor
     try:
-        with open(args.input, encoding="utf-8") as f:
-            books = json.load(f)
+        books = load_books(args.input)
     except FileNotFoundError:
         print(f"  ✗ Soubor '{args.input}' nenalezen. Nejdřív spusť mlp_scraper.py")
         sys.exit(1)
@@ -333,11 +318,13 @@ def main():
     if not args.dry_run:
         try:
             strapi_get("/api/books", {"pagination[pageSize]": "1"})
-            print("  ✓ Připojení ke Strapi OK\n")
+            print("  ✓ Připojení ke Strapi OK")
         except Exception as e:
             print(f"  ✗ Nelze se připojit ke Strapi: {e}")
             print("  Ujisti se, že Strapi běží a token je správný.")
             sys.exit(1)
+        _slugs = SlugRegistry(_strapi)
+        print(f"  ✓ {_slugs.load()} obsazených slugů\n")
 
     # Import knih
     success = 0
@@ -345,13 +332,13 @@ def main():
     failed = 0
 
     for i, book in enumerate(books, 1):
-        title = book.get("title", "?")[:50]
+        title = (book.title or "?")[:50]
         print(f"[{i:>3}/{len(books)}] {title}")
 
         ok = import_book(book, category_id, args.dry_run)
         if ok:
             success += 1
-        elif "existuje" in title or book_exists(book.get("mlpId", "")):
+        elif "existuje" in title or book_exists(book.mlp_id or ""):
             skipped += 1
         else:
             skipped += 1
@@ -12,11 +12,24 @@ Kategorie se určuje (v pořadí priority):
 
 Duplicita: kontroluje se přes mlpId – stávající knihy se nepřepíšou.
 Obálky: nenastavují se (web používá generovaný placeholder).
+Knihy se zakládají souběžně (--workers, mlp_pipeline.py), výpis a uložený
+postup jdou v pořadí vstupu. Knihy, autoři i kategorie se zapisují po
+dávkách (--batch) přes POST /api/books/bulk (mlp_strapi.BulkWriter).
 
 Spuštění:
     py mlp_import_v2.py --input mlp_books_all.json --url https://... --token <TOKEN>
     py mlp_import_v2.py --dry-run --input mlp_books_all.json
     py mlp_import_v2.py --start 500 ...  # pokračovat od indexu 500
+    py mlp_import_v2.py --resume ...     # navázat tam, kde přerušený běh skončil
+
+Velký import na víc procesů/strojů (každý shard svůj postup a statistiky):
+    py mlp_import_v2.py --plan --input mlp_books_all.json ...       # jednou předem
+    py mlp_import_v2.py --shard 1/4 --input mlp_books_all.json ...  # … až 4/4
+    py mlp_import_v2.py --merge-stats 4 --input mlp_books_all.json  # souhrnný report
+
+Vstup může být i JSON Lines (mlp_scraper.py --output mlp_books.jsonl[.gz]):
+čte se průběžně a --start/--resume skočí přímo na bajtový offset knihy
+(sidecar index <vstup>.idx), bez parsování předchozích záznamů.
 """
 
 import argparse
@@ -24,11 +37,18 @@ import json
 import os
 import re
 import sys
-import time
 import unicodedata
+from functools import partial
+from pathlib import Path
 from typing import Optional
 
-import requests
+from mlp_category import CATEGORIZER, pick_category
+from mlp_http import StrapiClient
+from mlp_index import BookIndex
+from mlp_pipeline import (WORKERS, BookJob, ImportPipeline, Shard, Stage, load_shard_stats,
+                          parse_shard, save_shard_stats)
+from mlp_strapi import BULK_SIZE, BulkWriter, SlugRegistry, describe_error, load_name_map
+from mlp_types import book_format, book_offsets, iter_jsonl, load_books
 
 # Windows encoding fix
 if hasattr(sys.stdout, "reconfigure"):
@@ -42,289 +62,33 @@ if hasattr(sys.stderr, "reconfigure"):
 
 STRAPI_URL = os.getenv("STRAPI_URL", "http://localhost:1337")
 STRAPI_TOKEN = os.getenv("STRAPI_TOKEN", "")
-DELAY = 0.4
-
-# ─────────────────────────────────────────────
-# KATEGORIZACE
-# ─────────────────────────────────────────────
-
-# Přesná shoda (lowercase topic → název kategorie)
-TOPIC_EXACT = {
-    "česká literatura": "Česká literatura",
-    "slovenská literatura": "Slovenská literatura",
-    "světová literatura": "Světová literatura",
-    "anglická literatura": "Světová literatura",
-    "americká literatura": "Světová literatura",
-    "francouzská literatura": "Světová literatura",
-    "německá literatura": "Světová literatura",
-    "ruská literatura": "Světová literatura",
-    "polská literatura": "Světová literatura",
-    "italská literatura": "Světová literatura",
-    "španělská literatura": "Světová literatura",
-    "skandinávská literatura": "Světová literatura",
-    "maďarská literatura": "Světová literatura",
-    "japonská literatura": "Světová literatura",
-    "norská literatura": "Světová literatura",
-    "detektivní literatura": "Detektivní",
-    "detektivky": "Detektivní",
-    "kriminální literatura": "Detektivní",
-    "krimi": "Detektivní",
-    "science fiction": "Sci-fi",
-    "vědeckofantastická literatura": "Sci-fi",
-    "sci-fi": "Sci-fi",
-    "fantasy": "Fantasy",
-    "fantasy literatura": "Fantasy",
-    "horor": "Horor",
-    "horory": "Horor",
-    "hororová literatura": "Horor",
-    "thriller": "Thriller",
-    "thrillery": "Thriller",
-    "dobrodružná literatura": "Dobrodružná",
-    "romantická literatura": "Romance",
-    "romance": "Romance",
-    "milostná literatura": "Romance",
-    "historická literatura": "Historická beletrie",
-    "historická beletrie": "Historická beletrie",
-    "historický román": "Historická beletrie",
-    "literatura faktu": "Literatura faktu",
-    "populárně naučná literatura": "Literatura faktu",
-    "populárně-naučná literatura": "Literatura faktu",
-    "naučná literatura": "Literatura faktu",
-    "dětská literatura": "Dětská literatura",
-    "literatura pro děti a mládež": "Dětská literatura",
-    "pohádky": "Dětská literatura",
-    "bajky": "Dětská literatura",
-    "biografie": "Biografie",
-    "autobiografie": "Biografie",
-    "memoáry": "Biografie",
-    "paměti": "Biografie",
-    "životopis": "Biografie",
-    "cestovní literatura": "Cestování",
-    "cestopisy": "Cestování",
-    "humor": "Humor",
-    "humoristická literatura": "Humor",
-    "satira": "Humor",
-    "poezie": "Poezie",
-    "básně": "Poezie",
-    "lyrika": "Poezie",
-    "drama": "Drama",
-    "divadelní hry": "Drama",
-    "divadlo": "Drama",
-    "beletrie": "Beletrie",
-    "próza": "Beletrie",
-    "eseje": "Esejistika",
-    "esejistika": "Esejistika",
-    "publicistika": "Publicistika",
-    "filosofie": "Filosofie",
-    "filozofie": "Filosofie",
-    "psychologie": "Psychologie",
-    "erotická literatura": "Erotická literatura",
-}
-
-# Klíčová slova pro částečnou shodu v tématu
-TOPIC_KEYWORDS = [
-    ("česká lit", "Česká literatura"),
-    ("slovenská lit", "Slovenská literatura"),
-    ("světová lit", "Světová literatura"),
-    ("anglická lit", "Světová literatura"),
-    ("americká lit", "Světová literatura"),
-    ("francouzská lit", "Světová literatura"),
-    ("německá lit", "Světová literatura"),
-    ("ruská lit", "Světová literatura"),
-    ("detektiv", "Detektivní"),
-    ("kriminál", "Detektivní"),
-    ("science fiction", "Sci-fi"),
-    ("vědeckofant", "Sci-fi"),
-    ("fantasy", "Fantasy"),
-    ("horor", "Horor"),
-    ("thriller", "Thriller"),
-    ("dobrodruž", "Dobrodružná"),
-    ("romantick", "Romance"),
-    ("milostn", "Romance"),
-    ("historick", "Historická beletrie"),
-    ("populárně", "Literatura faktu"),
-    ("naučná", "Literatura faktu"),
-    ("dětská", "Dětská literatura"),
-    ("pro děti", "Dětská literatura"),
-    ("pohádky", "Dětská literatura"),
-    ("biografi", "Biografie"),
-    ("autobiografi", "Biografie"),
-    ("memoár", "Biografie"),
-    ("paměti", "Biografie"),
-    ("cestopi", "Cestování"),
-    ("cestovní", "Cestování"),
-    ("humor", "Humor"),
-    ("satir", "Humor"),
-    ("básn", "Poezie"),
-    ("poezie", "Poezie"),
-    ("lyrik", "Poezie"),
-    ("drama", "Drama"),
-    ("divadel", "Drama"),
-    ("erotick", "Erotická literatura"),
-    ("filosofi", "Filosofie"),
-    ("filozofi", "Filosofie"),
-    ("psychologi", "Psychologie"),
-]
-
-# Klíčová slova v titulu → žánr
-TITLE_GENRE_KEYWORDS = [
-    # Poezie
-    (["zpěvy", "básn", "balada", "epigramy", "haiku", "elegie", "apostrofy",
-      "sonety", "lyrik", "verše", "verš", "žalmy", "óda"], "Poezie"),
-    # Drama
-    (["komedie o", "tragédie", "zpěvohra", "fraška", "drama o", "hra o",
-      "divadeln"], "Drama"),
-    # Dětská
-    (["pohádky", "pohádka", "pohádkové", "pohádkový", "pro děti",
-      "pro mládež"], "Dětská literatura"),
-    # Dobrodružná
-    (["dobrodružství", "dobrodružný", "dobrodružná"], "Dobrodružná"),
-    # Biografie/paměti
-    (["paměti", "memoáry", "zápisky", "deník"], "Biografie"),
-    # Cestování
-    (["cesta do", "cesta kolem", "cesty do", "cesty kolem", "cestopis",
-      "expedice"], "Cestování"),
-]
-
-# Příjmení zahraničních autorů (lowercase)
-FOREIGN_SURNAMES = {
-    # Ruští
-    "dostojevskij", "tolstoj", "turgenev", "bulgakov", "čechov", "zamjatin",
-    "puškin", "gogol", "gorkij", "ostrovskij", "bunin", "jevtušenko",
-    "saltykov-ščedrin", "lermontov", "kuprin", "andrejev",
-    # Němečtí/Rakouští
-    "goethe", "schiller", "kafka", "mann", "rilke", "hesse", "brecht",
-    "schnitzler", "musil", "zweig", "werfel", "grimmelshausen",
-    "fontane", "kleist", "tieck", "löns", "storm",
-    # Francouzi
-    "hugo", "proust", "flaubert", "zola", "balzac", "molière", "voltaire",
-    "dumas", "maupassant", "rolland", "stendhal", "rostand", "jarry",
-    "chevallier", "gide", "colette", "racine", "corneille", "beaumarchais",
-    "france", "gautier", "mérimée", "nerval", "verne", "allais",
-    "barbey", "rachilde",
-    # Angličané/Irové/Velšané
-    "dickens", "hardy", "joyce", "woolf", "lawrence", "kipling",
-    "thackeray", "austen", "wilde", "swift", "shakespeare", "shelley",
-    "keats", "blake", "yeats", "synge", "browning", "meredith", "sterne",
-    "fielding", "defoe", "chaucer", "pope", "gay", "radcliffe", "maturin",
-    "lewis", "beckford", "james", "carroll", "jerome", "wharton",
-    "doyle", "chesterton", "galsworthy", "bennett", "lonsdale", "hilton",
-    "stevenson", "lear", "hazlitt", "thomas", "dylan",
-    # Američané
-    "poe", "london", "fitzgerald", "hemingway", "dreiser", "crane",
-    "melville", "lardner", "heyward", "bierce", "saki", "burns",
-    "twain", "whitman", "faulkner", "o'neill", "stein", "mitchell",
-    "cooper", "hawthorne", "james", "sinclair", "dreiser",
-    # Poláci
-    "sienkiewicz", "ossendowski", "choynowski",
-    # Norové/Skandinávci
-    "ibsen", "hamsun", "andersen", "strindberg", "heidenstam", "munthe",
-    "strindberg", "bjørnson",
-    # Italové
-    "pirandello", "goldoni", "boccaccio", "leopardi", "carducci",
-    "alfieri", "vergilius", "gozzi", "chiarelli", "goldsmith", "sheridan",
-    "della porta", "dovizi", "carletti",
-    # Španělé/Latin Amerika
-    "cervantes", "lorca", "vega", "gracián", "unamuno", "valle-inclán",
-    "camões", "ruiz", "alfieri", "calderón", "tirso",
-    # Antičtí/Latinisté
-    "homéros", "sofokles", "euripidés", "aristofanés",
-    "ovidius", "catullus", "tacitus", "caesar", "vergilius",
-    "cicero", "seneca", "boëthius", "epiktétos",
-    # Maďaři/Ostatní střední Evropa
-    # Ostatní
-    "scott", "synge",
-    "sienkiewicz", "della porta", "dovizi",
-    # Různé
-    "hearn", "alain-fournier", "unamuno",
-}
-
-
-def detect_genre_from_title(title: str) -> Optional[str]:
-    """Detekuje žánr z klíčových slov v titulu."""
-    t = title.lower()
-    for keywords, genre in TITLE_GENRE_KEYWORDS:
-        if any(k in t for k in keywords):
-            return genre
-    return None
-
-
-def is_foreign_author(author: Optional[str]) -> bool:
-    """Detekuje zahraničního autora."""
-    if not author:
-        return False
-    parts = author.split(",")
-    # Příjmení (část před čárkou)
-    surname = parts[0].lower().strip()
-    if surname in FOREIGN_SURNAMES:
-        return True
-    # Ruský patronym (Michajlovič, Nikolajevič, Fjodorovna...)
-    if len(parts) > 1:
-        rest = parts[1].lower().strip()
-        words = rest.split()
-        for word in words[1:]:
-            if (word.endswith("ič") or word.endswith("evna") or
-                    word.endswith("ovna") or word.endswith("jevna")):
-                return True
-    # Německé "von" / francouzské "de" / španělské "del/de la"
-    low = author.lower()
-    if " von " in low or " de " in low or " del " in low:
-        return True
-    return False
-
-
-def pick_category(topics: list, author: Optional[str] = None,
-                  title: Optional[str] = None) -> str:
-    """Vybere kategorii v pořadí: témata → titul → autor → fallback."""
-
-    # 1. Přesná shoda v tématu
-    for topic in topics:
-        t = topic.lower().strip().rstrip(".,;")
-        if t in TOPIC_EXACT:
-            return TOPIC_EXACT[t]
-
-    # 2. Částečná shoda v tématu
-    for topic in topics:
-        t = topic.lower()
-        for keyword, category in TOPIC_KEYWORDS:
-            if keyword in t:
-                return category
-
-    # 3. Klíčová slova v titulu
-    if title:
-        genre = detect_genre_from_title(title)
-        if genre:
-            return genre
-
-    # 4. Zahraniční autor
-    if is_foreign_author(author):
-        return "Světová literatura"
-
-    # 5. Fallback
-    return "Česká literatura"
 
+# Postup importu vedle vstupu (<vstup>.progress.json) – pro --resume
+PROGRESS_SUFFIX = ".progress.json"
 
 # ─────────────────────────────────────────────
 # Strapi API helpers
 # ─────────────────────────────────────────────
 
-def headers() -> dict:
-    h = {"Content-Type": "application/json"}
-    if STRAPI_TOKEN:
-        h["Authorization"] = f"Bearer {STRAPI_TOKEN}"
-    return h
+# Keep-alive spojení na Strapi (po --url/--token se vytvoří znovu v main)
+_strapi = StrapiClient(STRAPI_URL, STRAPI_TOKEN)
+
+# Obsazené slugy načtené jednou v main (mlp_strapi.SlugRegistry) –
+# unikátní sufix se přidělí lokálně, bez GET na každého kandidáta
+_slugs: Optional[SlugRegistry] = None
+
+# Hromadný zápis knih (po --batch v jednom POST /api/books/bulk)
+_bulk: Optional[BulkWriter] = None
 
 
 def strapi_get(path: str, params: dict = None) -> dict:
-    resp = requests.get(f"{STRAPI_URL}{path}", headers=headers(),
-                        params=params, timeout=20)
+    resp = _strapi.request("GET", path, params=params, timeout=20)
     resp.raise_for_status()
     return resp.json()
 
 
 def strapi_post(path: str, data: dict) -> dict:
-    resp = requests.post(f"{STRAPI_URL}{path}", headers=headers(),
-                         json=data, timeout=20)
+    resp = _strapi.request("POST", path, json=data, timeout=20)
     if not resp.ok:
         raise Exception(f"POST {path} → {resp.status_code}: {resp.text[:300]}")
     return resp.json()
@@ -347,55 +111,95 @@ def slugify(text: str) -> str:
 _author_cache: dict = {}
 _category_cache: dict = {}
 _existing_mlp_ids: set = set()
+# Po preload_names() jsou v cache všichni autoři a kategorie – co v ní
+# není, je nové a rovnou se zakládá (bez hledání podle jména)
+_names_preloaded = False
+# --shard i/N: tento proces importuje jen svou část vstupu
+_shard: Optional[Shard] = None
 
 
 def load_existing_mlp_ids() -> set:
-    """Načte mlpId všech existujících knih ze Strapi (pro rychlý duplicate check)."""
+    """
+    mlpId všech existujících knih ve Strapi (pro rychlý duplicate check) –
+    z lokálního indexu (mlp_index.py), ze Strapi se stahují jen změny od minula.
+    """
     print("  Načítám existující mlpId ze Strapi...")
     ids = set()
-    page = 1
-    while True:
-        try:
-            res = strapi_get("/api/books", {
-                "fields[0]": "mlpId",
-                "filters[mlpId][$notNull]": "true",
-                "pagination[page]": str(page),
-                "pagination[pageSize]": "200",
-            })
-            data = res.get("data", [])
-            if not data:
-                break
-            for book in data:
-                mid = book.get("mlpId")
-                if mid:
-                    ids.add(mid)
-            total_pages = res.get("meta", {}).get("pagination", {}).get("pageCount", 1)
-            if page >= total_pages:
-                break
-            page += 1
-        except Exception as e:
-            print(f"  ⚠ Chyba při načítání: {e}")
-            break
-    print(f"  ✓ {len(ids)} existujících mlpId načteno\n")
+    try:
+        with BookIndex() as index:
+            fetched = index.refresh(_strapi)
+            ids = index.mlp_ids()
+        print(f"  ✓ {len(ids)} existujících mlpId načteno (z indexu, staženo {fetched})\n")
+    except Exception as e:
+        print(f"  ⚠ Chyba při načítání: {e}\n")
     return ids
 
 
+def preload_names() -> None:
+    """Načte všechny autory a kategorie (jméno → documentId) stránkami jen s polem name."""
+    global _names_preloaded
+    _author_cache.update(load_name_map(_strapi, "/api/authors"))
+    _category_cache.update(load_name_map(_strapi, "/api/categories"))
+    _names_preloaded = True
+    print(f"  ✓ {len(_author_cache)} autorů, {len(_category_cache)} kategorií načteno")
+
+
+def missing_names(books) -> tuple[set, set]:
+    """Autoři a kategorie knih, které ještě nejsou ve Strapi, chybějící v cache."""
+    authors, categories = set(), set()
+    for book, _ in books:
+        title = book.title.strip()
+        if not title or book.mlp_id in _existing_mlp_ids:
+            continue
+        if book.author:
+            authors.add(book.author)
+        categories.add(pick_category(book.topics, author=book.author, title=title))
+    return authors - _author_cache.keys(), categories - _category_cache.keys()
+
+
+def create_names(authors: set, categories: set, batch: int = BULK_SIZE) -> None:
+    """
+    Založí chybějící autory a kategorie ještě před importem knih, které
+    na ně odkazují – každé jméno jednou, po dávkách `batch` jmen.
+    """
+    for collection, cache, names, label in (("authors", _author_cache, authors, "autorů"),
+                                            ("categories", _category_cache, categories,
+                                             "kategorií")):
+        if not names:
+            continue
+        print(f"  Zakládám {len(names)} nových {label}...")
+        names = sorted(names)
+        writer = BulkWriter(_strapi, collection, size=batch)
+        results = writer.write([{"name": name, "slug": slugify(name)} for name in names])
+        created = 0
+        for name, (doc_id, error) in zip(names, results):
+            if doc_id:
+                cache[name] = doc_id
+                created += 1
+            else:
+                print(f"    ✗ Nelze vytvořit '{name}': {describe_error(error)}")
+        print(f"  ✓ Založeno {created}/{len(names)} {label}")
+    if authors or categories:
+        print()
+
+
 def find_or_create_author(name: str, dry_run: bool = False) -> Optional[str]:
     if name in _author_cache:
         return _author_cache[name]
     if dry_run:
         _author_cache[name] = f"dry-{slugify(name)}"
         return _author_cache[name]
-    try:
-        result = strapi_get("/api/authors",
-                            {"filters[name][$eq]": name, "fields[0]": "name"})
-        if result.get("data"):
-            doc_id = result["data"][0]["documentId"]
-            _author_cache[name] = doc_id
-            return doc_id
-    except Exception as e:
-        print(f"    ⚠ Hledání autora '{name}': {e}")
-        return None
+    if not _names_preloaded:
+        try:
+            result = strapi_get("/api/authors",
+                                {"filters[name][$eq]": name, "fields[0]": "name"})
+            if result.get("data"):
+                doc_id = result["data"][0]["documentId"]
+                _author_cache[name] = doc_id
+                return doc_id
+        except Exception as e:
+            print(f"    ⚠ Hledání autora '{name}': {e}")
+            return None
     try:
         result = strapi_post("/api/authors",
                              {"data": {"name": name, "slug": slugify(name)}})
@@ -416,15 +220,16 @@ def find_or_create_category(name: str, dry_run: bool = False) -> Optional[str]:
     if dry_run:
         _category_cache[name] = f"dry-cat-{slugify(name)}"
         return _category_cache[name]
-    try:
-        result = strapi_get("/api/categories",
-                            {"filters[name][$eq]": name, "fields[0]": "name"})
-        if result.get("data"):
-            doc_id = result["data"][0]["documentId"]
-            _category_cache[name] = doc_id
-            return doc_id
-    except Exception:
-        pass
+    if not _names_preloaded:
+        try:
+            result = strapi_get("/api/categories",
+                                {"filters[name][$eq]": name, "fields[0]": "name"})
+            if result.get("data"):
+                doc_id = result["data"][0]["documentId"]
+                _category_cache[name] = doc_id
+                return doc_id
+        except Exception:
+            pass
     try:
         result = strapi_post("/api/categories",
                              {"data": {"name": name, "slug": slugify(name)}})
@@ -437,76 +242,181 @@ def find_or_create_category(name: str, dry_run: bool = False) -> Optional[str]:
         return None
 
 
-def make_unique_slug(base_slug: str) -> str:
-    slug = base_slug
-    counter = 1
-    while True:
-        try:
-            result = strapi_get("/api/books", {
-                "filters[slug][$eq]": slug,
-                "fields[0]": "slug",
-            })
-            if not result.get("data"):
-                return slug
-        except Exception:
-            return slug
-        slug = f"{base_slug}-{counter}"
-        counter += 1
+# Import jedné knihy je rozdělený do fází pipeline (mlp_pipeline.py):
+# příprava → autor → kategorie → slug → POST. Každá fáze vrátí None
+# (pokračovat) nebo výsledek 'ok' | 'skip' | 'error'.
 
-
-def import_book(book: dict, dry_run: bool) -> str:
-    """Vrátí: 'ok' | 'skip' | 'error'"""
-    mlp_id = book.get("mlpId", "")
-    title = book.get("title", "").strip()
+def prepare_book(job: BookJob, dry_run: bool) -> Optional[str]:
+    book = job.book
+    mlp_id = book.mlp_id or ""
+    title = book.title.strip()
     if not title:
         return "error"
 
-    # Duplicita check
-    if not dry_run and mlp_id and mlp_id in _existing_mlp_ids:
-        return "skip"
+    # Duplicita check – mlpId se zabere hned, aby stejnou knihu ze vstupu
+    # nezaložily dva souběžné POSTy (při chybě ho create_book / release_book uvolní)
+    if not dry_run and mlp_id:
+        if mlp_id in _existing_mlp_ids:
+            return "skip"
+        _existing_mlp_ids.add(mlp_id)
+        job.claimed = True
+
+    job.category = pick_category(book.topics, author=book.author, title=title)
+    return None
+
 
-    author_name = book.get("author")
-    topics = book.get("topics", [])
-    category_name = pick_category(topics, author=author_name, title=title)
+def resolve_author(job: BookJob, dry_run: bool) -> None:
+    if job.book.author:
+        job.author_id = find_or_create_author(job.book.author, dry_run)
 
-    author_id = None
-    if author_name:
-        author_id = find_or_create_author(author_name, dry_run)
 
-    category_id = find_or_create_category(category_name, dry_run)
+def resolve_category(job: BookJob, dry_run: bool) -> None:
+    job.category_id = find_or_create_category(job.category, dry_run)
 
-    base_slug = book.get("slug") or slugify(title)
-    slug = base_slug if dry_run else make_unique_slug(base_slug)
+
+def allocate_slug(job: BookJob, dry_run: bool) -> None:
+    book = job.book
+    title = book.title.strip()
+    job.base_slug = book.slug or slugify(title)
+    slug = job.base_slug if dry_run else _slugs.allocate(job.base_slug)
 
     data = {
         "title": title,
         "slug": slug,
-        "description": book.get("description") or "",
+        "description": book.description or "",
         "isFree": True,
         "isFeatured": False,
         "downloads": 0,
-        "externalLinks": book.get("links", []),
+        "externalLinks": book.link_dicts(),
         "coverExternalUrl": None,
-        "mlpId": mlp_id,
+        "mlpId": book.mlp_id or "",
     }
-    if author_id:
-        data["author"] = author_id
-    if category_id:
-        data["category"] = category_id
+    if job.author_id:
+        data["author"] = job.author_id
+    if job.category_id:
+        data["category"] = job.category_id
+    job.data = data
+
 
+def create_book(job: BookJob, dry_run: bool) -> str:
+    title = job.data["title"]
     if dry_run:
-        print(f"  [DRY] {title[:50]:<50} | {category_name}")
+        job.message = f"  [DRY] {title[:50]:<50} | {job.category}"
         return "ok"
 
     try:
-        strapi_post("/api/books", {"data": data})
-        _existing_mlp_ids.add(mlp_id)
+        _slugs.create("/api/books", job.data, job.base_slug)
         return "ok"
     except Exception as e:
-        print(f"  ✗ {title[:40]}: {e}")
+        _existing_mlp_ids.discard(job.book.mlp_id)
+        job.message = f"  ✗ {title[:40]}: {e}"
         return "error"
 
 
+def create_books(jobs: list[BookJob], dry_run: bool) -> list[str]:
+    """Dávka knih jedním hromadným zápisem; chyba se hlásí u každé knihy zvlášť."""
+    if dry_run:
+        return [create_book(job, dry_run) for job in jobs]
+
+    results = _slugs.create_many(_bulk, [(job.data, job.base_slug) for job in jobs])
+    outcome = []
+    for job, (doc_id, error) in zip(jobs, results):
+        if doc_id:
+            outcome.append("ok")
+            continue
+        _existing_mlp_ids.discard(job.book.mlp_id)
+        job.message = f"  ✗ {job.data['title'][:40]}: {describe_error(error)}"
+        outcome.append("error")
+    return outcome
+
+
+def release_book(job: BookJob, dry_run: bool) -> None:
+    """Fáze vyhodila výjimku – uvolnit mlpId z přípravy a přidělený slug."""
+    if job.claimed:
+        _existing_mlp_ids.discard(job.book.mlp_id)
+        job.claimed = False
+    if job.data and not dry_run:
+        _slugs.release(job.data["slug"])
+
+
+def book_stages(dry_run: bool, workers: int = WORKERS, batch: int = BULK_SIZE) -> list[Stage]:
+    """Fáze importu; autory a kategorie řeší jeden worker (bez duplicit)."""
+    if batch > 1:
+        post = Stage("POST", partial(create_books, dry_run=dry_run), workers=workers, batch=batch)
+    else:
+        post = Stage("POST", partial(create_book, dry_run=dry_run), workers=workers)
+    return [
+        Stage("příprava", partial(prepare_book, dry_run=dry_run), blocking=False),
+        Stage("autor", partial(resolve_author, dry_run=dry_run)),
+        Stage("kategorie", partial(resolve_category, dry_run=dry_run)),
+        Stage("slug", partial(allocate_slug, dry_run=dry_run), blocking=False),
+        post,
+    ]
+
+
+def print_report(ok: int, skip: int, err: int, category_stats: dict) -> None:
+    print()
+    print("=" * 70)
+    print(f"  ✓ Importováno: {ok}")
+    print(f"  ⏭ Přeskočeno:  {skip}")
+    print(f"  ✗ Chyby:       {err}")
+    print()
+    print("  Rozdělení do kategorií:")
+    for cat, count in sorted(category_stats.items(), key=lambda x: -x[1]):
+        bar = "█" * (count * 30 // max(category_stats.values()))
+        print(f"    {cat:<35} {count:>5}  {bar}")
+
+
+def print_merged_stats(input_path: str, count: int) -> None:
+    """Souhrnný report shardů 1/N … N/N (--merge-stats N)."""
+    total, parts, missing = load_shard_stats(input_path, count)
+    print("=" * 70)
+    print(f"  MLP → Strapi Import v2  – souhrn {count} shardů ({input_path})")
+    print("=" * 70)
+    for stats in parts:
+        print(f"  Shard {stats['shard']:>7}: {stats.get('ok', 0):>6} OK, "
+              f"{stats.get('skip', 0):>6} skip, {stats.get('err', 0):>5} err"
+              f"  ({stats.get('finished', '?')})")
+    if missing:
+        print(f"  ⚠ Chybí statistiky shardů: {', '.join(f'{i}/{count}' for i in missing)}")
+    print_report(total.get("ok", 0), total.get("skip", 0), total.get("err", 0),
+                 total.get("categories", {}))
+    print("=" * 70)
+
+
+# ─────────────────────────────────────────────
+# Postup importu (--resume)
+# ─────────────────────────────────────────────
+
+def load_progress(progress_file: Path, input_path: str) -> Optional[dict]:
+    """Uložený postup, pokud patří k aktuální verzi vstupního souboru."""
+    try:
+        with open(progress_file, encoding="utf-8") as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return None
+    st = os.stat(input_path)
+    if progress.get("size") != st.st_size or progress.get("mtime_ns") != st.st_mtime_ns:
+        print(f"  ⚠ {progress_file.name} patří k jiné verzi vstupu – začínám od --start")
+        return None
+    return progress
+
+
+def save_progress(progress_file: Path, input_path: str, index: int,
+                  offset: Optional[int]) -> None:
+    """
+    Atomicky uloží, kolik knih je hotovo (`index`) a bajtový offset další
+    knihy v JSONL vstupu (u JSON pole None – navazuje se podle indexu).
+    """
+    st = os.stat(input_path)
+    progress = {"input": input_path, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "index": index, "offset": offset}
+    tmp = progress_file.with_name(progress_file.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(progress, f)
+    os.replace(tmp, progress_file)
+
+
 # ─────────────────────────────────────────────
 # Hlavní program
 # ─────────────────────────────────────────────
@@ -520,13 +430,40 @@ def main():
     parser.add_argument("--url", default="")
     parser.add_argument("--start", type=int, default=0,
                         help="Začít od indexu N (pro pokračování po přerušení)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Navázat za poslední dokončenou knihou minulého běhu "
+                             "(<input>.progress.json)")
+    parser.add_argument("--category-cache", default="", metavar="FILE",
+                        help="Uložit/načíst výsledky kategorizace mezi běhy "
+                             "(zneplatní se při změně pravidel)")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help=f"Souběžně zakládaných knih/dávek (default: {WORKERS})")
+    parser.add_argument("--batch", type=int, default=BULK_SIZE, metavar="N",
+                        help=f"Dokumentů v jednom hromadném zápisu, 1 = po jednom "
+                             f"(default: {BULK_SIZE})")
+    parser.add_argument("--shard", type=parse_shard, default=None, metavar="i/N",
+                        help="Importovat jen část i z N (podle hashe mlpId); "
+                             "nejdřív jednou spusť --plan")
+    parser.add_argument("--plan", action="store_true",
+                        help="Plánovací fáze pro shardy: jen založit chybějící autory "
+                             "a kategorie celého vstupu")
+    parser.add_argument("--merge-stats", type=int, default=0, metavar="N",
+                        help="Vypsat souhrnný report N shardů a skončit")
     args = parser.parse_args()
-
-    global STRAPI_URL, STRAPI_TOKEN
+    if args.merge_stats:
+        print_merged_stats(args.input, args.merge_stats)
+        return
+    if args.category_cache:
+        CATEGORIZER.load_cache(args.category_cache)
+
+    global STRAPI_URL, STRAPI_TOKEN, _strapi, _slugs, _bulk, _shard
+    _shard = args.shard
     if args.url:
         STRAPI_URL = args.url
     if args.token:
         STRAPI_TOKEN = args.token
+    _strapi = StrapiClient(STRAPI_URL, STRAPI_TOKEN)
+    _bulk = BulkWriter(_strapi, "books", size=args.batch)
 
     print("=" * 70)
     print("  MLP → Strapi Import v2  (s inteligentní kategorizací)")
@@ -535,68 +472,148 @@ def main():
     print(f"  Token:   {'nastaven ✓' if STRAPI_TOKEN else '⚠ NENÍ nastaven'}")
     print(f"  Vstup:   {args.input}")
     print(f"  Dry-run: {'ANO' if args.dry_run else 'NE'}")
-    if args.start:
-        print(f"  Start:   od indexu #{args.start}")
+    print(f"  Workery: {args.workers}")
+    print(f"  Dávka:   {args.batch}")
+    if _shard:
+        print(f"  Shard:   {_shard}")
+    if args.plan:
+        print("  Režim:   plán (jen autoři a kategorie)")
+    shard_suffix = f".{_shard.suffix}" if _shard else ""
+    progress_file = Path(args.input + shard_suffix + PROGRESS_SUFFIX)
+    progress = None
+    if args.resume and os.path.exists(args.input):
+        progress = load_progress(progress_file, args.input)
+        if progress is None:
+            print(f"  ⚠ Uložený postup nenalezen – začínám od indexu #{args.start}")
+    start = progress["index"] if progress else args.start
+    if start:
+        print(f"  Start:   od indexu #{start}" + (" (--resume)" if progress else ""))
     print()
 
+    # JSONL se čte průběžně od offsetu knihy `start`, JSON pole celé najednou.
+    # planned() vrací pokaždé nový průchod – první projde autory, druhý import.
     try:
-        with open(args.input, encoding="utf-8") as f:
-            books = json.load(f)
+        if book_format(args.input) == "jsonl":
+            offsets = book_offsets(args.input)
+            total = len(offsets)
+            offset = progress.get("offset") if progress else None
+            if offset is None and start < total:
+                offset = offsets[start]
+
+            def planned():
+                return iter_jsonl(args.input, offset) if offset is not None else iter(())
+        else:
+            all_books = load_books(args.input)
+            total = len(all_books)
+
+            def planned():
+                return ((book, None) for book in all_books[start:])
     except FileNotFoundError:
         print(f"  ✗ Soubor '{args.input}' nenalezen!")
         sys.exit(1)
 
-    print(f"  Načteno {len(books)} knih.\n")
+    print(f"  Načteno {total} knih.\n")
 
     if not args.dry_run:
         _existing_mlp_ids.update(load_existing_mlp_ids())
         try:
             strapi_get("/api/books", {"pagination[pageSize]": "1"})
-            print("  ✓ Připojení ke Strapi OK\n")
+            print("  ✓ Připojení ke Strapi OK")
         except Exception as e:
             print(f"  ✗ Nelze se připojit: {e}")
             sys.exit(1)
+        preload_names()
+        print()
+
+    # Plánovací fáze: noví autoři a kategorie se založí předem, knihy pak
+    # už jen odkazují. Shardy je nezakládají (dva procesy by založily
+    # stejné jméno dvakrát) – musí je předem založit jeden běh s --plan.
+    if args.plan:
+        authors, categories = missing_names(planned())
+        if args.dry_run:
+            print(f"  [DRY] Založil bych {len(authors)} autorů a {len(categories)} kategorií")
+        else:
+            create_names(authors, categories, args.batch)
+            print("  ✓ Plán hotov – teď můžeš spustit shardy (--shard i/N)")
+        print("=" * 70)
+        return
+    if not args.dry_run:
+        if _shard:
+            authors, categories = missing_names(b for b in planned() if b[0] in _shard)
+            if authors or categories:
+                print(f"  ✗ Ve Strapi chybí {len(authors)} autorů a {len(categories)} kategorií "
+                      f"knih tohoto shardu – spusť nejdřív --plan (bez --shard)")
+                sys.exit(1)
+        else:
+            create_names(*missing_names(planned()), args.batch)
+        _slugs = SlugRegistry(_strapi)
+        print(f"  ✓ {_slugs.load()} obsazených slugů\n")
+
+    def numbered():
+        """(kniha, (index, offset další knihy)) – u --shard jen knihy shardu."""
+        for i, (book, next_offset) in enumerate(planned(), start=start + 1):
+            if _shard is None or book in _shard:
+                yield book, (i, next_offset)
 
     ok = skip = err = 0
     category_stats: dict = {}
-    total = len(books)
-
-    for i, book in enumerate(books[args.start:], start=args.start + 1):
-        title = (book.get("title") or "?")[:50]
-        cat = pick_category(book.get("topics", []),
-                            author=book.get("author"),
-                            title=book.get("title"))
+    done = None     # (index, offset další knihy) poslední dokončené knihy
+
+    def report(job: BookJob) -> None:
+        """Výsledek knihy – volá pipeline v pořadí vstupu."""
+        nonlocal ok, skip, err, done
+        (i, next_offset), book = job.tag, job.book
+        title = (book.title or "?")[:50]
+        # Kategorii určila příprava; přeskočené knihy k ní nedošly
+        cat = job.category or pick_category(book.topics,
+                                            author=book.author,
+                                            title=book.title)
         category_stats[cat] = category_stats.get(cat, 0) + 1
 
-        result = import_book(book, args.dry_run)
-
-        if result == "ok":
+        if job.message:
+            print(job.message)
+        if job.result == "ok":
             ok += 1
             if not args.dry_run:
                 print(f"[{i:>4}/{total}] ✓ {title:<50} | {cat}")
-        elif result == "skip":
+        elif job.result == "skip":
             skip += 1
             # skip tichý (příliš mnoho výstupu)
         else:
             err += 1
             print(f"[{i:>4}/{total}] ✗ {title}")
 
-        if not args.dry_run and result != "skip":
-            time.sleep(DELAY)
+        done = job.tag
+        if not args.dry_run and job.result != "skip":
+            save_progress(progress_file, args.input, i, next_offset)
 
-        if i % 100 == 0:
+        if (ok + skip + err) % 100 == 0:
             print(f"\n  ─── #{i}: {ok} OK, {skip} skip, {err} err ───\n")
 
-    print()
-    print("=" * 70)
-    print(f"  ✓ Importováno: {ok}")
-    print(f"  ⏭ Přeskočeno:  {skip}")
-    print(f"  ✗ Chyby:       {err}")
-    print()
-    print("  Rozdělení do kategorií:")
-    for cat, count in sorted(category_stats.items(), key=lambda x: -x[1]):
-        bar = "█" * (count * 30 // max(category_stats.values()))
-        print(f"    {cat:<35} {count:>5}  {bar}")
+    # Souběžně nejvýš --workers zakládaných knih, výpis a postup v pořadí vstupu
+    pipeline = ImportPipeline(book_stages(args.dry_run, args.workers, args.batch),
+                              on_result=report,
+                              on_error=partial(release_book, dry_run=args.dry_run))
+    try:
+        pipeline.run(numbered())
+    except BaseException:
+        # Přerušení (Ctrl+C, výpadek): uložit i případné přeskočené knihy
+        if not args.dry_run and done:
+            save_progress(progress_file, args.input, *done)
+            print(f"\n  ⏸ Přerušeno po knize #{done[0]} – pokračuj s --resume")
+        raise
+
+    if not args.dry_run and progress_file.exists():
+        progress_file.unlink()
+    if args.category_cache:
+        CATEGORIZER.save_cache(args.category_cache)
+
+    print_report(ok, skip, err, category_stats)
+    if _shard and not args.dry_run:
+        stats_file = save_shard_stats(args.input, _shard, {
+            "ok": ok, "skip": skip, "err": err, "categories": category_stats})
+        print(f"  Statistiky shardu: {stats_file.name}  (souhrn: --merge-stats {_shard.count})")
+    print(f"  Kategorizace: {CATEGORIZER.misses} vyhodnoceno, {CATEGORIZER.hits} z cache")
     print("=" * 70)
 
 
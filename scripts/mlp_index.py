@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+MLP index knih ve Strapi
+========================
+SQLite soubor mlpId → documentId, slug a updatedAt všech knih z MLP,
+které už jsou ve Strapi. Importy (mlp_import_v2.py, mlp_sync.py) podle
+něj při startu poznají existující knihy, místo aby pokaždé stahovaly
+mlpId celého katalogu.
+
+Obnovuje se přírůstkově: ze Strapi se stáhnou jen knihy s updatedAt
+od posledního obnovení (včetně právě založených). Řádek indexu je jeden
+dokument (documentId), takže po deltě musí počet řádků přesně sedět
+s počtem knih s mlpId ve Strapi (i když se mlpId opakuje). Smazané knihy
+delta neukáže, ale počet ano – při nesouladu se index načte celý znovu.
+Stejně tak jednou za VERIFY_DAYS (pojistka proti změnám během obnovení),
+při změně Strapi URL nebo s --full.
+
+Spuštění:
+    python3 mlp_index.py --url http://localhost:1337 --token <TOKEN>
+    python3 mlp_index.py --full      # načíst celý index znovu
+    python3 mlp_index.py --stats     # jen statistiky indexu
+
+Použití:
+    with BookIndex() as index:
+        index.refresh(strapi)
+        existing = index.mlp_ids()
+        entry = index.get("oai:...")           # IndexedBook nebo None
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Optional
+
+from mlp_http import StrapiClient
+from mlp_strapi import iter_rows
+
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+if hasattr(sys.stderr, "reconfigure"):
+    sys.stderr.reconfigure(encoding="utf-8", errors="replace")
+
+INDEX_FILE = Path(__file__).parent / "mlp_index.sqlite"
+
+# Jak často index načíst celý znovu, i když počty sedí
+VERIFY_DAYS = 7
+
+# Limit počtu parametrů v jednom SQL dotazu (SQLite má 999 / 32766)
+_SQL_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    document_id TEXT PRIMARY KEY,
+    mlp_id      TEXT NOT NULL,
+    slug        TEXT,
+    updated_at  TEXT
+);
+CREATE INDEX IF NOT EXISTS books_mlp_id ON books (mlp_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Jen knihy z MLP, jen potřebná pole
+_FILTER = {"filters[mlpId][$notNull]": "true"}
+_FIELDS = {"fields[0]": "mlpId", "fields[1]": "slug", "fields[2]": "updatedAt"}
+
+
+@dataclass(frozen=True, slots=True)
+class IndexedBook:
+    mlp_id: str
+    document_id: str
+    slug: Optional[str]
+    updated_at: Optional[str]
+
+
+class BookIndex:
+    """
+    Lokální index knih ve Strapi. Zápisy jsou chráněné zámkem; víc
+    procesů (shardy) může sdílet soubor – SQLite na zámek chvíli počká.
+    """
+
+    def __init__(self, path: Path = INDEX_FILE):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        primary = [row[1] for row in self.conn.execute("PRAGMA table_info(books)") if row[5]]
+        if primary and primary != ["document_id"]:
+            # Starší index (klíčem mlpId) – zahodit, příští refresh ho načte celý
+            self.conn.executescript("DROP TABLE books; DROP TABLE IF EXISTS meta;")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def __enter__(self) -> "BookIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+    # ── Obnovení ze Strapi ─────────────────────────────────────────────────────
+
+    def refresh(self, strapi: StrapiClient, full: bool = False) -> int:
+        """
+        Dotáhne změny od posledního obnovení (jiná Strapi URL nebo `full`
+        = celý index znovu). Vrátí počet stažených knih.
+        """
+        watermark = self._meta("updated_at")
+        verified = self._meta("verified")
+        due = (not verified or datetime.fromisoformat(verified)
+               < datetime.now(timezone.utc) - timedelta(days=VERIFY_DAYS))
+        if full or due or not watermark or self._meta("strapi_url") != strapi.url:
+            return self._rebuild(strapi)
+
+        count = self._upsert(list(iter_rows(strapi, "/api/books", {
+            **_FILTER, **_FIELDS,
+            # >= : knihy se stejným časem jako hranice se jen přepíšou
+            "filters[updatedAt][$gte]": watermark,
+            "sort[0]": "updatedAt:asc",
+        })))
+        if remote_count(strapi) != self.count():
+            # Nové dokumenty už delta přidala – rozdíl jsou smazané knihy
+            # (nebo knihy, které přišly o mlpId)
+            print("  ↺  Index nesedí s počtem knih ve Strapi – načítám celý znovu", flush=True)
+            return self._rebuild(strapi)
+        return count
+
+    def _rebuild(self, strapi: StrapiClient) -> int:
+        rows = list(iter_rows(strapi, "/api/books", {**_FILTER, **_FIELDS}))
+        with self.lock:
+            self.conn.execute("DELETE FROM books")
+            self.conn.execute("DELETE FROM meta")
+            self._set_meta("strapi_url", strapi.url)
+            self._set_meta("verified", datetime.now(timezone.utc).isoformat())
+        return self._upsert(rows)
+
+    def _upsert(self, rows: list[dict]) -> int:
+        count = 0
+        with self.lock:
+            watermark = self._meta("updated_at") or ""
+            for row in rows:
+                if not row.get("mlpId"):
+                    continue
+                updated_at = row.get("updatedAt")
+                self.conn.execute(
+                    "INSERT INTO books (document_id, mlp_id, slug, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(document_id) DO UPDATE SET "
+                    "mlp_id = excluded.mlp_id, slug = excluded.slug, "
+                    "updated_at = excluded.updated_at",
+                    (row["documentId"], row["mlpId"], row.get("slug"), updated_at))
+                if updated_at and updated_at > watermark:
+                    watermark = updated_at
+                count += 1
+            if watermark:
+                self._set_meta("updated_at", watermark)
+            self.conn.commit()
+        return count
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                          "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+    # ── Čtení ────────────────────────────────────────────────────────────────
+
+    def mlp_ids(self) -> set[str]:
+        return {mlp_id for (mlp_id,) in self.conn.execute("SELECT DISTINCT mlp_id FROM books")}
+
+    def get(self, mlp_id: str) -> Optional[IndexedBook]:
+        """Kniha s daným mlpId (při duplicitách ve Strapi ta nejdřív upravená)."""
+        row = self.conn.execute(
+            "SELECT mlp_id, document_id, slug, updated_at FROM books WHERE mlp_id = ? "
+            "ORDER BY updated_at LIMIT 1", (mlp_id,)).fetchone()
+        return IndexedBook(*row) if row else None
+
+    def documents(self, mlp_ids: Iterable[str]) -> dict[str, str]:
+        """
+        Hromadně vrátí mlpId → documentId; neznámá mlpId ve výsledku chybí
+        (při duplicitách ve Strapi jeden z dokumentů).
+        """
+        ids = list(mlp_ids)
+        result = {}
+        for i in range(0, len(ids), _SQL_CHUNK):
+            chunk = ids[i:i + _SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            result.update(self.conn.execute(
+                f"SELECT mlp_id, document_id FROM books WHERE mlp_id IN ({marks})", chunk))
+        return result
+
+    def count(self) -> int:
+        """Počet dokumentů v indexu (duplicitní mlpId se počítají zvlášť, jako ve Strapi)."""
+        return self.conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"books": self.count(), "mlp_ids": len(self.mlp_ids()),
+                "strapi_url": self._meta("strapi_url"), "updated_at": self._meta("updated_at"),
+                "verified": self._meta("verified")}
+
+
+def remote_count(strapi: StrapiClient) -> int:
+    """Počet knih s mlpId ve Strapi (jeden požadavek, pageSize 1)."""
+    resp = strapi.request("GET", "/api/books", timeout=30, params={
+        **_FILTER, "fields[0]": "mlpId", "pagination[pageSize]": "1"})
+    resp.raise_for_status()
+    return resp.json().get("meta", {}).get("pagination", {}).get("total", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MLP index knih ve Strapi (mlpId → documentId)")
+    parser.add_argument("--url",   default=os.getenv("STRAPI_URL", "http://localhost:1337"),
+                        help="Strapi URL (default: env STRAPI_URL)")
+    parser.add_argument("--token", default=os.getenv("STRAPI_TOKEN", ""),
+                        help="Strapi API token (default: env STRAPI_TOKEN)")
+    parser.add_argument("--full",  action="store_true", help="Načíst celý index znovu")
+    parser.add_argument("--stats", action="store_true", help="Jen vypsat statistiky indexu")
+    parser.add_argument("--db",    default=str(INDEX_FILE),
+                        help=f"SQLite soubor (default: {INDEX_FILE.name})")
+    args = parser.parse_args()
+
+    with BookIndex(Path(args.db)) as index:
+        if not args.stats:
+            count = index.refresh(StrapiClient(args.url, args.token), full=args.full)
+            print(f"  ✓ Staženo/aktualizováno {count} knih", flush=True)
+
+        stats = index.stats()
+        print(f"  Index:    {args.db}")
+        print(f"  Strapi:   {stats['strapi_url'] or '—'}")
+        print(f"  Knih:     {stats['books']}  (různých mlpId {stats['mlp_ids']})")
+        print(f"  Poslední updatedAt: {stats['updated_at'] or '—'}")
+        print(f"  Celý načten:        {stats['verified'] or '—'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,708 @@
+#!/usr/bin/env python3
+"""
+MLP OAI-PMH – společné funkce
+==============================
+Parsování MARC21 záznamů (na mlp_types.Book) a streamovaný harvest
+z OAI-PMH endpointu MLP.
+Používají ho mlp_scraper.py a mlp_sync.py.
+
+Stránky se stahují dopředu ve vlákně na pozadí a drží se v paměti celé
+(kvůli resumptionTokenu na konci stránky), každá se pak parsuje průběžně
+(iterparse), zpracovaný <record> se hned zahodí a hotové knihy se vrací
+jedna po druhé. Paměť je tak omezená na pár stránek (≈ (prefetch + 2) ×
+velikost stránky) bez ohledu na délku harvestu (~3400 knih) a import běží
+souběžně se stahováním dalších stránek.
+
+Všechny OAI požadavky jdou přes sdílený RateLimiter (LIMITER): tempo se
+postupně zrychluje, dokud server odpovídá rychle, a na 503/429 se
+exponenciálně zpomalí (s ohledem na Retry-After). Stejný požadavek
+(i se stejným resumptionTokenem) se pak zopakuje.
+
+Použití:
+    harvest = OAIHarvest({"verb": "ListRecords", "set": OAI_SET,
+                          "metadataPrefix": OAI_PREFIX}, parse=parse_record)
+    for book in harvest:
+        ...
+    if harvest.error:
+        code, message = harvest.error
+"""
+
+import io
+import queue
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+from xml.sax.saxutils import unescape
+
+import requests
+
+import mlp_xml
+from mlp_http import HttpPool
+from mlp_types import Book, Link
+from mlp_xml import NS_MARC, NS_OAI
+
+# OAI-PMH endpoint MLP
+OAI_BASE = "http://web2.mlp.cz/cgi/oai"
+OAI_SET = "ebook"
+OAI_PREFIX = "marc21"
+
+# Formáty ke stažení (ext → label)
+FORMAT_MAP = {
+    "epub": "EPUB",
+    "pdf": "PDF",
+    "prc": "PRC",
+    "mobi": "MOBI",
+    "txt": "TXT",
+    "html": "HTML",
+    "rtf": "RTF",
+    "pdb": "PDB",
+}
+
+# Prioritní formáty pro náš web (ostatní ignorujeme pro přehlednost)
+PRIORITY_FORMATS = {"epub", "pdf", "prc", "mobi"}
+
+# Pořadí linků (epub první)
+LINK_ORDER = ["epub", "pdf", "prc", "mobi", "html", "txt", "rtf", "pdb"]
+
+# Granularita datestampů (OAI Identify)
+GRANULARITY_DAY = "YYYY-MM-DD"
+GRANULARITY_SECONDS = "YYYY-MM-DDThh:mm:ssZ"
+
+# Tagy, které harvester sleduje při průchodu streamem
+_TAG_RECORD = f"{{{NS_OAI}}}record"
+_TAG_HEADER = f"{{{NS_OAI}}}header"
+_TAG_DATESTAMP = f"{{{NS_OAI}}}datestamp"
+_TAG_TOKEN = f"{{{NS_OAI}}}resumptionToken"
+_TAG_ERROR = f"{{{NS_OAI}}}error"
+_TAG_SUBFIELD = f"{{{NS_MARC}}}subfield"
+_TAG_CONTROLFIELD = f"{{{NS_MARC}}}controlfield"
+# Datapole, která čte parse_fields (245 název, 100/700 autor, 520 popis,
+# 650 témata, 856 linky a obálka)
+MARC_TAGS = frozenset({"100", "245", "520", "650", "700", "856"})
+
+_CONTAINERS = {f"{{{NS_OAI}}}ListRecords", f"{{{NS_OAI}}}ListIdentifiers",
+               f"{{{NS_OAI}}}GetRecord"}
+
+# resumptionToken je vždy poslední prvek odpovědi – stačí prohledat konec
+_TOKEN_RE = re.compile(
+    rb"<(?:[\w.-]+:)?resumptionToken\b[^>]*?(?:/>|>([^<]*)</(?:[\w.-]+:)?resumptionToken>)")
+_TOKEN_TAIL = 4096
+
+
+# ──────────────────────────────────────────────
+# MARC21 helpers
+# ──────────────────────────────────────────────
+
+class MarcIndex:
+    """
+    Index jednoho MARC21 <record>: datapole se projdou jednou a pak se
+    z nich čte bez dalšího prohledávání stromu (dřív každé get_subfield
+    znovu procházelo `.//datafield[@tag=...]`).
+
+    fields:   tag → seznam polí v pořadí dokumentu; pole = kód → text
+              prvního subfieldu s tím kódem (None, když je prázdný)
+    controls: tag → text prvního controlfieldu
+
+    `tags` omezí index jen na vybraná datapole (parse_fields čte jen
+    MARC_TAGS) – ostatní pole se pak tváří jako chybějící.
+    """
+
+    __slots__ = ("fields", "controls")
+
+    def __init__(self, record: ET.Element, tags: Optional[frozenset] = None):
+        fields: dict[str, list[dict]] = {}
+        for field in mlp_xml.datafields(record, tags):
+            subfields = {}
+            for sf in field:
+                if sf.tag == _TAG_SUBFIELD:
+                    code = sf.get("code")
+                    if code not in subfields:
+                        subfields[code] = sf.text
+            fields.setdefault(field.get("tag"), []).append(subfields)
+        controls = {}
+        for field in record.iter(_TAG_CONTROLFIELD):
+            controls.setdefault(field.get("tag"), field.text)
+        self.fields = fields
+        self.controls = controls
+
+    def datafields(self, tag: str) -> list[dict]:
+        return self.fields.get(tag, [])
+
+    def subfield(self, tag: str, code: str) -> Optional[str]:
+        for field in self.fields.get(tag, ()):
+            text = field.get(code)
+            if text:
+                return text.strip()
+        return None
+
+    def subfields(self, tag: str, code: str) -> list[str]:
+        return [field[code].strip() for field in self.fields.get(tag, ()) if field.get(code)]
+
+    def control(self, tag: str) -> Optional[str]:
+        return self.controls.get(tag)
+
+
+def marc_index(record) -> MarcIndex:
+    """MarcIndex pro <record> (už hotový index vrátí beze změny)."""
+    return record if isinstance(record, MarcIndex) else MarcIndex(record)
+
+
+def get_subfield(record, tag: str, code: str) -> Optional[str]:
+    """Vrátí první hodnotu subfieldu z MARC21 záznamu (Element nebo MarcIndex)."""
+    return marc_index(record).subfield(tag, code)
+
+
+def get_all_subfields(record, tag: str, code: str) -> list[str]:
+    """Vrátí všechny hodnoty subfieldu."""
+    return marc_index(record).subfields(tag, code)
+
+
+def parse_856_fields(record) -> tuple[list[Link], Optional[str]]:
+    """
+    Zpracuje všechna pole 856 (URL linky).
+    Vrátí (seznam download linků, URL obálky).
+    """
+    links = []
+    cover_url = None
+
+    for field in marc_index(record).datafields("856"):
+        url = field.get("u")
+        if not url:
+            continue
+
+        url = url.strip()
+        label = (field.get("z") or "").strip()
+
+        # Detekce obálky
+        if url.endswith(".jpg") or "obálka" in label.lower() or "obalka" in label.lower():
+            cover_url = url
+            continue
+
+        # Detekce formátu
+        ext = url.rsplit(".", 1)[-1].lower() if "." in url else ""
+        if ext in FORMAT_MAP:
+            links.append(Link.create(url, FORMAT_MAP[ext], ext, label))
+
+    links.sort(key=lambda x: LINK_ORDER.index(x.ext) if x.ext in LINK_ORDER else 99)
+
+    return links, cover_url
+
+
+# ──────────────────────────────────────────────
+# Zpracování záznamu
+# ──────────────────────────────────────────────
+
+def marc_author(marc) -> Optional[str]:
+    """Autor – MARC 100 $a (primární), nebo 700 $a (přidaný)."""
+    marc = marc_index(marc)
+    author = marc.subfield("100", "a") or marc.subfield("700", "a")
+    if author:
+        author = author.rstrip(",. ").strip()
+    return author
+
+
+def parse_fields(record_el: ET.Element) -> Optional[Book]:
+    """
+    Zpracuje jeden OAI-PMH <record> na knihu (Book bez slugu).
+    Vrátí None pro smazané záznamy a knihy bez názvu/stažitelných formátů.
+    """
+
+    # Zkontrolujeme, zda záznam není smazán
+    header = mlp_xml.find(record_el, "header")
+    if header is not None and header.get("status") == "deleted":
+        return None
+
+    marc_el = mlp_xml.find(record_el, "marc")
+    if marc_el is None:
+        return None
+    marc = MarcIndex(marc_el, MARC_TAGS)   # jeden průchod poli, dál se čte z indexu
+
+    # OAI identifikátor
+    id_el = mlp_xml.find(header, "identifier") if header is not None else None
+    oai_id = id_el.text.strip() if id_el is not None else None
+
+    # Název – MARC 245 $a (hlavní) + $b (vedlejší)
+    title_a = marc.subfield("245", "a") or ""
+    title_b = marc.subfield("245", "b") or ""
+    title = (title_a.rstrip("/ :") + (" " + title_b.rstrip("/ :") if title_b else "")).strip()
+    if not title:
+        return None
+
+    author = marc_author(marc)
+
+    # Popis – MARC 520 $a
+    description = marc.subfield("520", "a")
+
+    # Rok vydání – z MARC 008 (znaky 7-10)
+    year = None
+    ctrl008 = marc.control("008")
+    if ctrl008 and len(ctrl008) >= 11:
+        year_str = ctrl008[7:11].strip()
+        if year_str.isdigit():
+            year = int(year_str)
+
+    # Témata – MARC 650 $a
+    topics = marc.subfields("650", "a")
+    topics = tuple(t.rstrip(".,;") for t in topics if t)
+
+    # Linky ke stažení a obálka
+    links, cover_url = parse_856_fields(marc)
+
+    # Filtrujeme jen prioritní formáty pro náš web
+    main_links = tuple(lnk for lnk in links if lnk.ext in PRIORITY_FORMATS)
+
+    if not main_links:
+        return None  # Kniha bez stažitelných formátů – přeskočíme
+
+    return Book(
+        mlp_id=oai_id,
+        title=title,
+        author=author,
+        description=description,
+        year=year,
+        topics=topics,
+        cover_url=cover_url,
+        links=main_links,     # jen EPUB, PDF, PRC, MOBI
+        all_links=tuple(links),
+    )
+
+
+def with_slug(book: Book, slugify: Callable[[str], str]) -> Book:
+    """Doplní do knihy slug (funkcí `slugify` volajícího skriptu)."""
+    return book.with_slug(slugify(book.title))
+
+
+def parse_record(record_el: ET.Element,
+                 slugify: Callable[[str], str]) -> Optional[Book]:
+    """
+    Zpracuje jeden OAI-PMH <record>, vrátí Book nebo None.
+    Slug se tvoří funkcí `slugify` volajícího skriptu.
+    """
+    fields = parse_fields(record_el)
+    return with_slug(fields, slugify) if fields else None
+
+
+def parse_header(header_el: Optional[ET.Element]) -> Optional[dict]:
+    """
+    Zpracuje OAI <header> (samostatný z ListIdentifiers nebo uvnitř <record>).
+    Vrátí {"identifier", "datestamp", "deleted"} nebo None.
+    """
+    if header_el is None:
+        return None
+    identifier = (mlp_xml.findtext(header_el, "identifier") or "").strip()
+    if not identifier:
+        return None
+    return {
+        "identifier": identifier,
+        "datestamp": (mlp_xml.findtext(header_el, "datestamp") or "").strip(),
+        "deleted": header_el.get("status") == "deleted",
+    }
+
+
+def record_header(record_el: ET.Element) -> Optional[dict]:
+    """Hlavička (identifier, datestamp, deleted) OAI <record>."""
+    return parse_header(mlp_xml.find(record_el, "header"))
+
+
+# ──────────────────────────────────────────────
+# Identify a datestampy
+# ──────────────────────────────────────────────
+
+def identify(timeout: float = 30) -> dict:
+    """
+    Zavolá verb=Identify a vrátí jednoduché údaje o repozitáři
+    (granularity, earliestDatestamp, deletedRecord, ...).
+    """
+    resp = oai_get({"verb": "Identify"}, timeout=timeout)
+    root = ET.fromstring(resp.content)
+    info = root.find(f"{{{NS_OAI}}}Identify")
+    if info is None:
+        raise OAIError("Identify", "Identify element nenalezen")
+    return {child.tag.split("}", 1)[-1]: (child.text or "").strip()
+            for child in info if len(child) == 0}
+
+
+def format_datestamp(dt: datetime, granularity: str) -> str:
+    """Naformátuje UTC čas podle granularity repozitáře."""
+    if granularity == GRANULARITY_SECONDS:
+        return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return dt.strftime("%Y-%m-%d")
+
+
+def next_datestamp(datestamp: str, granularity: str) -> str:
+    """
+    Nejbližší datestamp za `datestamp` – `from` v OAI je inkluzivní,
+    takže další běh začne hned za posledním viděným záznamem.
+    U denní granularity zůstává stejný den (přesněji to nejde).
+    """
+    if granularity != GRANULARITY_SECONDS or len(datestamp) == 10:
+        return datestamp[:10]
+    dt = datetime.strptime(datestamp, "%Y-%m-%dT%H:%M:%SZ")
+    return format_datestamp(dt + timedelta(seconds=1), granularity)
+
+
+def parse_datestamp(datestamp: str) -> datetime:
+    """OAI datestamp (den nebo sekundy) → UTC datetime."""
+    fmt = "%Y-%m-%d" if len(datestamp) == 10 else "%Y-%m-%dT%H:%M:%SZ"
+    return datetime.strptime(datestamp, fmt).replace(tzinfo=timezone.utc)
+
+
+def split_date_range(earliest: str, latest: datetime, parts: int,
+                     granularity: str) -> list[tuple[str, Optional[str]]]:
+    """
+    Rozdělí období od `earliest` do `latest` na `parts` navazujících oken
+    (from, until) pro souběžný harvest. Okna se nepřekrývají (until je
+    inkluzivní, další okno začíná o jednotku granularity dál), poslední
+    okno nemá until, aby nic nechybělo. U denní granularity má okno
+    nejméně jeden den, oken pak může být méně.
+    """
+    unit = timedelta(seconds=1) if granularity == GRANULARITY_SECONDS else timedelta(days=1)
+    start = parse_datestamp(earliest)
+    if granularity != GRANULARITY_SECONDS:
+        start = start.replace(hour=0, minute=0, second=0)
+    span = max(latest - start, unit)
+    step = max(span / max(parts, 1), unit)
+    if granularity != GRANULARITY_SECONDS:
+        step = timedelta(days=-(-step // unit))
+
+    windows = []
+    while True:
+        end = start + step
+        if end > latest or len(windows) == parts - 1:
+            windows.append((format_datestamp(start, granularity), None))
+            return windows
+        windows.append((format_datestamp(start, granularity),
+                        format_datestamp(end - unit, granularity)))
+        start = end
+
+
+def split_by_datestamps(earliest: str, datestamps: list[str], parts: int,
+                        granularity: str) -> list[tuple[str, Optional[str]]]:
+    """
+    Jako split_date_range, ale hranice oken jsou kvantily známých
+    datestampů (např. z lokálního zrcadla) – okna mají zhruba stejně
+    záznamů, i když je katalog v čase rozložený nerovnoměrně.
+    """
+    unit = timedelta(seconds=1) if granularity == GRANULARITY_SECONDS else timedelta(days=1)
+    stamps = sorted(datestamps)
+    bounds = []
+    for k in range(1, max(parts, 1)):
+        bound = parse_datestamp(stamps[len(stamps) * k // parts])
+        if granularity != GRANULARITY_SECONDS:
+            bound = bound.replace(hour=0, minute=0, second=0)
+        if bound > parse_datestamp(earliest) and (not bounds or bound > bounds[-1]):
+            bounds.append(bound)
+
+    windows = []
+    start = earliest if granularity == GRANULARITY_SECONDS else earliest[:10]
+    for bound in bounds:
+        windows.append((start, format_datestamp(bound - unit, granularity)))
+        start = format_datestamp(bound, granularity)
+    windows.append((start, None))
+    return windows
+
+
+# ──────────────────────────────────────────────
+# Řízení tempa požadavků
+# ──────────────────────────────────────────────
+
+# HTTP stavy, po kterých se požadavek zopakuje (503/429 = flow control)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Sdílený token bucket s AIMD řízením tempa (thread-safe).
+
+    `acquire()` čeká na další token. Rychlá úspěšná odpověď (`success`)
+    tempo aditivně zvýší (+`increase` požadavků/s, nejvýš 1/`min_interval`),
+    pomalá ho nechá beze změny. Přetížení (`backoff`) tempo multiplikativně
+    sníží na polovinu a pozastaví všechny požadavky na Retry-After, nebo
+    exponenciálně rostoucí pauzu. Tempo se tak ustálí na nejrychlejším,
+    které server snese.
+    """
+
+    def __init__(self, interval: float = 1.0, min_interval: float = 0.25,
+                 max_interval: float = 30.0, increase: float = 0.1,
+                 slow: float = 5.0, max_backoff: float = 300.0, burst: float = 1.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.increase = increase
+        self.slow = slow
+        self.max_backoff = max_backoff
+        self.burst = burst
+        self.failures = 0
+        self._lock = threading.Lock()
+        self.reset(interval)
+
+    def reset(self, interval: float) -> None:
+        """Nastaví výchozí rozestup požadavků (s), např. z --delay."""
+        with self._lock:
+            self.min_interval = max(min(self.min_interval, interval), 1e-3)
+            self.rate = 1.0 / max(interval, self.min_interval, 1e-3)
+            self.tokens = self.burst
+            self.updated = time.monotonic()
+            self.paused_until = 0.0
+            self.failures = 0
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.rate
+
+    def acquire(self, stop: Optional[threading.Event] = None) -> bool:
+        """Počká na token; vrátí False, pokud mezitím přišel `stop`."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return True
+                    wait = (1 - self.tokens) / self.rate
+            if stop is not None:
+                if stop.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+    def success(self, elapsed: float) -> None:
+        """Aditivní zrychlení po rychlé odpovědi."""
+        with self._lock:
+            self.failures = 0
+            if elapsed < self.slow:
+                self.rate = min(self.rate + self.increase, 1.0 / self.min_interval)
+
+    def backoff(self, retry_after: Optional[float] = None) -> float:
+        """
+        Multiplikativní zpomalení po 503/429/chybě spojení. Vrátí pauzu (s):
+        Retry-After, jinak 2, 4, 8, ... s (nejvýš `max_backoff`).
+        """
+        with self._lock:
+            self.failures += 1
+            self.rate = max(self.rate / 2, 1.0 / self.max_interval)
+            pause = min(2.0 ** self.failures, self.max_backoff)
+            if retry_after is not None:
+                pause = min(max(retry_after, 0.0), self.max_backoff)
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.tokens = 0.0
+            return pause
+
+
+# Sdílený limiter všech OAI požadavků (skripty mu nastaví výchozí tempo)
+LIMITER = RateLimiter()
+
+# Keep-alive spojení na OAI endpoint; opakování řeší oai_get podle limiteru
+POOL = HttpPool(retries=0)
+
+
+def retry_after(resp: requests.Response) -> Optional[float]:
+    """Hlavička Retry-After v sekundách (číslo i HTTP datum), nebo None."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def oai_get(params: dict, timeout: float = 30, limiter: Optional[RateLimiter] = None,
+            stop: Optional[threading.Event] = None, retries: int = 8) -> Optional[requests.Response]:
+    """
+    GET na OAI endpoint v tempu limiteru. Na 503/429/5xx a chyby spojení
+    zpomalí a zopakuje stejný požadavek (nejvýš `retries`×), pak vyhodí
+    requests.RequestException. Vrátí None, pokud přišel `stop`.
+    """
+    limiter = limiter or LIMITER
+    attempt = 0
+    while True:
+        if not limiter.acquire(stop):
+            return None
+        started = time.monotonic()
+        try:
+            resp = POOL.get(OAI_BASE, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= retries:
+                raise
+            error, wait_for = str(e), None
+        else:
+            if resp.status_code not in RETRY_STATUS:
+                resp.raise_for_status()
+                limiter.success(time.monotonic() - started)
+                return resp
+            if attempt >= retries:
+                resp.raise_for_status()
+            error, wait_for = f"HTTP {resp.status_code}", retry_after(resp)
+        attempt += 1
+        pause = limiter.backoff(wait_for)
+        print(f"  ⏳ OAI {error} – opakuji za {pause:.0f} s "
+              f"({attempt}/{retries}, tempo {limiter.interval:.2f} s)", flush=True)
+
+
+# ──────────────────────────────────────────────
+# Streamovaný harvest
+# ──────────────────────────────────────────────
+
+class OAIError(Exception):
+    """Harvest skončil chybou (OAI kód, "http" nebo "xml")."""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(f"[{code}] {message}")
+        self.code = code
+        self.message = message
+
+
+class OAIHarvest:
+    """
+    Iterovatelný OAI-PMH harvest přes všechny stránky (resumptionToken).
+
+    Iterace vrací výsledky `parse(record_el)` (None se přeskakuje);
+    u verb=ListIdentifiers dostává `parse` místo <record> přímo <header>.
+    Po skončení je v `error` dvojice (kód, zpráva), pokud harvest skončil
+    chybou – OAI kód (např. "noRecordsMatch"), "http" nebo "xml".
+    `on_page(harvest)` se volá po zpracování každé stránky.
+    `max_datestamp` je nejvyšší datestamp z hlaviček, které harvest viděl.
+
+    Stahování běží ve vlákně na pozadí (producent/konzument): zatímco hlavní
+    vlákno parsuje a importuje stránku N, stahuje se už stránka N+1.
+    Fronta drží nejvýš `prefetch` stažených stránek, každou celou v paměti
+    (bytes) – spolu se zpracovávanou a právě stahovanou stránkou je to
+    ≈ (prefetch + 2) × velikost stránky. Tempo určuje `limiter`
+    (výchozí sdílený LIMITER); přetížený server neukončí harvest, stránka
+    se stejným resumptionTokenem se po pauze stáhne znovu.
+
+    Navázání na přerušený harvest: params={"verb": ..., "resumptionToken": ...}
+    a `page` = číslo poslední dokončené stránky.
+    """
+
+    def __init__(self, params: dict, parse: Callable[[ET.Element], Optional[dict]],
+                 limiter: Optional[RateLimiter] = None, on_page: Optional[Callable] = None,
+                 timeout: float = 30, prefetch: int = 2, page: int = 0):
+        self.params = params
+        self.parse = parse
+        self.limiter = limiter or LIMITER
+        self.prefetch = prefetch
+        self.on_page = on_page
+        self.timeout = timeout
+        self.page = page
+        self.token: Optional[str] = None
+        self.complete_size: Optional[int] = None
+        self.max_datestamp: Optional[str] = None
+        self.error: Optional[tuple[str, str]] = None
+        self._item_tag = (_TAG_HEADER if params.get("verb") == "ListIdentifiers"
+                          else _TAG_RECORD)
+
+    def __iter__(self):
+        pages: queue.Queue = queue.Queue(maxsize=max(1, self.prefetch))
+        stop = threading.Event()
+        fetcher = threading.Thread(target=self._fetch_pages, args=(pages, stop),
+                                   name="oai-prefetch", daemon=True)
+        fetcher.start()
+        try:
+            while True:
+                kind, payload = pages.get()
+                if kind == "error":
+                    self.error = payload
+                    return
+                if kind == "done":
+                    return
+
+                self.page += 1
+                self.token = None
+                try:
+                    yield from self._iter_page(io.BytesIO(payload))
+                except mlp_xml.ParseError as e:
+                    self.error = ("xml", str(e))
+                    return
+
+                if self.error:
+                    return
+                if self.on_page:
+                    self.on_page(self)
+        finally:
+            stop.set()
+
+    def _fetch_pages(self, pages: queue.Queue, stop: threading.Event) -> None:
+        """
+        Producent na pozadí: stahuje stránky dopředu do omezené fronty.
+        Další stránku žádá, jakmile zná její resumptionToken a limiter
+        pustí další požadavek – nečeká, až hlavní vlákno předchozí stránku
+        zpracuje. Odpověď se proto načte celá (resp.content): token je na
+        konci stránky a bez něj nejde žádat další – streamovat by šlo jen
+        bez stahování dopředu.
+        """
+        params = self.params
+        while not stop.is_set():
+            try:
+                resp = oai_get(params, timeout=self.timeout, limiter=self.limiter, stop=stop)
+            except requests.RequestException as e:
+                _put(pages, ("error", ("http", str(e))), stop)
+                return
+            if resp is None:
+                return
+            content = resp.content
+
+            if not _put(pages, ("page", content), stop):
+                return
+
+            token = _scan_token(content)
+            if not token:
+                _put(pages, ("done", None), stop)
+                return
+
+            params = {"verb": self.params["verb"], "resumptionToken": token}
+
+    def _iter_page(self, source):
+        """Průběžně parsuje jednu stránku, zpracované záznamy hned uvolní."""
+        tags = (_TAG_HEADER, self._item_tag, _TAG_TOKEN, _TAG_ERROR)
+        for el, parent in mlp_xml.iterparse(source, tags, _CONTAINERS):
+            if el.tag == _TAG_HEADER:
+                stamp = el.findtext(_TAG_DATESTAMP)
+                if stamp:
+                    stamp = stamp.strip()
+                    if self.max_datestamp is None or stamp > self.max_datestamp:
+                        self.max_datestamp = stamp
+            if el.tag == self._item_tag:
+                item = self.parse(el)
+                mlp_xml.release(el, parent)
+                if item is not None:
+                    yield item
+            elif el.tag == _TAG_TOKEN:
+                self.token = (el.text or "").strip() or None
+                size = el.get("completeListSize")
+                self.complete_size = int(size) if size and size.isdigit() else None
+            elif el.tag == _TAG_ERROR:
+                self.error = (el.get("code", ""), (el.text or "").strip())
+
+
+def _scan_token(content: bytes) -> Optional[str]:
+    """Rychle najde resumptionToken na konci odpovědi (bez parsování celé stránky)."""
+    match = _TOKEN_RE.search(content, max(0, len(content) - _TOKEN_TAIL))
+    if match is None or not match.group(1):
+        return None
+    token = unescape(match.group(1).decode("utf-8").strip(), {"&quot;": '"', "&apos;": "'"})
+    return token or None
+
+
+def _put(pages: queue.Queue, item: tuple, stop: threading.Event) -> bool:
+    """Vloží položku do fronty; vrátí False, pokud konzument mezitím skončil."""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+MLP import pipeline
+===================
+Souběžný import knih do Strapi (asyncio). Každá kniha projde fázemi
+(příprava → autor → kategorie → slug → POST); každá fáze má vlastní
+frontu a počet workerů, takže zatímco se jedna kniha zakládá, další
+už mají vyřešeného autora i kategorii a Strapi má rozpracovaných víc
+požadavků najednou – místo pevné pauzy mezi knihami.
+
+Blokující volání (requests přes StrapiClient) běží ve vláknech přes
+run_in_executor, keep-alive spojení z mlp_http se tak dál sdílí.
+
+Výsledky se hlásí v pořadí vstupu (on_result), takže výpis průběhu,
+počty ok/skip/error i uložený postup (--resume) jsou stejné jako při
+sekvenčním importu. Rozpracovaných knih je nejvýš `window`.
+
+Když fáze vyhodí výjimku, kniha skončí jako "error" a pipeline zavolá
+on_error(job) – volající tu uvolní, co si kniha zabrala v dřívějších
+fázích (mlpId, přidělený slug).
+
+Fáze s batch > 1 dostane seznam knih najednou (např. hromadný zápis
+přes POST /api/books/bulk): worker posbírá až `batch` knih, na další
+čeká nejvýš `linger` sekund, a celou dávku zpracuje jedním voláním.
+
+Velké importy jde rozdělit mezi víc procesů/strojů (--shard i/N): Shard
+vybere knihy podle stabilního hashe mlpId, statistiky shardů se ukládají
+vedle vstupu (save_shard_stats) a na konci se sečtou (load_shard_stats).
+
+Použití:
+    pipeline = ImportPipeline([
+        Stage("příprava", prepare, blocking=False),
+        Stage("autor", resolve_author),
+        Stage("kategorie", resolve_category),
+        Stage("slug", allocate_slug, blocking=False),
+        Stage("POST", create_books, workers=2, batch=50),   # run(jobs) → výsledky
+    ], on_result=report, on_error=release)
+    pipeline.run((book, None) for book in books)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from mlp_types import Book
+
+WORKERS = 4     # výchozí počet souběžných POST /api/books
+
+_END = object()
+
+
+@dataclass(slots=True, eq=False)
+class BookJob:
+    """Kniha na cestě pipeline; fáze si do ní ukládají mezivýsledky."""
+
+    index: int
+    book: Book
+    tag: Any = None                     # data volajícího (např. offset další knihy)
+    category: Optional[str] = None
+    author_id: Optional[str] = None
+    category_id: Optional[str] = None
+    base_slug: Optional[str] = None
+    claimed: bool = False               # mlpId zabrané v přípravě (uvolnit při chybě)
+    data: Optional[dict] = None         # tělo POST /api/books
+    result: Optional[str] = None        # "ok" | "skip" | "error"
+    message: Optional[str] = None       # řádek do výpisu ([DRY] …, popis chyby)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    Fáze pipeline. `run(job)` vrátí None = pokračovat další fází, nebo
+    výsledek knihy ("ok" / "skip" / "error"). Výjimka znamená "error".
+    blocking=False jsou rychlé lokální kroky – běží přímo v event loopu.
+
+    S batch > 1 dostane run(jobs) seznam až `batch` knih a vrátí seznam
+    výsledků ve stejném pořadí; běží vždy ve vlákně. Na doplnění dávky
+    čeká worker nejvýš `linger` sekund od první knihy.
+    """
+
+    name: str
+    run: Callable
+    workers: int = 1
+    blocking: bool = True
+    batch: int = 1
+    linger: float = 0.2
+
+    @property
+    def capacity(self) -> int:
+        """Kolik knih fáze zpracovává najednou."""
+        return self.workers * max(1, self.batch)
+
+
+class ImportPipeline:
+    """
+    Fáze s frontami a workery nad jedním event loopem. on_result(job) se
+    volá v event loopu, přesně v pořadí vstupu. on_error(job) se volá
+    hned po výjimce fáze (pro každou knihu dávky), před on_result.
+    """
+
+    def __init__(self, stages: list[Stage], on_result: Callable[[BookJob], None],
+                 window: Optional[int] = None,
+                 on_error: Optional[Callable[[BookJob], None]] = None):
+        self.stages = stages
+        self.on_result = on_result
+        self.on_error = on_error
+        self.window = window or 4 * sum(stage.capacity for stage in stages)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._fed = 0           # index další knihy ze vstupu
+        self._next = 0          # index další knihy k nahlášení
+        self._finished: dict[int, BookJob] = {}
+        self._barriers: list[tuple[int, Callable[[], None]]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def run(self, items: Iterable[tuple[Book, Any]], start: int = 1) -> None:
+        """
+        Zpracuje dvojice (kniha, tag) ze vstupu; index první knihy je
+        `start`. Vstup se čte ve vlákně (může to být harvest z OAI).
+        Výjimka vstupu (např. OAIError) se vyhodí až po dokončení knih,
+        které už byly rozpracované.
+        """
+        asyncio.run(self._run(items, start))
+
+    def after_reported(self, callback: Callable[[], None]) -> None:
+        """
+        Zavolá `callback` v event loopu, jakmile budou nahlášené všechny
+        knihy dosud načtené ze vstupu. Volá se z vlákna vstupu – např.
+        z on_page harvestu, aby checkpoint stránky nepředběhl import jejích knih.
+        """
+        fed = self._fed
+        self._loop.call_soon_threadsafe(self._add_barrier, fed, callback)
+
+    # ── Interní ────────────────────────────────────────────────────────────────
+
+    async def _run(self, items: Iterable[tuple[Book, Any]], start: int) -> None:
+        loop = self._loop = asyncio.get_running_loop()
+        threads = sum(stage.workers for stage in self.stages
+                      if stage.blocking or stage.batch > 1) + 1
+        executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="import")
+        loop.set_default_executor(executor)
+
+        self._fed = self._next = start
+        self._finished.clear()
+        self._barriers.clear()
+        self._slots = asyncio.Semaphore(self.window)
+        queues = [asyncio.Queue(maxsize=2 * stage.capacity) for stage in self.stages]
+
+        async def feed() -> None:
+            books = iter(items)
+            while True:
+                await self._slots.acquire()
+                item = await loop.run_in_executor(None, next, books, _END)
+                if item is _END:
+                    self._slots.release()
+                    return
+                book, tag = item
+                job = BookJob(self._fed, book, tag)
+                self._fed += 1
+                await queues[0].put(job)
+
+        async def feed_and_drain() -> None:
+            error = None
+            try:
+                await feed()
+            except Exception as e:
+                error = e
+            for queue in queues:
+                await queue.join()
+            if error is not None:
+                raise error
+
+        async def take(queue: asyncio.Queue, stage: Stage) -> list[BookJob]:
+            jobs = [await queue.get()]
+            deadline = loop.time() + stage.linger
+            while len(jobs) < stage.batch:
+                if not queue.empty():
+                    jobs.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    jobs.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            return jobs
+
+        async def work(n: int) -> None:
+            stage = self.stages[n]
+            while True:
+                jobs = await take(queues[n], stage)
+                try:
+                    if stage.batch > 1:
+                        results = await loop.run_in_executor(None, stage.run, jobs)
+                    elif stage.blocking:
+                        results = [await loop.run_in_executor(None, stage.run, jobs[0])]
+                    else:
+                        results = [stage.run(jobs[0])]
+                except Exception as e:
+                    results = ["error"] * len(jobs)
+                    for job in jobs:
+                        job.message = job.message or f"  ✗ {job.book.title[:45]}: {e}"
+                        if self.on_error:
+                            self.on_error(job)
+                for job, result in zip(jobs, results):
+                    if result is None and n + 1 < len(queues):
+                        await queues[n + 1].put(job)
+                    else:
+                        job.result = result or "ok"
+                        self._finish(job)
+                    queues[n].task_done()
+
+        main = asyncio.create_task(feed_and_drain())
+        workers = [asyncio.create_task(work(n))
+                   for n, stage in enumerate(self.stages) for _ in range(stage.workers)]
+        try:
+            # Workery běží donekonečna – skončí-li některý dřív, selhal
+            done, _ = await asyncio.wait([main, *workers],
+                                         return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in (main, *workers):
+                task.cancel()
+            await asyncio.gather(main, *workers, return_exceptions=True)
+
+    def _finish(self, job: BookJob) -> None:
+        """Hotová kniha – nahlásit ji a všechny další, které na ni čekaly."""
+        self._finished[job.index] = job
+        while self._next in self._finished:
+            job = self._finished.pop(self._next)
+            self._next += 1
+            self._slots.release()
+            self.on_result(job)
+        self._run_barriers()
+
+    def _add_barrier(self, fed: int, callback: Callable[[], None]) -> None:
+        self._barriers.append((fed, callback))
+        self._run_barriers()
+
+    def _run_barriers(self) -> None:
+        while self._barriers and self._barriers[0][0] <= self._next:
+            _, callback = self._barriers.pop(0)
+            callback()
+
+
+# ── Shardy (--shard i/N) ──────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    Část vstupu `index` z `count` (číslováno od 1). Kniha patří do shardu
+    podle CRC32 mlpId (bez mlpId podle titulu) – stejně na každém stroji
+    a v každém běhu, takže se shardy nepřekrývají.
+    """
+
+    index: int
+    count: int
+
+    def __contains__(self, book: Book) -> bool:
+        key = book.mlp_id or book.title
+        return zlib.crc32(key.encode("utf-8")) % self.count == self.index - 1
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    @property
+    def suffix(self) -> str:
+        """Část názvu souborů shardu (postup, statistiky)."""
+        return f"shard-{self.index}-of-{self.count}"
+
+
+def parse_shard(text: str) -> Shard:
+    """argparse type pro --shard i/N."""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{text}' není ve tvaru i/N (např. 2/4)")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {text}: musí platit 1 ≤ i ≤ N")
+    return Shard(index, count)
+
+
+def shard_stats_path(base, shard: Shard) -> Path:
+    return Path(f"{base}.{shard.suffix}.stats.json")
+
+
+def save_shard_stats(base, shard: Shard, stats: dict) -> Path:
+    """Atomicky uloží statistiky shardu (<base>.shard-i-of-N.stats.json)."""
+    path = shard_stats_path(base, shard)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"shard": str(shard), **stats,
+                   "finished": datetime.now().strftime("%Y-%m-%d %H:%M:%S")},
+                  f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def load_shard_stats(base, count: int) -> tuple[dict, list[dict], list[int]]:
+    """
+    Sečte statistiky všech `count` shardů. Vrátí (součet, statistiky
+    jednotlivých shardů, čísla shardů bez souboru). Čísla se sčítají,
+    slovníky (např. kategorie → počet) po klíčích.
+    """
+    total: dict = {}
+    parts, missing = [], []
+    for index in range(1, count + 1):
+        try:
+            with open(shard_stats_path(base, Shard(index, count)), encoding="utf-8") as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            missing.append(index)
+            continue
+        parts.append(stats)
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                merged = total.setdefault(key, {})
+                for name, n in value.items():
+                    merged[name] = merged.get(name, 0) + n
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                total[key] = total.get(key, 0) + value
+    return total, parts, missing
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+MLP Re-kategorizace
+===================
+Po úpravě pravidel kategorizace (TOPIC_EXACT, TOPIC_KEYWORDS,
+FOREIGN_SURNAMES … v mlp_category.py) přepočítá kategorie všech knih
+z MLP, které už jsou ve Strapi, a změní jen ty, kterým nová pravidla
+dávají jinou kategorii – místo nového importu jen pár set zápisů.
+
+Postup:
+  1. jedním průchodem stránek načte katalog (mlpId, název, autor, kategorie)
+  2. témata MARC 650 (ve Strapi nejsou) vezme z lokálního zrcadla
+     mlp_store.sqlite, případně z --input (výstup mlp_scraper.py)
+  3. lokálně přepočítá kategorie (mlp_category.py, s cache)
+  4. změněné knihy aktualizuje souběžně (nejvýš --workers požadavků)
+
+Knihy, jejichž témata neznají zrcadlo ani --input, se přeskočí – bez
+témat by dostaly jinou kategorii než při importu. S --all se kategorizují
+jen podle titulu a autora.
+
+Spuštění:
+    python3 mlp_recategorize.py --dry-run            # jen report rozdílů
+    python3 mlp_recategorize.py --url http://localhost:1337 --token <TOKEN>
+    python3 mlp_recategorize.py --input mlp_books.json --workers 8
+"""
+
+import argparse
+import os
+import re
+import sys
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from mlp_category import CATEGORIZER
+from mlp_http import StrapiClient
+from mlp_store import STORE_FILE, RecordStore
+from mlp_strapi import iter_pages, iter_rows, load_name_map
+from mlp_types import iter_books
+
+# ── Encoding fix (Windows) ───────────────────────────────────────────────────
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+if hasattr(sys.stderr, "reconfigure"):
+    sys.stderr.reconfigure(encoding="utf-8", errors="replace")
+
+# ── Konfigurace ───────────────────────────────────────────────────────────────
+STRAPI_URL   = os.getenv("STRAPI_URL",   "http://localhost:1337")
+STRAPI_TOKEN = os.getenv("STRAPI_TOKEN", "")
+
+WORKERS   = 4      # souběžné Strapi požadavky
+PAGE_SIZE = 100    # knih na stránku při čtení katalogu
+
+
+# ── Pomocné funkce ────────────────────────────────────────────────────────────
+
+def slugify(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.lower()
+    text = re.sub(r"[^a-z0-9\s-]", "", text)
+    text = re.sub(r"\s+", "-", text.strip())
+    text = re.sub(r"-+", "-", text).strip("-")
+    return text[:200]
+
+
+# ── Strapi API ─────────────────────────────────────────────────────────────────
+
+# Keep-alive spojení na Strapi (po --url/--token se vytvoří znovu v main)
+_strapi = StrapiClient(STRAPI_URL, STRAPI_TOKEN)
+
+
+def strapi_post(path: str, data: dict) -> dict:
+    resp = _strapi.request("POST", path, json=data, timeout=20)
+    if not resp.ok:
+        raise Exception(f"POST {path} → {resp.status_code}: {resp.text[:300]}")
+    return resp.json()
+
+
+def strapi_put(path: str, data: dict, params: Optional[dict] = None) -> dict:
+    resp = _strapi.request("PUT", path, json=data, params=params, timeout=20)
+    if not resp.ok:
+        raise Exception(f"PUT {path} → {resp.status_code}: {resp.text[:300]}")
+    return resp.json()
+
+
+# ── Katalog ───────────────────────────────────────────────────────────────────
+
+def load_catalogue() -> list:
+    """
+    Všechny knihy z MLP (i nepublikované): documentId, title, mlpId + jméno
+    autora a kategorie. Čte draft verze – v Strapi 5 ji má každý dokument.
+    """
+    books = []
+    for page, data in enumerate(iter_pages(_strapi, "/api/books", {
+            "filters[mlpId][$notNull]": "true",
+            "fields[0]": "title",
+            "fields[1]": "mlpId",
+            "fields[2]": "documentId",
+            "populate[author][fields][0]": "name",
+            "populate[category][fields][0]": "name",
+            "status": "draft",   # vrátí i drafty (publicationState je jen Strapi v4)
+    }, page_size=PAGE_SIZE), 1):
+        books.extend(data)
+        print(f"  ↺  Stránka {page} – {len(books)} knih", flush=True)
+    return books
+
+
+def load_published() -> set:
+    """documentId knih z MLP, které mají publikovanou verzi."""
+    return {book["documentId"] for book in iter_rows(_strapi, "/api/books", {
+        "filters[mlpId][$notNull]": "true",
+        "fields[0]": "documentId",
+    }, page_size=PAGE_SIZE)}
+
+
+def load_topics(input_path: str = "", use_store: bool = True) -> dict:
+    """mlpId → témata (MARC 650) z lokálního zrcadla a/nebo výstupu scraperu."""
+    topics = {}
+    if use_store and STORE_FILE.exists():
+        with RecordStore(STORE_FILE) as store:
+            for book in store.books():
+                topics[book.mlp_id] = book.topics
+        print(f"  ✓ Lokální zrcadlo: témata {len(topics)} knih", flush=True)
+    if input_path:
+        count = 0
+        for book in iter_books(input_path):
+            topics[book.mlp_id] = book.topics
+            count += 1
+        print(f"  ✓ {input_path}: témata {count} knih", flush=True)
+    return topics
+
+
+# ── Kategorie ─────────────────────────────────────────────────────────────────
+
+_category_cache: dict = {}
+
+
+def load_categories() -> None:
+    """Načte všechny kategorie (název → documentId) jedním průchodem stránek."""
+    for name, doc_id in load_name_map(_strapi, "/api/categories").items():
+        _category_cache.setdefault(name, doc_id)
+
+
+def find_or_create_category(name: str, dry_run: bool = False) -> Optional[str]:
+    if name in _category_cache:
+        return _category_cache[name]
+    if dry_run:
+        _category_cache[name] = f"dry-cat-{slugify(name)}"
+        return _category_cache[name]
+    try:
+        result = strapi_post("/api/categories",
+                             {"data": {"name": name, "slug": slugify(name)}})
+        doc_id = result["data"]["documentId"]
+        _category_cache[name] = doc_id
+        print(f"    ✓ Kategorie vytvořena: {name}", flush=True)
+        return doc_id
+    except Exception as e:
+        print(f"    ✗ Nelze vytvořit kategorii '{name}': {e}", flush=True)
+        return None
+
+
+def _name(relation: Optional[dict]) -> Optional[str]:
+    return relation.get("name") if relation else None
+
+
+# ── Hlavní program ─────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Přepočítá kategorie knih z MLP podle aktuálních pravidel")
+    parser.add_argument("--url",      default="", help="Strapi URL (přepíše env STRAPI_URL)")
+    parser.add_argument("--token",    default="", help="Strapi API token (přepíše env STRAPI_TOKEN)")
+    parser.add_argument("--dry-run",  action="store_true",
+                        help="Jen vypsat rozdíly, nic nezapisovat")
+    parser.add_argument("--input",    default="",
+                        help="Výstup mlp_scraper.py jako další zdroj témat (JSON/JSONL)")
+    parser.add_argument("--no-store", action="store_true", help="Nepoužívat lokální zrcadlo MLP")
+    parser.add_argument("--all",      action="store_true",
+                        help="Kategorizovat i knihy s neznámými tématy (jen podle titulu a autora)")
+    parser.add_argument("--workers",  type=int, default=WORKERS,
+                        help=f"Souběžných Strapi požadavků (default: {WORKERS})")
+    args = parser.parse_args()
+
+    global STRAPI_URL, STRAPI_TOKEN, _strapi
+    if args.url:
+        STRAPI_URL = args.url
+    if args.token:
+        STRAPI_TOKEN = args.token
+    _strapi = StrapiClient(STRAPI_URL, STRAPI_TOKEN)
+
+    run_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print("=" * 65, flush=True)
+    print(f"  MLP Re-kategorizace  [{run_time}]", flush=True)
+    print("=" * 65, flush=True)
+    print(f"  Strapi:   {STRAPI_URL}", flush=True)
+    print(f"  Token:    {'nastaven ✓' if STRAPI_TOKEN else '⚠ NENÍ nastaven'}", flush=True)
+    print(f"  Dry-run:  {'ANO' if args.dry_run else 'NE'}", flush=True)
+    print(f"  Pravidla: {CATEGORIZER.fingerprint}", flush=True)
+    print(flush=True)
+
+    if not args.dry_run and not STRAPI_TOKEN:
+        print("  ⚠ STRAPI_TOKEN není nastaven!", flush=True)
+        sys.exit(1)
+
+    # 1. Katalog a témata
+    print("  Načítám katalog ze Strapi...", flush=True)
+    books = load_catalogue()
+    print(f"  ✓ {len(books)} knih z MLP\n", flush=True)
+    topics = load_topics(args.input, use_store=not args.no_store)
+
+    # 2. Lokální přepočet – jen knihy, kterým se kategorie mění
+    changes = []
+    unknown = 0
+    for book in books:
+        mlp_id = book.get("mlpId")
+        if mlp_id not in topics and not args.all:
+            unknown += 1
+            continue
+        new = CATEGORIZER.pick(topics.get(mlp_id, ()), author=_name(book.get("author")),
+                               title=book.get("title"))
+        old = _name(book.get("category"))
+        if new != old:
+            changes.append((book, old, new))
+
+    transitions = Counter((old, new) for _, old, new in changes)
+    print(flush=True)
+    print(f"  Změna kategorie: {len(changes)} z {len(books) - unknown} knih"
+          + (f"  (bez známých témat přeskočeno {unknown})" if unknown else ""), flush=True)
+    for (old, new), count in transitions.most_common():
+        print(f"    {old or '—':<28} → {new:<28} {count:>5}", flush=True)
+    print(flush=True)
+
+    if args.dry_run:
+        for book, old, new in changes:
+            title = (book.get("title") or "")[:50]
+            print(f"  [DRY] {title:<50} | {old or '—'} → {new}", flush=True)
+        print("=" * 65, flush=True)
+        return
+
+    if not changes:
+        print("  Žádné změny – kategorie odpovídají pravidlům.", flush=True)
+        print("=" * 65, flush=True)
+        return
+
+    # 3. Cílové kategorie – každá se hledá/zakládá jen jednou
+    load_categories()
+    for new in sorted({new for _, _, new in changes}):
+        find_or_create_category(new)
+
+    # 4. Aktualizace knih (souběžně, nejvýš --workers najednou). PUT bez
+    # status dokument publikuje – nepublikované knihy se mění jen jako draft
+    published = load_published()
+
+    def update(change: tuple) -> tuple:
+        book, old, new = change
+        title = (book.get("title") or "")[:50]
+        category_id = _category_cache.get(new)
+        if not category_id:
+            return "error", f"  ✗ {title:<50} | kategorie '{new}' není ve Strapi"
+        try:
+            strapi_put(f"/api/books/{book['documentId']}", {"data": {"category": category_id}},
+                       params=None if book["documentId"] in published else {"status": "draft"})
+            return "ok", f"  ✓ {title:<50} | {old or '—'} → {new}"
+        except Exception as e:
+            return "error", f"  ✗ {title:<50} | {e}"
+
+    updated = errors = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for result, message in pool.map(update, changes):
+            print(message, flush=True)
+            if result == "ok":
+                updated += 1
+            else:
+                errors += 1
+
+    print(flush=True)
+    print("=" * 65, flush=True)
+    print(f"  ✓ Přeřazeno:  {updated}", flush=True)
+    print(f"  ✗ Chyby:      {errors}", flush=True)
+    print("=" * 65, flush=True)
+
+
+if __name__ == "__main__":
+    main()
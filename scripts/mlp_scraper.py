@@ -10,112 +10,39 @@ Spuštění:
     python mlp_scraper.py --limit 100
     python mlp_scraper.py --limit 0  # všechny (~3400)
     python mlp_scraper.py --output moje_knihy.json
+    python mlp_scraper.py --limit 0 --output mlp_books.jsonl.gz   # JSON Lines + gzip
+    python mlp_scraper.py --limit 0 --store   # zároveň naplní lokální zrcadlo
+    python mlp_scraper.py --limit 0 --parallel 4   # 4 souběžná datumová okna
 """
 
 import argparse
-import json
+import queue
 import sys
-import time
+import threading
 import unicodedata
 import xml.etree.ElementTree as ET
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Iterator, Optional
 
 import requests
 
+import mlp_oai
+from mlp_oai import GRANULARITY_DAY, OAI_PREFIX, OAI_SET, OAIError, OAIHarvest
+from mlp_store import STORE_FILE, RecordStore
+from mlp_types import Book, BookWriter, book_format
+
 # Oprava Windows cp1250 encoding – nutné pro české znaky a emoji v konzoli
 if hasattr(sys.stdout, "reconfigure"):
     sys.stdout.reconfigure(encoding="utf-8", errors="replace")
 if hasattr(sys.stderr, "reconfigure"):
     sys.stderr.reconfigure(encoding="utf-8", errors="replace")
 
-# OAI-PMH endpoint MLP
-OAI_BASE = "http://web2.mlp.cz/cgi/oai"
-OAI_SET = "ebook"
-OAI_PREFIX = "marc21"
-
-# XML namespaces
-NS_OAI = "http://www.openarchives.org/OAI/2.0/"
-NS_MARC = "http://www.loc.gov/MARC21/slim"
-
-# Formáty ke stažení (ext → label)
-FORMAT_MAP = {
-    "epub": "EPUB",
-    "pdf": "PDF",
-    "prc": "PRC",
-    "mobi": "MOBI",
-    "txt": "TXT",
-    "html": "HTML",
-    "rtf": "RTF",
-    "pdb": "PDB",
-}
-
-# Prioritní formáty pro náš web (ostatní ignorujeme pro přehlednost)
-PRIORITY_FORMATS = {"epub", "pdf", "prc", "mobi"}
-
 
 # ──────────────────────────────────────────────
-# MARC21 helpers
+# Pomocné funkce
 # ──────────────────────────────────────────────
 
-def get_subfield(record: ET.Element, tag: str, code: str) -> Optional[str]:
-    """Vrátí první hodnotu subfieldu z MARC21 záznamu."""
-    for field in record.findall(f".//{{{NS_MARC}}}datafield[@tag='{tag}']"):
-        sf = field.find(f"{{{NS_MARC}}}subfield[@code='{code}']")
-        if sf is not None and sf.text:
-            return sf.text.strip()
-    return None
-
-
-def get_all_subfields(record: ET.Element, tag: str, code: str) -> list[str]:
-    """Vrátí všechny hodnoty subfieldu."""
-    results = []
-    for field in record.findall(f".//{{{NS_MARC}}}datafield[@tag='{tag}']"):
-        sf = field.find(f"{{{NS_MARC}}}subfield[@code='{code}']")
-        if sf is not None and sf.text:
-            results.append(sf.text.strip())
-    return results
-
-
-def parse_856_fields(record: ET.Element) -> tuple[list[dict], Optional[str]]:
-    """
-    Zpracuje všechna pole 856 (URL linky).
-    Vrátí (seznam download linků, URL obálky).
-    """
-    links = []
-    cover_url = None
-
-    for field in record.findall(f".//{{{NS_MARC}}}datafield[@tag='856']"):
-        url_el = field.find(f"{{{NS_MARC}}}subfield[@code='u']")
-        label_el = field.find(f"{{{NS_MARC}}}subfield[@code='z']")
-
-        if url_el is None or not url_el.text:
-            continue
-
-        url = url_el.text.strip()
-        label = label_el.text.strip() if label_el is not None else ""
-
-        # Detekce obálky
-        if url.endswith(".jpg") or "obálka" in label.lower() or "obalka" in label.lower():
-            cover_url = url
-            continue
-
-        # Detekce formátu
-        ext = url.rsplit(".", 1)[-1].lower() if "." in url else ""
-        if ext in FORMAT_MAP:
-            links.append({
-                "url": url,
-                "format": FORMAT_MAP[ext],
-                "ext": ext,
-                "label": label,
-            })
-
-    # Seřadit podle priority (epub první)
-    priority_order = ["epub", "pdf", "prc", "mobi", "html", "txt", "rtf", "pdb"]
-    links.sort(key=lambda x: priority_order.index(x["ext"]) if x["ext"] in priority_order else 99)
-
-    return links, cover_url
-
-
 def slugify(text: str) -> str:
     """Převede text na URL slug."""
     text = unicodedata.normalize("NFKD", text)
@@ -128,156 +55,236 @@ def slugify(text: str) -> str:
 
 
 # ──────────────────────────────────────────────
-# Zpracování záznamu
+# OAI-PMH stránkování
 # ──────────────────────────────────────────────
 
-def parse_record(record_el: ET.Element) -> Optional[dict]:
-    """Zpracuje jeden OAI-PMH záznam, vrátí dict nebo None."""
+# Lokální zrcadlo (mlp_store.py) – plní se jen s --store
+_store: Optional[RecordStore] = None
 
-    # Zkontrolujeme, zda záznam není smazán
-    header = record_el.find(f"{{{NS_OAI}}}header")
-    if header is not None and header.get("status") == "deleted":
-        return None
-
-    marc = record_el.find(f".//{{{NS_MARC}}}record")
-    if marc is None:
-        return None
+# --parallel: kolik datumových oken připadá na jedno vlákno (nerovnoměrně
+# zaplněná okna se tak rozloží mezi vlákna)
+WINDOWS_PER_WORKER = 4
 
-    # OAI identifikátor
-    id_el = header.find(f"{{{NS_OAI}}}identifier") if header is not None else None
-    oai_id = id_el.text.strip() if id_el is not None else None
+# --parallel: nejvýš knih ve frontě jednoho okna – okna dál než čtenář
+# počkají, místo aby držela celé stažené okno v paměti
+WINDOW_BUFFER = 500
 
-    # Název – MARC 245 $a (hlavní) + $b (vedlejší)
-    title_a = get_subfield(marc, "245", "a") or ""
-    title_b = get_subfield(marc, "245", "b") or ""
-    title = (title_a.rstrip("/ :") + (" " + title_b.rstrip("/ :") if title_b else "")).strip()
-    if not title:
-        return None
 
-    # Autor – MARC 100 $a (primární), nebo 700 $a (přidaný)
-    author = get_subfield(marc, "100", "a") or get_subfield(marc, "700", "a")
-    if author:
-        author = author.rstrip(",. ").strip()
-
-    # Popis – MARC 520 $a
-    description = get_subfield(marc, "520", "a")
-
-    # Rok vydání – z MARC 008 (znaky 7-10)
-    year = None
-    ctrl008 = marc.find(f".//{{{NS_MARC}}}controlfield[@tag='008']")
-    if ctrl008 is not None and ctrl008.text and len(ctrl008.text) >= 11:
-        year_str = ctrl008.text[7:11].strip()
-        if year_str.isdigit():
-            year = int(year_str)
-
-    # Témata – MARC 650 $a
-    topics = get_all_subfields(marc, "650", "a")
-    topics = [t.rstrip(".,;") for t in topics if t]
-
-    # Linky ke stažení a obálka
-    links, cover_url = parse_856_fields(marc)
-
-    # Filtrujeme jen prioritní formáty pro náš web
-    main_links = [lnk for lnk in links if lnk["ext"] in PRIORITY_FORMATS]
-
-    if not main_links:
-        return None  # Kniha bez stažitelných formátů – přeskočíme
-
-    return {
-        "mlpId": oai_id,
-        "title": title,
-        "slug": slugify(title),
-        "author": author,
-        "description": description,
-        "year": year,
-        "topics": topics,
-        "coverUrl": cover_url,
-        "links": main_links,  # jen EPUB, PDF, PRC, MOBI
-        "allLinks": links,    # kompletní seznam pro referenci
-    }
+def parse_record(record_el: ET.Element) -> Optional[Book]:
+    """Zpracuje jeden OAI-PMH záznam, vrátí Book nebo None."""
+    fields = mlp_oai.parse_fields(record_el)
+    if _store is not None:
+        _store.put_record(record_el, fields)
+    return mlp_oai.with_slug(fields, slugify) if fields else None
 
 
-# ──────────────────────────────────────────────
-# OAI-PMH stránkování
-# ──────────────────────────────────────────────
-
-def fetch_all_records(limit: int = 20, delay: float = 1.0) -> list[dict]:
+def fetch_all_records(limit: int = 20) -> Iterator[Book]:
     """
-    Stáhne záznamy z OAI-PMH endpointu.
-    limit=0 znamená stáhnout vše.
+    Stahuje záznamy z OAI-PMH endpointu a vrací je průběžně (generátor).
+    limit=0 znamená stáhnout vše. Tempo řídí sdílený mlp_oai.LIMITER.
     """
-    books = []
-    params = {
-        "verb": "ListRecords",
-        "set": OAI_SET,
-        "metadataPrefix": OAI_PREFIX,
-    }
-    resumption_token = None
-    page = 0
+    count = 0
 
-    while True:
-        page += 1
-        print(f"  Stránka {page} | staženo: {len(books)}", end="")
+    def on_page(harvest: OAIHarvest) -> None:
+        if _store is not None:
+            _store.commit()
+        print(f"  Stránka {harvest.page} | staženo: {count}", end="")
         if limit > 0:
             print(f" / {limit}", end="")
         print()
 
-        if resumption_token:
-            params = {"verb": "ListRecords", "resumptionToken": resumption_token}
+    harvest = OAIHarvest({
+        "verb": "ListRecords",
+        "set": OAI_SET,
+        "metadataPrefix": OAI_PREFIX,
+    }, parse=parse_record, on_page=on_page)
+
+    for book in harvest:
+        count += 1
+        print(f"    [{count:>4}] {book.title[:60]:<60} – {book.author or '—'}")
+        yield book
+
+        if limit > 0 and count >= limit:
+            print(f"\n  ✓ Dosažen limit {limit} knih")
+            return
+
+    if harvest.error:
+        code, message = harvest.error
+        if code == "http":
+            print(f"\n  ✗ Chyba při stahování: {message}")
+        elif code == "xml":
+            print(f"\n  ✗ Chyba XML parsování: {message}")
+        else:
+            print(f"\n  ✗ OAI chyba [{code}]: {message}")
+    else:
+        print("  ✓ Žádné další stránky")
 
-        try:
-            resp = requests.get(OAI_BASE, params=params, timeout=30)
-            resp.raise_for_status()
-        except requests.RequestException as e:
-            print(f"\n  ✗ Chyba při stahování: {e}")
-            break
 
-        try:
-            root = ET.fromstring(resp.content)
-        except ET.ParseError as e:
-            print(f"\n  ✗ Chyba XML parsování: {e}")
-            break
-
-        list_records = root.find(f"{{{NS_OAI}}}ListRecords")
-        if list_records is None:
-            print("  ✗ ListRecords element nenalezen")
-            break
-
-        for record_el in list_records.findall(f"{{{NS_OAI}}}record"):
-            book = parse_record(record_el)
-            if book:
-                books.append(book)
-                print(f"    [{len(books):>4}] {book['title'][:60]:<60} – {book.get('author', '—')}")
-
-            if limit > 0 and len(books) >= limit:
-                print(f"\n  ✓ Dosažen limit {limit} knih")
-                return books
-
-        # Resumption token pro další stránku
-        token_el = list_records.find(f"{{{NS_OAI}}}resumptionToken")
-        if token_el is not None and token_el.text and token_el.text.strip():
-            resumption_token = token_el.text.strip()
-            time.sleep(delay)
-        else:
-            print("  ✓ Žádné další stránky")
-            break
+def harvest_windows(parts: int) -> Optional[list]:
+    """
+    Rozdělí celou sadu na datumová okna (from, until) od earliestDatestamp
+    z Identify do teď. Zná-li lokální zrcadlo datestampy, řídí se hranice
+    oken jejich rozložením, jinak se čas dělí rovnoměrně.
+    Vrátí None, pokud Identify selže.
+    """
+    try:
+        info = mlp_oai.identify()
+    except (requests.RequestException, ET.ParseError, OAIError) as e:
+        print(f"  ⚠ Identify selhal ({e}) – stahuji sekvenčně")
+        return None
+    earliest = info.get("earliestDatestamp")
+    if not earliest:
+        print("  ⚠ Identify nevrátil earliestDatestamp – stahuji sekvenčně")
+        return None
+    granularity = info.get("granularity") or GRANULARITY_DAY
+
+    datestamps = []
+    if STORE_FILE.exists():
+        with RecordStore(STORE_FILE) as store:
+            datestamps = list(store.datestamps().values())
+    if len(datestamps) >= parts:
+        return mlp_oai.split_by_datestamps(earliest, datestamps, parts, granularity)
+    return mlp_oai.split_date_range(earliest, datetime.now(timezone.utc), parts, granularity)
+
 
-    return books
+def fetch_parallel(workers: int, limit: int = 0) -> Iterator[Book]:
+    """
+    Stahuje celou sadu souběžně po datumových oknech – každé okno má
+    vlastní řetěz resumptionTokenů, tempo hlídá sdílený mlp_oai.LIMITER.
+    Knihy vrací bez duplicit podle mlpId: záznam změněný během harvestu
+    dostane nový datestamp a objeví se znovu v posledním (otevřeném) okně.
+    To se proto stahuje i čte jako první a jeho kopie vyhrává, ostatní
+    okna pak jdou v pořadí od nejstaršího.
+    """
+    windows = harvest_windows(workers * WINDOWS_PER_WORKER)
+    if windows is None:
+        yield from fetch_all_records(limit)
+        return
+    print(f"  Souběžně: {workers} vláken, {len(windows)} oken "
+          f"({windows[0][0]} … {windows[-1][1] or 'teď'})\n")
+
+    results = [queue.Queue(maxsize=WINDOW_BUFFER) for _ in windows]
+    errors = {}
+    stop = threading.Event()
+
+    def put(index: int, item: Optional[Book]) -> bool:
+        """Vloží do fronty okna; při plné frontě čeká, dokud čtenář neskončí."""
+        while not stop.is_set():
+            try:
+                results[index].put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def harvest_window(index: int) -> None:
+        if stop.is_set():
+            return
+        start, end = windows[index]
+        params = {"verb": "ListRecords", "set": OAI_SET, "metadataPrefix": OAI_PREFIX,
+                  "from": start}
+        if end:
+            params["until"] = end
+
+        def on_page(harvest: OAIHarvest) -> None:
+            if _store is not None:
+                _store.commit()
+            print(f"  Okno {index + 1}/{len(windows)} | stránka {harvest.page}")
+
+        harvest = OAIHarvest(params, parse=parse_record, on_page=on_page)
+        try:
+            for book in harvest:
+                if not put(index, book):
+                    break
+        finally:
+            if harvest.error and harvest.error[0] != "noRecordsMatch":
+                errors[index] = harvest.error
+            put(index, None)
+
+    # Čtenář čeká na okna ve stejném pořadí, v jakém se spouštějí – okno,
+    # na které čeká, tak vždy běží (ostatní při plné frontě jen počkají)
+    order = [len(windows) - 1, *range(len(windows) - 1)]
+    seen = set()
+    count = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="oai-window") as pool:
+        for index in order:
+            pool.submit(harvest_window, index)
+        try:
+            for index in order:
+                while (book := results[index].get()) is not None:
+                    if book.mlp_id in seen:
+                        continue
+                    seen.add(book.mlp_id)
+                    count += 1
+                    print(f"    [{count:>4}] {book.title[:60]:<60} – {book.author or '—'}")
+                    yield book
+                    if limit > 0 and count >= limit:
+                        print(f"\n  ✓ Dosažen limit {limit} knih")
+                        return
+        finally:
+            # Vlákna oken při plné frontě hlídají stop – nečekají věčně
+            stop.set()
+
+    for index, (code, message) in sorted(errors.items()):
+        start, end = windows[index]
+        print(f"\n  ✗ Okno {start} … {end or 'teď'}: chyba [{code}]: {message}")
+    if not errors:
+        print("  ✓ Všechna okna stažena")
 
 
 # ──────────────────────────────────────────────
 # Hlavní program
 # ──────────────────────────────────────────────
 
+class ScrapeStats:
+    """Souhrnné statistiky počítané průběžně při zápisu (bez druhého průchodu)."""
+
+    def __init__(self):
+        self.count = 0
+        self.with_cover = 0
+        self.with_desc = 0
+        self.formats: dict[str, int] = {}
+        self.first: Optional[Book] = None
+
+    def add(self, book: Book) -> None:
+        if self.first is None:
+            self.first = book
+        self.count += 1
+        self.with_cover += bool(book.cover_url)
+        self.with_desc += bool(book.description)
+        for lnk in book.links:
+            self.formats[lnk.ext] = self.formats.get(lnk.ext, 0) + 1
+
+
 def main():
     parser = argparse.ArgumentParser(description="MLP OAI-PMH Scraper")
     parser.add_argument("--limit", type=int, default=20,
                         help="Počet knih ke stažení (0 = vše, default: 20)")
-    parser.add_argument("--output", default="mlp_books.json",
-                        help="Výstupní JSON soubor (default: mlp_books.json)")
+    parser.add_argument("--output", default=None,
+                        help="Výstupní soubor (default: mlp_books.json, s --format jsonl "
+                             "mlp_books.jsonl; .jsonl = JSON Lines, .gz = gzip)")
+    parser.add_argument("--format", choices=("json", "jsonl"), default=None,
+                        help="Formát výstupu: json (pole) nebo jsonl (kniha na řádek); "
+                             "výchozí podle přípony --output, musí s ní souhlasit")
     parser.add_argument("--delay", type=float, default=1.0,
-                        help="Pauza mezi stránkami v sekundách (default: 1.0)")
+                        help="Výchozí pauza mezi požadavky v sekundách, dál se "
+                             "přizpůsobuje odezvě serveru (default: 1.0)")
+    parser.add_argument("--parallel", type=int, default=1, metavar="N",
+                        help="Stahovat N datumových oken souběžně (default: 1 = sekvenčně)")
+    parser.add_argument("--store", action="store_true",
+                        help="Ukládat záznamy i do lokálního zrcadla (mlp_store.sqlite)")
     args = parser.parse_args()
+    if args.output is None:
+        args.output = f"mlp_books.{args.format or 'json'}"
+    # Importy poznají formát souboru jen podle přípony
+    if args.format and args.format != book_format(args.output):
+        parser.error(f"--format {args.format} nesouhlasí s příponou --output {args.output} "
+                     f"(čte se jako {book_format(args.output)})")
+    mlp_oai.LIMITER.reset(args.delay)
+
+    global _store
+    if args.store:
+        _store = RecordStore()
 
     print("=" * 60)
     print("  MLP E-books Scraper")
@@ -287,40 +294,44 @@ def main():
         print(f"  Režim: stáhnout VŠECHNY knihy")
     else:
         print(f"  Limit: {args.limit} knih")
-    print(f"  Výstup: {args.output}")
+    print(f"  Výstup: {args.output} ({args.format or book_format(args.output)})")
     print()
 
-    books = fetch_all_records(limit=args.limit, delay=args.delay)
-
-    with open(args.output, "w", encoding="utf-8") as f:
-        json.dump(books, f, ensure_ascii=False, indent=2)
+    if args.parallel > 1:
+        books = fetch_parallel(args.parallel, limit=args.limit)
+    else:
+        books = fetch_all_records(limit=args.limit)
+
+    # Každá kniha se zapíše hned po zparsování a soubor se flushuje po
+    # mlp_types.FLUSH_EVERY knihách – pád uprostřed harvestu přijde nejvýš
+    # o posledních pár knih (JSONL zůstane čitelné i bez konce)
+    stats = ScrapeStats()
+    try:
+        with BookWriter(args.output, args.format) as writer:
+            for book in books:
+                writer.write(book)
+                stats.add(book)
+    finally:
+        if _store is not None:
+            _store.close()
 
     print()
     print("=" * 60)
-    print(f"  ✓ Uloženo {len(books)} knih → {args.output}")
-
-    # Statistiky
-    with_cover = sum(1 for b in books if b.get("coverUrl"))
-    with_desc = sum(1 for b in books if b.get("description"))
-    formats = {}
-    for b in books:
-        for lnk in b.get("links", []):
-            formats[lnk["ext"]] = formats.get(lnk["ext"], 0) + 1
-
-    print(f"  📸 S obálkou:   {with_cover}/{len(books)}")
-    print(f"  📝 S popisem:   {with_desc}/{len(books)}")
-    print(f"  📁 Formáty:     {dict(sorted(formats.items(), key=lambda x: -x[1]))}")
+    print(f"  ✓ Uloženo {stats.count} knih → {args.output}")
+    print(f"  📸 S obálkou:   {stats.with_cover}/{stats.count}")
+    print(f"  📝 S popisem:   {stats.with_desc}/{stats.count}")
+    print(f"  📁 Formáty:     {dict(sorted(stats.formats.items(), key=lambda x: -x[1]))}")
     print("=" * 60)
 
-    if books:
+    if stats.first is not None:
         print("\n  Ukázka první knihy:")
-        b = books[0]
-        print(f"    Název:   {b['title']}")
-        print(f"    Autor:   {b.get('author', '—')}")
-        print(f"    Obálka:  {b.get('coverUrl', '—')}")
-        print(f"    Linky:   {[f['format'] for f in b['links']]}")
-        if b.get("description"):
-            print(f"    Popis:   {b['description'][:120]}...")
+        b = stats.first
+        print(f"    Název:   {b.title}")
+        print(f"    Autor:   {b.author or '—'}")
+        print(f"    Obálka:  {b.cover_url or '—'}")
+        print(f"    Linky:   {[f.format for f in b.links]}")
+        if b.description:
+            print(f"    Popis:   {b.description[:120]}...")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+MLP lokální zrcadlo záznamů
+===========================
+SQLite soubor s harvestovanými OAI-PMH záznamy MLP, klíčem je OAI
+identifier (mlpId). Ke každému záznamu drží datestamp, příznak smazání,
+surový MARC21 XML a rozparsovaná pole knihy (JSON, bez slugu).
+
+Plní ho průběžně harvest v mlp_sync.py (a mlp_scraper.py --store),
+případně tento skript. Ostatní nástroje se místo OAI ptají lokálně –
+např. mlp_fix_missing_authors.py hledá autory jedním SQL dotazem.
+Sync v režimu --diff podle datestampů pozná, co se od minula změnilo.
+
+Spuštění:
+    python3 mlp_store.py              # přírůstkový harvest (od posledního datestampu)
+    python3 mlp_store.py --full       # kompletní harvest celé sady ebook
+    python3 mlp_store.py --stats      # jen statistiky zrcadla
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Iterable, Optional
+
+import mlp_oai
+import mlp_xml
+from mlp_oai import GRANULARITY_SECONDS, OAI_PREFIX, OAI_SET, OAIHarvest
+from mlp_types import Book
+
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+if hasattr(sys.stderr, "reconfigure"):
+    sys.stderr.reconfigure(encoding="utf-8", errors="replace")
+
+STORE_FILE = Path(__file__).parent / "mlp_store.sqlite"
+
+OAI_DELAY = 1.5      # výchozí rozestup OAI požadavků (s), limiter ho pak přizpůsobí
+
+# Limit počtu parametrů v jednom SQL dotazu (SQLite má 999 / 32766)
+_SQL_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    identifier TEXT PRIMARY KEY,
+    datestamp  TEXT NOT NULL,
+    deleted    INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Sloupce přidané ke schématu indexu hlaviček (migrace starších souborů)
+_COLUMNS = {
+    "author":   "TEXT",
+    "title":    "TEXT",
+    "book":     "TEXT",   # JSON polí knihy (mlp_oai.parse_fields), NULL = nelze importovat
+    "marc_xml": "TEXT",
+}
+
+
+class RecordStore:
+    """
+    Lokální zrcadlo OAI záznamů MLP. Zápisy jsou chráněné zámkem, takže
+    ho můžou sdílet souběžné harvesty (mlp_scraper.py --parallel).
+    S readonly=True jen čte existující soubor (nezaloží ho ani nemigruje).
+    """
+
+    def __init__(self, path: Path = STORE_FILE, readonly: bool = False):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        if readonly:
+            self.conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True,
+                                        check_same_thread=False)
+            return
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(records)")}
+        for column, kind in _COLUMNS.items():
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE records ADD COLUMN {column} {kind}")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS records_datestamp ON records (datestamp)")
+        self.conn.commit()
+
+    def __enter__(self) -> "RecordStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+    def commit(self) -> None:
+        with self.lock:
+            self.conn.commit()
+
+    # ── Zápis ────────────────────────────────────────────────────────────────
+
+    def put_header(self, header: dict) -> None:
+        """Uloží/aktualizuje jen hlavičku záznamu (commit volá volající)."""
+        with self.lock:
+            self._put_header(header)
+
+    def _put_header(self, header: dict) -> None:
+        self.conn.execute(
+            "INSERT INTO records (identifier, datestamp, deleted) VALUES (?, ?, ?) "
+            "ON CONFLICT(identifier) DO UPDATE SET "
+            "datestamp = excluded.datestamp, deleted = excluded.deleted",
+            (header["identifier"], header["datestamp"], int(header["deleted"])))
+
+    def put_headers(self, headers: Iterable[dict]) -> None:
+        with self.lock:
+            for header in headers:
+                self._put_header(header)
+
+    def put_record(self, record_el: ET.Element, fields: Optional[Book] = None) -> None:
+        """
+        Uloží celý OAI <record>: hlavičku, surový MARC21 XML a pole knihy
+        (`fields` z mlp_oai.parse_fields, případně i se slugem – ten se zahodí).
+        """
+        header = mlp_oai.record_header(record_el)
+        if header is None:
+            return
+        marc = mlp_xml.find(record_el, "marc")
+        marc_xml = mlp_xml.tostring(marc) if marc is not None else None
+        author = mlp_oai.marc_author(marc) if marc is not None else None
+        book = None
+        if fields:
+            book = json.dumps(fields.to_dict(slug=False), ensure_ascii=False)
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO records (identifier, datestamp, deleted, author, title, book, marc_xml) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(identifier) DO UPDATE SET "
+                "datestamp = excluded.datestamp, deleted = excluded.deleted, "
+                "author = excluded.author, title = excluded.title, "
+                "book = excluded.book, marc_xml = excluded.marc_xml",
+                (header["identifier"], header["datestamp"], int(header["deleted"]),
+                 author, fields.title if fields else None, book, marc_xml))
+
+    # ── Čtení ────────────────────────────────────────────────────────────────
+
+    def datestamps(self) -> dict[str, str]:
+        """Vrátí identifier → datestamp všech známých (i smazaných) záznamů."""
+        return dict(self.conn.execute("SELECT identifier, datestamp FROM records"))
+
+    def max_datestamp(self) -> Optional[str]:
+        return self.conn.execute("SELECT MAX(datestamp) FROM records").fetchone()[0]
+
+    def get_header(self, identifier: str) -> Optional[dict]:
+        row = self.conn.execute(
+            "SELECT identifier, datestamp, deleted FROM records WHERE identifier = ?",
+            (identifier,)).fetchone()
+        if row is None:
+            return None
+        return {"identifier": row[0], "datestamp": row[1], "deleted": bool(row[2])}
+
+    def get_book(self, identifier: str) -> Optional[Book]:
+        """Pole knihy (bez slugu) nebo None."""
+        row = self.conn.execute("SELECT book FROM records WHERE identifier = ?",
+                                (identifier,)).fetchone()
+        return Book.from_dict(json.loads(row[0])) if row and row[0] else None
+
+    def get_marc(self, identifier: str) -> Optional[ET.Element]:
+        """Surový MARC21 <record> jako Element, nebo None."""
+        row = self.conn.execute("SELECT marc_xml FROM records WHERE identifier = ?",
+                                (identifier,)).fetchone()
+        return ET.fromstring(row[0]) if row and row[0] else None
+
+    def authors(self, identifiers: Iterable[str]) -> dict[str, Optional[str]]:
+        """
+        Hromadně vrátí identifier → autor pro záznamy, které zrcadlo zná
+        (s uloženým MARC). Neznámé identifikátory ve výsledku chybí.
+        """
+        ids = list(identifiers)
+        result = {}
+        for i in range(0, len(ids), _SQL_CHUNK):
+            chunk = ids[i:i + _SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT identifier, author FROM records "
+                f"WHERE marc_xml IS NOT NULL AND identifier IN ({marks})", chunk)
+            result.update(rows)
+        return result
+
+    def books(self) -> Iterable[Book]:
+        """Všechny importovatelné knihy ze zrcadla (pole bez slugu)."""
+        for (book,) in self.conn.execute(
+                "SELECT book FROM records WHERE deleted = 0 AND book IS NOT NULL "
+                "ORDER BY identifier"):
+            yield Book.from_dict(json.loads(book))
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def stats(self) -> dict:
+        row = self.conn.execute(
+            "SELECT COUNT(*), SUM(deleted), SUM(marc_xml IS NOT NULL), SUM(book IS NOT NULL), "
+            "MAX(datestamp) FROM records").fetchone()
+        return {"records": row[0], "deleted": row[1] or 0, "marc": row[2] or 0,
+                "books": row[3] or 0, "max_datestamp": row[4]}
+
+
+# ──────────────────────────────────────────────
+# Harvest do zrcadla
+# ──────────────────────────────────────────────
+
+def refresh(store: RecordStore, from_date: Optional[str] = None) -> int:
+    """Stáhne ListRecords (od from_date) do zrcadla. Vrátí počet záznamů."""
+    count = 0
+
+    def parse(record_el: ET.Element) -> None:
+        nonlocal count
+        store.put_record(record_el, mlp_oai.parse_fields(record_el))
+        count += 1
+        return None
+
+    def on_page(harvest: OAIHarvest) -> None:
+        store.commit()
+        print(f"  ↺  Stránka {harvest.page} – {count} záznamů", flush=True)
+
+    params = {"verb": "ListRecords", "set": OAI_SET, "metadataPrefix": OAI_PREFIX}
+    if from_date:
+        params["from"] = from_date
+    harvest = OAIHarvest(params, parse=parse, on_page=on_page)
+    for _ in harvest:
+        pass
+    store.commit()
+
+    if harvest.error and harvest.error[0] != "noRecordsMatch":
+        code, message = harvest.error
+        print(f"  ✗ OAI chyba [{code}]: {message}", flush=True)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MLP lokální zrcadlo OAI záznamů")
+    parser.add_argument("--full", action="store_true",
+                        help="Kompletní harvest (jinak od posledního datestampu)")
+    parser.add_argument("--stats", action="store_true",
+                        help="Jen vypsat statistiky zrcadla")
+    parser.add_argument("--db", default=str(STORE_FILE),
+                        help=f"SQLite soubor (default: {STORE_FILE.name})")
+    args = parser.parse_args()
+    mlp_oai.LIMITER.reset(OAI_DELAY)
+
+    with RecordStore(Path(args.db)) as store:
+        if not args.stats:
+            from_date = None
+            last = store.max_datestamp()
+            if last and not args.full:
+                granularity = GRANULARITY_SECONDS if len(last) > 10 else mlp_oai.GRANULARITY_DAY
+                from_date = mlp_oai.next_datestamp(last, granularity)
+            print(f"  Harvest do zrcadla {'od ' + from_date if from_date else '(kompletní)'}...",
+                  flush=True)
+            count = refresh(store, from_date)
+            print(f"  ✓ Uloženo/aktualizováno {count} záznamů", flush=True)
+
+        stats = store.stats()
+        print(f"  Zrcadlo:  {args.db}")
+        print(f"  Záznamů:  {stats['records']}  (smazaných {stats['deleted']}, "
+              f"s MARC {stats['marc']}, importovatelných {stats['books']})")
+        print(f"  Poslední datestamp: {stats['max_datestamp'] or '—'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+MLP Strapi – sdílené operace nad Strapi REST
+============================================
+Věci, které importy a sync dělají stejně a které stojí hodně požadavků,
+když se dělají po jednom:
+
+    iter_pages    – stránkování kolekce s jen potřebnými poli; po první
+                    stránce (pageCount) se zbytek stahuje souběžně
+    iter_rows     – totéž po jednotlivých záznamech
+    load_name_map – jméno → documentId celé kolekce (autoři, kategorie)
+    SlugRegistry  – obsazené slugy knih v paměti; unikátní sufix (-1, -2, …)
+                    se přidělí lokálně, bez GET na každého kandidáta
+    BulkWriter    – zápis po dávkách přes POST /api/books/bulk (jedna
+                    transakce na dávku) s výsledkem pro každou položku
+
+Použití:
+    slugs = SlugRegistry(strapi)
+    slugs.load()                                   # jednou na začátku běhu
+    result = slugs.create("/api/books", data, base_slug)
+
+    writer = BulkWriter(strapi, "authors")
+    with writer:                                   # flush() na konci bloku
+        writer.add({"name": "Čapek, Karel"}, on_done)
+    results = slugs.create_many(BulkWriter(strapi), [(data, base_slug), ...])
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterator, Optional
+
+import requests
+
+from mlp_http import StrapiClient
+
+PAGE_SIZE = 100     # Strapi výchozí maxLimit pro pagination[pageSize]
+SCAN_WORKERS = 6    # souběžně stahovaných stránek při průchodu celou kolekcí
+
+# Kolikrát zkusit další slug, když ho mezitím obsadil jiný zapisovatel
+SLUG_RETRIES = 5
+
+# Hromadný zápis (src/api/book/controllers/book.ts → bulkWrite)
+BULK_PATH = "/api/books/bulk"
+BULK_SIZE = 50      # dokumentů v jedné dávce (server přijme nejvýš 100)
+
+# Výsledek jedné položky hromadného zápisu: (documentId, None) nebo (None, error)
+WriteResult = tuple[Optional[str], Optional[dict]]
+
+
+def _get_page(strapi: StrapiClient, path: str, params: dict, page: int,
+              page_size: int, timeout) -> dict:
+    resp = strapi.request("GET", path, timeout=timeout, params={
+        **params,
+        "pagination[page]": str(page),
+        "pagination[pageSize]": str(page_size),
+    })
+    resp.raise_for_status()
+    return resp.json()
+
+
+def iter_pages(strapi: StrapiClient, path: str, params: Optional[dict] = None,
+               page_size: int = PAGE_SIZE, workers: int = SCAN_WORKERS,
+               timeout=30) -> Iterator[list]:
+    """
+    Postupně vrací `data` všech stránek kolekce (`params` = filtry, fields…).
+    První stránka prozradí pageCount, ostatní se stahují souběžně (nejvýš
+    `workers` najednou) a vracejí se v pořadí stránek, jakmile jsou hotové.
+    Bez vlastního řazení se řadí podle id, aby se stránky nepřekrývaly.
+    """
+    params = dict(params or {})
+    if not any(key.startswith("sort") for key in params):
+        params["sort[0]"] = "id:asc"
+
+    res = _get_page(strapi, path, params, 1, page_size, timeout)
+    data = res.get("data") or []
+    if data:
+        yield data
+    page_count = res.get("meta", {}).get("pagination", {}).get("pageCount", 1)
+    if not data or page_count <= 1:
+        return
+
+    pages = iter(range(2, page_count + 1))
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scan") as pool:
+        def fetch(page: int):
+            return pool.submit(_get_page, strapi, path, params, page, page_size, timeout)
+
+        pending = deque(fetch(page) for page in islice(pages, max(1, workers)))
+        while pending:
+            res = pending.popleft().result()
+            page = next(pages, None)
+            if page is not None:
+                pending.append(fetch(page))
+            data = res.get("data") or []
+            if data:
+                yield data
+
+
+def iter_rows(strapi: StrapiClient, path: str, params: Optional[dict] = None,
+              **kwargs) -> Iterator[dict]:
+    """Záznamy všech stránek kolekce jeden po druhém (viz iter_pages)."""
+    for data in iter_pages(strapi, path, params, **kwargs):
+        yield from data
+
+
+def load_name_map(strapi: StrapiClient, path: str, field: str = "name") -> dict[str, str]:
+    """Hodnota pole `field` → documentId pro celou kolekci (první výskyt vyhrává)."""
+    names = {}
+    for data in iter_pages(strapi, path, {"fields[0]": field}):
+        for item in data:
+            if item.get(field):
+                names.setdefault(item[field], item["documentId"])
+    return names
+
+
+def unique_error(error: Optional[dict], field: str) -> bool:
+    """Je `error` (objekt error z odpovědi Strapi) duplicitní hodnota pole `field`?"""
+    for item in ((error or {}).get("details") or {}).get("errors") or []:
+        if item.get("path") == [field] and "unique" in (item.get("message") or ""):
+            return True
+    return False
+
+
+def is_unique_error(resp: requests.Response, field: str) -> bool:
+    """Odmítl Strapi zápis kvůli duplicitní hodnotě unikátního pole `field`?"""
+    if resp.status_code != 400:
+        return False
+    try:
+        return unique_error(resp.json().get("error"), field)
+    except ValueError:
+        return False
+
+
+def describe_error(error: Optional[dict]) -> str:
+    """Jednořádkový popis chyby položky, např. "400 ValidationError: …"."""
+    error = error or {}
+    text = " ".join(str(part) for part in (error.get("status"), error.get("name")) if part)
+    message = error.get("message") or "neznámá chyba"
+    return f"{text}: {message}"[:300] if text else message[:300]
+
+
+def response_error(resp: requests.Response) -> dict:
+    """Objekt error z odpovědi Strapi; bez JSON těla aspoň stav a začátek textu."""
+    try:
+        error = resp.json().get("error")
+    except (ValueError, AttributeError):
+        error = None
+    if not isinstance(error, dict):
+        error = {"message": resp.text[:300]}
+    return {"status": resp.status_code, **error}
+
+
+class SlugRegistry:
+    """
+    Slugy knih v paměti. load() je načte stránkami (jen pole slug),
+    allocate() přidělí volný slug a hned ho zabere – thread-safe, takže
+    ho můžou sdílet souběžné importy. Kolize s jiným zapisovatelem (slug
+    obsazený až po load) řeší create(): slug označí a zkusí další.
+    """
+
+    def __init__(self, strapi: StrapiClient, path: str = "/api/books"):
+        self.strapi = strapi
+        self.path = path
+        self._taken: set[str] = set()
+        self._next: dict[str, int] = {}     # base → další sufix ke zkoušení
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._taken)
+
+    def load(self) -> int:
+        """Načte všechny obsazené slugy (i drafty). Vrátí jejich počet."""
+        taken = set()
+        for data in iter_pages(self.strapi, self.path, {
+                "fields[0]": "slug",
+                "status": "draft"}):     # draft verze = všechny dokumenty (Strapi 5)
+            taken.update(item["slug"] for item in data if item.get("slug"))
+        with self._lock:
+            self._taken |= taken
+        return len(taken)
+
+    def allocate(self, base_slug: str) -> str:
+        """Volný slug: `base_slug`, jinak `base_slug-1`, `-2`, … (hned obsazený)."""
+        with self._lock:
+            slug = base_slug
+            if slug in self._taken:
+                counter = self._next.get(base_slug, 1)
+                while f"{base_slug}-{counter}" in self._taken:
+                    counter += 1
+                slug = f"{base_slug}-{counter}"
+                self._next[base_slug] = counter + 1
+            self._taken.add(slug)
+            return slug
+
+    def release(self, slug: str) -> None:
+        """Uvolní přidělený slug (kniha se nakonec nevytvořila)."""
+        with self._lock:
+            self._taken.discard(slug)
+
+    def create(self, path: str, data: dict, base_slug: str,
+               retries: int = SLUG_RETRIES, timeout=20) -> dict:
+        """
+        POST {"data": data} s `data["slug"]` z allocate(). Když slug mezitím
+        zabral někdo jiný (uniqueness error), zkusí další volný. Jiná chyba
+        slug uvolní a vyhodí Exception("POST … → status: text").
+        """
+        for _ in range(retries + 1):
+            resp = self.strapi.request("POST", path, json={"data": data}, timeout=timeout)
+            if resp.ok:
+                return resp.json()
+            if not is_unique_error(resp, "slug"):
+                self.release(data["slug"])
+                raise Exception(f"POST {path} → {resp.status_code}: {resp.text[:300]}")
+            data = {**data, "slug": self.allocate(base_slug)}
+        self.release(data["slug"])
+        raise Exception(f"POST {path} → slug '{base_slug}' stále koliduje")
+
+    def create_many(self, writer: "BulkWriter", items: list[tuple[dict, str]],
+                    retries: int = SLUG_RETRIES) -> list[WriteResult]:
+        """
+        Hromadná obdoba create(): `items` jsou dvojice (data se slugem
+        z allocate(), base_slug). Položky s kolizí slugu dostanou další
+        volný slug a zapíšou se znovu; při jiné chybě se slug uvolní.
+        Vrátí výsledek pro každou položku ve stejném pořadí.
+        """
+        datas = [data for data, _ in items]
+        results: list[WriteResult] = [(None, None)] * len(items)
+        pending = list(range(len(items)))
+        for attempt in range(retries + 1):
+            retry = []
+            for i, (doc_id, error) in zip(pending, writer.write([datas[i] for i in pending])):
+                if doc_id:
+                    results[i] = (doc_id, None)
+                elif unique_error(error, "slug") and attempt < retries:
+                    datas[i] = {**datas[i], "slug": self.allocate(items[i][1])}
+                    retry.append(i)
+                else:
+                    self.release(datas[i]["slug"])
+                    if unique_error(error, "slug"):
+                        error = {"message": f"slug '{items[i][1]}' stále koliduje"}
+                    results[i] = (None, error)
+            pending = retry
+            if not pending:
+                break
+        return results
+
+
+class BulkWriter:
+    """
+    Zápis dokumentů kolekce (books / authors / categories) po dávkách
+    přes POST /api/books/bulk. Položka s documentId dokument aktualizuje,
+    ostatní se vytvoří.
+
+    Server zapisuje dávku v jedné transakci – při chybě položky nezapíše
+    nic a ostatní označí jako skipped; ty writer pošle znovu, takže každá
+    položka dostane vlastní výsledek. Když server endpoint nemá (404/405,
+    starší nasazení), writer přepne na zápis po jednom (POST / PUT).
+
+    write() zapíše seznam hned. add() položku jen přidá do bufferu a
+    `on_done(documentId, error)` zavolá až po zápisu dávky – při plném
+    bufferu, flush() nebo na konci bloku `with`. Thread-safe.
+    """
+
+    # Servery (URL), které hromadný endpoint nemají – zjistí se jednou za běh
+    _unsupported: set[str] = set()
+
+    def __init__(self, strapi: StrapiClient, collection: str = "books",
+                 size: int = BULK_SIZE, draft: bool = False, timeout=60):
+        self.strapi = strapi
+        self.collection = collection
+        self.size = max(1, size)
+        self.params = {"status": "draft"} if draft else None
+        self.timeout = timeout
+        self.requests = 0
+        self._buffer: list[tuple[dict, Optional[Callable]]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def supported(self) -> bool:
+        """False = zápis po jednom (size 1 nebo server bez hromadného endpointu)."""
+        return self.size > 1 and self.strapi.url not in BulkWriter._unsupported
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.flush()
+
+    def add(self, data: dict,
+            on_done: Optional[Callable[[Optional[str], Optional[dict]], None]] = None) -> None:
+        """Přidá položku do bufferu; plný buffer se hned zapíše."""
+        with self._lock:
+            self._buffer.append((data, on_done))
+            if len(self._buffer) < self.size:
+                return
+            batch, self._buffer = self._buffer, []
+        self._deliver(batch)
+
+    def flush(self) -> None:
+        """Zapíše všechno, co je v bufferu."""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._deliver(batch)
+
+    def write(self, items: list[dict]) -> list[WriteResult]:
+        """Zapíše `items` po dávkách; vrátí (documentId, error) pro každou položku."""
+        results: list[WriteResult] = []
+        for start in range(0, len(items), self.size):
+            results.extend(self._write_chunk(items[start:start + self.size]))
+        return results
+
+    # ── Interní ────────────────────────────────────────────────────────────────
+
+    def _deliver(self, batch: list[tuple[dict, Optional[Callable]]]) -> None:
+        results = self.write([data for data, _ in batch])
+        for (_, on_done), (doc_id, error) in zip(batch, results):
+            if on_done:
+                on_done(doc_id, error)
+
+    def _write_chunk(self, items: list[dict]) -> list[WriteResult]:
+        results: list[WriteResult] = [(None, None)] * len(items)
+        pending = list(range(len(items)))
+        while pending and self.supported:
+            self.requests += 1
+            resp = self.strapi.request("POST", BULK_PATH, params=self.params, timeout=self.timeout,
+                                       json={"collection": self.collection,
+                                             "data": [items[i] for i in pending]})
+            if resp.status_code in (404, 405):
+                with self._lock:
+                    first = self.strapi.url not in BulkWriter._unsupported
+                    BulkWriter._unsupported.add(self.strapi.url)
+                if first:
+                    print(f"  ⚠ {BULK_PATH} na serveru není – zapisuji po jednom", flush=True)
+                break
+            try:
+                data = resp.json().get("data")
+            except (ValueError, AttributeError):
+                data = None
+            if not isinstance(data, list) or len(data) != len(pending):
+                # Chyba celé dávky (auth, validace těla, 5xx) – týká se všech položek
+                error = response_error(resp)
+                for i in pending:
+                    results[i] = (None, error)
+                return results
+
+            retry = []
+            for i, item in zip(pending, data):
+                if resp.ok:
+                    results[i] = (item.get("documentId"), None)
+                elif item.get("error"):
+                    results[i] = (None, {"status": resp.status_code, **item["error"]})
+                else:
+                    retry.append(i)       # skipped – transakce se vrátila kvůli jiné položce
+            if len(retry) == len(pending):
+                error = response_error(resp)
+                for i in retry:
+                    results[i] = (None, error)
+                return results
+            pending = retry
+
+        for i in pending:
+            results[i] = self._write_one(items[i])
+        return results
+
+    def _write_one(self, data: dict) -> WriteResult:
+        """Zápis jedné položky bez hromadného endpointu."""
+        data = dict(data)
+        doc_id = data.pop("documentId", None)
+        path = f"/api/{self.collection}" + (f"/{doc_id}" if doc_id else "")
+        self.requests += 1
+        resp = self.strapi.request("PUT" if doc_id else "POST", path, params=self.params,
+                                   json={"data": data}, timeout=self.timeout)
+        if not resp.ok:
+            return None, response_error(resp)
+        return resp.json()["data"]["documentId"], None
@@ -5,12 +5,26 @@ MLP Auto-sync
 Automaticky sleduje MLP (Městská knihovna Praha) přes OAI-PMH protokol
 a importuje nově přidané e-knihy do Strapi backendu.
 
-Stav (datum posledního běhu) ukládá do mlp_sync_state.json ve stejné složce.
+Stav ukládá do mlp_sync_state.json ve stejné složce. Jako hranice pro další
+běh slouží nejvyšší datestamp záznamu, který sync skutečně viděl; `from`/`until`
+se posílají v granularitě repozitáře (zjištěné jednou přes Identify).
+Během harvestu se po každé stránce ukládá checkpoint (resumptionToken,
+číslo stránky, už importovaná mlpId) – po pádu naváže běh s --resume.
+Knihy se do Strapi zakládají souběžně (--workers, mlp_pipeline.py) a po
+dávkách (--batch, POST /api/books/bulk), checkpoint stránky se uloží, až
+jsou všechny její knihy hotové.
 
 Spuštění (ruční):
     python3 mlp_sync.py --url http://localhost:1337 --token <TOKEN>
     python3 mlp_sync.py --dry-run            # simulace – nic nezapíše
     python3 mlp_sync.py --from 2024-01-01    # přepsat datum "od kdy"
+    python3 mlp_sync.py --resume             # navázat na přerušený harvest
+    python3 mlp_sync.py --diff               # ListIdentifiers → stáhnout jen změny
+
+Souběžně na víc procesů (stejné --from; každý shard má svůj stavový soubor):
+    python3 mlp_sync.py --plan --from 2024-01-01 ...       # autoři a kategorie předem
+    python3 mlp_sync.py --shard 1/2 --from 2024-01-01 ...  # a 2/2
+    python3 mlp_sync.py --merge-stats 2                    # souhrnný report
 
 Cron (každou noc ve 3:00):
     0 3 * * * cd /var/www/eknihyzdarma-backend/scripts && \\
@@ -27,15 +41,27 @@ import json
 import os
 import re
 import sys
-import time
 import unicodedata
 import xml.etree.ElementTree as ET
 from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 import requests
 
+import mlp_oai
+from mlp_category import CATEGORIZER, pick_category
+from mlp_http import StrapiClient
+from mlp_index import BookIndex
+from mlp_oai import (GRANULARITY_DAY, OAI_PREFIX, OAI_SET, OAIError, OAIHarvest,
+                     format_datestamp, next_datestamp)
+from mlp_pipeline import (WORKERS, BookJob, ImportPipeline, Shard, Stage, load_shard_stats,
+                          parse_shard, save_shard_stats)
+from mlp_store import STORE_FILE, RecordStore
+from mlp_strapi import BULK_SIZE, BulkWriter, SlugRegistry, describe_error, load_name_map
+from mlp_types import Book
+
 # ── Encoding fix (Windows) ───────────────────────────────────────────────────
 if hasattr(sys.stdout, "reconfigure"):
     sys.stdout.reconfigure(encoding="utf-8", errors="replace")
@@ -44,191 +70,21 @@ if hasattr(sys.stderr, "reconfigure"):
 
 # ── Konfigurace ──────────────────────────────────────────────────────────────
 
-OAI_BASE    = "http://web2.mlp.cz/cgi/oai"
-OAI_SET     = "ebook"
-OAI_PREFIX  = "marc21"
-
 STRAPI_URL   = os.getenv("STRAPI_URL",   "http://localhost:1337")
 STRAPI_TOKEN = os.getenv("STRAPI_TOKEN", "")
 
-DELAY = 0.4          # pauza mezi Strapi požadavky (s)
-OAI_DELAY = 1.5      # pauza mezi OAI stránkami (s)
+OAI_DELAY = 1.5      # výchozí rozestup OAI požadavků (s), limiter ho pak přizpůsobí
+
+# Režim --diff: do kolika změněných záznamů stahovat po jednom (GetRecord),
+# nad tento počet se stahují zúžená okna ListRecords
+GETRECORD_MAX = 20
+# Mezera mezi datestampy změněných záznamů, která začíná nové okno (s)
+WINDOW_GAP = 24 * 3600
 
 # Soubor stavu – uloží datum posledního úspěšného běhu
 SCRIPT_DIR  = Path(__file__).parent
 STATE_FILE  = SCRIPT_DIR / "mlp_sync_state.json"
 
-# XML jmenné prostory
-NS_OAI  = "http://www.openarchives.org/OAI/2.0/"
-NS_MARC = "http://www.loc.gov/MARC21/slim"
-
-# Formáty ke stažení
-FORMAT_MAP      = {"epub": "EPUB", "pdf": "PDF", "prc": "PRC", "mobi": "MOBI",
-                   "txt": "TXT", "html": "HTML", "rtf": "RTF", "pdb": "PDB"}
-PRIORITY_FORMATS = {"epub", "pdf", "prc", "mobi"}
-
-# ── Kategorizace (přeneseno z mlp_import_v2.py) ──────────────────────────────
-
-TOPIC_EXACT = {
-    "česká literatura": "Česká literatura",
-    "slovenská literatura": "Slovenská literatura",
-    "světová literatura": "Světová literatura",
-    "anglická literatura": "Světová literatura",
-    "americká literatura": "Světová literatura",
-    "francouzská literatura": "Světová literatura",
-    "německá literatura": "Světová literatura",
-    "ruská literatura": "Světová literatura",
-    "polská literatura": "Světová literatura",
-    "italská literatura": "Světová literatura",
-    "španělská literatura": "Světová literatura",
-    "skandinávská literatura": "Světová literatura",
-    "maďarská literatura": "Světová literatura",
-    "japonská literatura": "Světová literatura",
-    "norská literatura": "Světová literatura",
-    "detektivní literatura": "Detektivní",
-    "detektivky": "Detektivní",
-    "kriminální literatura": "Detektivní",
-    "science fiction": "Sci-fi",
-    "vědeckofantastická literatura": "Sci-fi",
-    "fantasy": "Fantasy",
-    "fantasy literatura": "Fantasy",
-    "horor": "Horor",
-    "horory": "Horor",
-    "thriller": "Thriller",
-    "thrillery": "Thriller",
-    "dobrodružná literatura": "Dobrodružná",
-    "romantická literatura": "Romance",
-    "romance": "Romance",
-    "milostná literatura": "Romance",
-    "historická literatura": "Historická beletrie",
-    "historická beletrie": "Historická beletrie",
-    "literatura faktu": "Literatura faktu",
-    "populárně naučná literatura": "Literatura faktu",
-    "naučná literatura": "Literatura faktu",
-    "dětská literatura": "Dětská literatura",
-    "literatura pro děti a mládež": "Dětská literatura",
-    "pohádky": "Dětská literatura",
-    "biografie": "Biografie",
-    "autobiografie": "Biografie",
-    "memoáry": "Biografie",
-    "paměti": "Biografie",
-    "cestovní literatura": "Cestování",
-    "cestopisy": "Cestování",
-    "humor": "Humor",
-    "humoristická literatura": "Humor",
-    "satira": "Humor",
-    "poezie": "Poezie",
-    "básně": "Poezie",
-    "drama": "Drama",
-    "divadelní hry": "Drama",
-    "beletrie": "Beletrie",
-    "próza": "Beletrie",
-    "eseje": "Esejistika",
-    "filosofie": "Filosofie",
-    "filozofie": "Filosofie",
-    "psychologie": "Psychologie",
-    "erotická literatura": "Erotická literatura",
-}
-
-TOPIC_KEYWORDS = [
-    ("česká lit", "Česká literatura"), ("slovenská lit", "Slovenská literatura"),
-    ("světová lit", "Světová literatura"), ("anglická lit", "Světová literatura"),
-    ("americká lit", "Světová literatura"), ("francouzská lit", "Světová literatura"),
-    ("německá lit", "Světová literatura"), ("ruská lit", "Světová literatura"),
-    ("detektiv", "Detektivní"), ("kriminál", "Detektivní"),
-    ("science fiction", "Sci-fi"), ("vědeckofant", "Sci-fi"),
-    ("fantasy", "Fantasy"), ("horor", "Horor"), ("thriller", "Thriller"),
-    ("dobrodruž", "Dobrodružná"), ("romantick", "Romance"), ("milostn", "Romance"),
-    ("historick", "Historická beletrie"), ("populárně", "Literatura faktu"),
-    ("naučná", "Literatura faktu"), ("dětská", "Dětská literatura"),
-    ("pro děti", "Dětská literatura"), ("pohádky", "Dětská literatura"),
-    ("biografi", "Biografie"), ("autobiografi", "Biografie"),
-    ("memoár", "Biografie"), ("paměti", "Biografie"),
-    ("cestopi", "Cestování"), ("cestovní", "Cestování"),
-    ("humor", "Humor"), ("satir", "Humor"),
-    ("básn", "Poezie"), ("poezie", "Poezie"), ("lyrik", "Poezie"),
-    ("drama", "Drama"), ("divadel", "Drama"),
-    ("erotick", "Erotická literatura"), ("filosofi", "Filosofie"),
-    ("filozofi", "Filosofie"), ("psychologi", "Psychologie"),
-]
-
-TITLE_GENRE_KEYWORDS = [
-    (["zpěvy", "básn", "balada", "epigramy", "haiku", "elegie", "sonety",
-      "verše", "verš", "žalmy", "óda"], "Poezie"),
-    (["komedie o", "tragédie", "zpěvohra", "fraška", "drama o", "divadeln"], "Drama"),
-    (["pohádky", "pohádka", "pohádkové", "pro děti", "pro mládež"], "Dětská literatura"),
-    (["dobrodružství", "dobrodružný"], "Dobrodružná"),
-    (["paměti", "memoáry", "zápisky", "deník"], "Biografie"),
-    (["cesta do", "cesta kolem", "cestopis", "expedice"], "Cestování"),
-]
-
-FOREIGN_SURNAMES = {
-    "dostojevskij", "tolstoj", "turgenev", "bulgakov", "čechov", "zamjatin",
-    "puškin", "gogol", "gorkij", "ostrovskij", "bunin", "lermontov",
-    "goethe", "schiller", "kafka", "mann", "rilke", "hesse", "brecht",
-    "schnitzler", "musil", "zweig", "werfel", "fontane", "kleist",
-    "hugo", "proust", "flaubert", "zola", "balzac", "molière", "voltaire",
-    "dumas", "maupassant", "rolland", "stendhal", "rostand", "verne",
-    "dickens", "hardy", "joyce", "woolf", "lawrence", "kipling",
-    "thackeray", "austen", "wilde", "swift", "shakespeare", "shelley",
-    "poe", "london", "fitzgerald", "hemingway", "dreiser", "crane",
-    "melville", "twain", "whitman", "faulkner", "o'neill", "mitchell",
-    "ibsen", "hamsun", "andersen", "strindberg", "heidenstam",
-    "pirandello", "goldoni", "boccaccio", "leopardi",
-    "cervantes", "lorca", "vega", "unamuno",
-    "homéros", "sofokles", "euripidés", "aristofanés",
-    "ovidius", "catullus", "tacitus", "caesar", "vergilius",
-    "cicero", "seneca", "sienkiewicz", "doyle", "chesterton",
-    "scott", "carducci", "stevenson", "hearn",
-}
-
-
-def detect_genre_from_title(title: str) -> Optional[str]:
-    t = title.lower()
-    for keywords, genre in TITLE_GENRE_KEYWORDS:
-        if any(k in t for k in keywords):
-            return genre
-    return None
-
-
-def is_foreign_author(author: Optional[str]) -> bool:
-    if not author:
-        return False
-    parts = author.split(",")
-    surname = parts[0].lower().strip()
-    if surname in FOREIGN_SURNAMES:
-        return True
-    if len(parts) > 1:
-        rest = parts[1].lower().strip()
-        for word in rest.split()[1:]:
-            if word.endswith(("ič", "evna", "ovna", "jevna")):
-                return True
-    low = author.lower()
-    if " von " in low or " de " in low or " del " in low:
-        return True
-    return False
-
-
-def pick_category(topics: list, author: Optional[str] = None,
-                  title: Optional[str] = None) -> str:
-    for topic in topics:
-        t = topic.lower().strip().rstrip(".,;")
-        if t in TOPIC_EXACT:
-            return TOPIC_EXACT[t]
-    for topic in topics:
-        t = topic.lower()
-        for keyword, category in TOPIC_KEYWORDS:
-            if keyword in t:
-                return category
-    if title:
-        genre = detect_genre_from_title(title)
-        if genre:
-            return genre
-    if is_foreign_author(author):
-        return "Světová literatura"
-    return "Česká literatura"
-
-
 # ── Pomocné funkce ────────────────────────────────────────────────────────────
 
 def slugify(text: str) -> str:
@@ -253,6 +109,19 @@ def today_iso() -> str:
 
 # ── State file ────────────────────────────────────────────────────────────────
 
+def repository_granularity(state: dict) -> str:
+    """Granularita datestampů – z Identify, uložená ve stavu (volá se jen jednou)."""
+    if state.get("granularity"):
+        return state["granularity"]
+    try:
+        granularity = mlp_oai.identify().get("granularity") or GRANULARITY_DAY
+    except (requests.RequestException, ET.ParseError, OAIError) as e:
+        print(f"  ⚠ Identify selhal ({e}) – použiji denní granularitu", flush=True)
+        return GRANULARITY_DAY
+    state["granularity"] = granularity
+    return granularity
+
+
 def load_state() -> dict:
     if STATE_FILE.exists():
         try:
@@ -264,179 +133,213 @@ def load_state() -> dict:
 
 
 def save_state(state: dict) -> None:
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
+    """Atomický zápis: dočasný soubor + rename (pád uprostřed zápisu stav nepoškodí)."""
+    tmp = STATE_FILE.with_name(STATE_FILE.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(state, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, STATE_FILE)
 
 
 # ── OAI-PMH scraping ─────────────────────────────────────────────────────────
 
-def get_subfield(record: ET.Element, tag: str, code: str) -> Optional[str]:
-    for field in record.findall(f".//{{{NS_MARC}}}datafield[@tag='{tag}']"):
-        sf = field.find(f"{{{NS_MARC}}}subfield[@code='{code}']")
-        if sf is not None and sf.text:
-            return sf.text.strip()
-    return None
-
-
-def get_all_subfields(record: ET.Element, tag: str, code: str) -> list:
-    results = []
-    for field in record.findall(f".//{{{NS_MARC}}}datafield[@tag='{tag}']"):
-        sf = field.find(f"{{{NS_MARC}}}subfield[@code='{code}']")
-        if sf is not None and sf.text:
-            results.append(sf.text.strip())
-    return results
-
-
-def parse_856_fields(record: ET.Element) -> tuple:
-    links = []
-    cover_url = None
-    for field in record.findall(f".//{{{NS_MARC}}}datafield[@tag='856']"):
-        url_el  = field.find(f"{{{NS_MARC}}}subfield[@code='u']")
-        label_el = field.find(f"{{{NS_MARC}}}subfield[@code='z']")
-        if url_el is None or not url_el.text:
-            continue
-        url   = url_el.text.strip()
-        label = label_el.text.strip() if label_el is not None else ""
-        if url.endswith(".jpg") or "obálka" in label.lower() or "obalka" in label.lower():
-            cover_url = url
-            continue
-        ext = url.rsplit(".", 1)[-1].lower() if "." in url else ""
-        if ext in FORMAT_MAP:
-            links.append({"url": url, "format": FORMAT_MAP[ext], "ext": ext, "label": label})
-    order = ["epub", "pdf", "prc", "mobi", "html", "txt", "rtf", "pdb"]
-    links.sort(key=lambda x: order.index(x["ext"]) if x["ext"] in order else 99)
-    return links, cover_url
-
-
-def parse_record(record_el: ET.Element) -> Optional[dict]:
-    header = record_el.find(f"{{{NS_OAI}}}header")
-    if header is not None and header.get("status") == "deleted":
-        return None
-    marc = record_el.find(f".//{{{NS_MARC}}}record")
-    if marc is None:
-        return None
-
-    id_el  = header.find(f"{{{NS_OAI}}}identifier") if header is not None else None
-    oai_id = id_el.text.strip() if id_el is not None else None
-
-    title_a = get_subfield(marc, "245", "a") or ""
-    title_b = get_subfield(marc, "245", "b") or ""
-    title   = (title_a.rstrip("/ :") + (" " + title_b.rstrip("/ :") if title_b else "")).strip()
-    if not title:
-        return None
-
-    author = get_subfield(marc, "100", "a") or get_subfield(marc, "700", "a")
-    if author:
-        author = author.rstrip(",. ").strip()
-
-    description = get_subfield(marc, "520", "a")
-    topics      = [t.rstrip(".,;") for t in get_all_subfields(marc, "650", "a") if t]
+def parse_record(record_el: ET.Element) -> Optional[Book]:
+    fields = mlp_oai.parse_fields(record_el)
+    # Každý stažený záznam (i ten, ze kterého kniha nebude) jde do lokálního zrcadla
+    if _store is not None:
+        _store.put_record(record_el, fields)
+    return mlp_oai.with_slug(fields, slugify) if fields else None
 
-    year = None
-    ctrl = marc.find(f".//{{{NS_MARC}}}controlfield[@tag='008']")
-    if ctrl is not None and ctrl.text and len(ctrl.text) >= 11:
-        y = ctrl.text[7:11].strip()
-        if y.isdigit():
-            year = int(y)
 
-    links, cover_url = parse_856_fields(marc)
-    main_links = [lnk for lnk in links if lnk["ext"] in PRIORITY_FORMATS]
-    if not main_links:
-        return None
+def fetch_new_records(from_date: str, until: Optional[str] = None,
+                      resume: Optional[dict] = None, on_page=None) -> Iterator[Book]:
+    """
+    Stahuje záznamy z OAI-PMH s parametry from=from_date (a until).
+    Generátor – parsované knihy vrací průběžně, jak přicházejí stránky.
 
-    return {
-        "mlpId":       oai_id,
-        "title":       title,
-        "slug":        slugify(title),
-        "author":      author,
-        "description": description,
-        "year":        year,
-        "topics":      topics,
-        "coverUrl":    cover_url,
-        "links":       main_links,
-    }
+    resume = checkpoint {"token", "page"} – naváže na přerušený harvest;
+    pokud token mezitím vypršel, začne znovu od from_date.
+    on_page(harvest) se volá po zpracování každé stránky (checkpoint).
+    Při chybě (kromě noRecordsMatch) vyhodí OAIError.
+    """
+    count = 0
 
+    def page_done(harvest: OAIHarvest) -> None:
+        if harvest.token:
+            print(f"  ↺  Stránka {harvest.page} – zatím {count} záznamů...", flush=True)
+        if on_page:
+            on_page(harvest)
 
-def fetch_new_records(from_date: str) -> list:
-    """
-    Stáhne záznamy z OAI-PMH s parametrem from=from_date.
-    Vrátí seznam parsovaných knih.
-    """
-    books = []
     params = {
         "verb":           "ListRecords",
         "set":            OAI_SET,
         "metadataPrefix": OAI_PREFIX,
         "from":           from_date,
     }
-    resumption_token = None
-    page = 0
-
-    while True:
-        page += 1
-        if resumption_token:
-            params = {"verb": "ListRecords", "resumptionToken": resumption_token}
+    if until:
+        params["until"] = until
+    harvest = None
+    if resume and resume.get("token"):
+        print(f"  ↻  Navazuji na stránce {resume.get('page', 0) + 1}", flush=True)
+        harvest = OAIHarvest({"verb": "ListRecords", "resumptionToken": resume["token"]},
+                             parse=parse_record, on_page=page_done,
+                             page=resume.get("page", 0))
+        for book in harvest:
+            count += 1
+            yield book
+        if harvest.error and harvest.error[0] == "badResumptionToken":
+            print("  ⚠ resumptionToken vypršel – začínám harvest znovu", flush=True)
+            harvest = None
+
+    if harvest is None:
+        harvest = OAIHarvest(params, parse=parse_record, on_page=page_done)
+        for book in harvest:
+            count += 1
+            yield book
+
+    # Zjistit, zda OAI vrátilo chybu (noRecordsMatch = žádné nové záznamy)
+    if harvest.error:
+        code, message = harvest.error
+        if code == "noRecordsMatch":
+            print(f"  ℹ OAI: žádné nové záznamy od {from_date}", flush=True)
+            return
+        if code == "http":
+            print(f"  ✗ Chyba OAI: {message}", flush=True)
+        elif code == "xml":
+            print(f"  ✗ XML chyba: {message}", flush=True)
+        else:
+            print(f"  ✗ OAI chyba [{code}]: {message}", flush=True)
+        raise OAIError(code, message)
 
-        try:
-            resp = requests.get(OAI_BASE, params=params, timeout=30)
-            resp.raise_for_status()
-        except requests.RequestException as e:
-            print(f"  ✗ Chyba OAI: {e}", flush=True)
-            break
 
-        try:
-            root = ET.fromstring(resp.content)
-        except ET.ParseError as e:
-            print(f"  ✗ XML chyba: {e}", flush=True)
-            break
-
-        # Zjistit, zda OAI vrátilo chybu (noRecordsMatch = žádné nové záznamy)
-        error_el = root.find(f"{{{NS_OAI}}}error")
-        if error_el is not None:
-            code = error_el.get("code", "")
-            if code == "noRecordsMatch":
-                print(f"  ℹ OAI: žádné nové záznamy od {from_date}", flush=True)
-            else:
-                print(f"  ✗ OAI chyba [{code}]: {error_el.text}", flush=True)
-            break
-
-        list_records = root.find(f"{{{NS_OAI}}}ListRecords")
-        if list_records is None:
-            break
-
-        for record_el in list_records.findall(f"{{{NS_OAI}}}record"):
-            book = parse_record(record_el)
-            if book:
-                books.append(book)
-
-        token_el = list_records.find(f"{{{NS_OAI}}}resumptionToken")
-        if token_el is not None and token_el.text and token_el.text.strip():
-            resumption_token = token_el.text.strip()
-            print(f"  ↺  Stránka {page} – zatím {len(books)} záznamů...", flush=True)
-            time.sleep(OAI_DELAY)
+def fetch_changed_records(store: Optional[RecordStore], from_date: Optional[str] = None,
+                          until: Optional[str] = None, on_page=None) -> Iterator[Book]:
+    """
+    Režim --diff: projde lehké hlavičky (ListIdentifiers), porovná je
+    s lokálním zrcadlem a plné MARC21 záznamy stáhne jen pro nové/změněné.
+    Smazané záznamy se v zrcadle jen označí hlavičkou. Změněné záznamy,
+    které už jsou ve Strapi, se stáhnou jen do zrcadla (autor, témata
+    a MARC musí odpovídat datestampu), importovat se nebudou. Bez
+    zrcadla (store=None) jsou nové všechny záznamy.
+    """
+    known = store.datestamps() if store is not None else {}
+    params = {"verb": "ListIdentifiers", "set": OAI_SET, "metadataPrefix": OAI_PREFIX}
+    if from_date:
+        params["from"] = from_date
+    if until:
+        params["until"] = until
+
+    delta = []
+    mirror_only = set()     # už ve Strapi – jen obnovit záznam v zrcadle
+    total = 0
+    harvest = OAIHarvest(params, parse=mlp_oai.parse_header, on_page=on_page)
+    for header in harvest:
+        total += 1
+        identifier = header["identifier"]
+        if known.get(identifier) == header["datestamp"]:
+            continue
+        if header["deleted"]:
+            if _store is not None:
+                _store.put_header(header)
+            continue
+        if identifier in _existing_ids:
+            if _store is None:
+                continue
+            mirror_only.add(identifier)
+        delta.append(header)
+
+    if harvest.error and harvest.error[0] != "noRecordsMatch":
+        code, message = harvest.error
+        print(f"  ✗ OAI chyba (ListIdentifiers) [{code}]: {message}", flush=True)
+        raise OAIError(code, message)
+    if _store is not None:
+        _store.commit()
+
+    print(f"  ✓ {total} hlaviček, nových/změněných: {len(delta) - len(mirror_only)}"
+          + (f" (+{len(mirror_only)} změněných už ve Strapi – jen do zrcadla)"
+             if mirror_only else ""), flush=True)
+    if delta:
+        for book in fetch_records(delta):
+            if book.mlp_id not in mirror_only:
+                yield book
+
+
+def fetch_records(headers: list) -> Iterator[Book]:
+    """
+    Stáhne plné záznamy pro dané hlavičky – pár kusů přes GetRecord,
+    větší množství přes ListRecords okna zúžená na jejich datestampy.
+    Při chybě vyhodí OAIError – hranice (last_datestamp) se pak neposune
+    a nestažené záznamy přijdou na řadu v dalším běhu.
+    """
+    wanted = {h["identifier"] for h in headers}
+
+    def parse_wanted(record_el: ET.Element) -> Optional[Book]:
+        header = mlp_oai.record_header(record_el)
+        if header is None or header["identifier"] not in wanted:
+            return None
+        return parse_record(record_el)
+
+    if len(headers) <= GETRECORD_MAX:
+        harvests = [OAIHarvest({"verb": "GetRecord", "identifier": h["identifier"],
+                                "metadataPrefix": OAI_PREFIX},
+                               parse=parse_record)
+                    for h in headers]
+    else:
+        harvests = [OAIHarvest({"verb": "ListRecords", "set": OAI_SET,
+                                "metadataPrefix": OAI_PREFIX,
+                                "from": start, "until": end},
+                               parse=parse_wanted)
+                    for start, end in datestamp_windows(h["datestamp"] for h in headers)]
+        print(f"  ↓ {len(harvests)} okno(a) ListRecords pro {len(headers)} záznamů", flush=True)
+
+    for harvest in harvests:
+        yield from harvest
+        if _store is not None:
+            _store.commit()
+        # noRecordsMatch / idDoesNotExist: záznam mezitím zmizel, nic se neztratí
+        if harvest.error and harvest.error[0] not in ("noRecordsMatch", "idDoesNotExist"):
+            code, message = harvest.error
+            print(f"  ✗ OAI chyba [{code}]: {message}", flush=True)
+            raise OAIError(code, message)
+
+
+def datestamp_windows(datestamps) -> list:
+    """Seskupí datestampy do oken (from, until) – nové okno při mezeře > WINDOW_GAP."""
+    windows = []
+    for stamp in sorted(datestamps):
+        if windows and _stamp_seconds(stamp) - _stamp_seconds(windows[-1][1]) <= WINDOW_GAP:
+            windows[-1][1] = stamp
         else:
-            break
+            windows.append([stamp, stamp])
+    return [tuple(w) for w in windows]
+
 
-    return books
+def _stamp_seconds(stamp: str) -> float:
+    return mlp_oai.parse_datestamp(stamp).timestamp()
 
 
 # ── Strapi API ────────────────────────────────────────────────────────────────
 
-def _headers() -> dict:
-    h = {"Content-Type": "application/json"}
-    if STRAPI_TOKEN:
-        h["Authorization"] = f"Bearer {STRAPI_TOKEN}"
-    return h
+# Keep-alive spojení na Strapi (po --url/--token se vytvoří znovu v main)
+_strapi = StrapiClient(STRAPI_URL, STRAPI_TOKEN)
+
+# Obsazené slugy načtené jednou v main (mlp_strapi.SlugRegistry) –
+# unikátní sufix se přidělí lokálně, bez GET na každého kandidáta
+_slugs: Optional[SlugRegistry] = None
+
+# Hromadný zápis knih (po --batch v jednom POST /api/books/bulk)
+_bulk: Optional[BulkWriter] = None
 
 
 def strapi_get(path: str, params: dict = None) -> dict:
-    resp = requests.get(f"{STRAPI_URL}{path}", headers=_headers(), params=params, timeout=20)
+    resp = _strapi.request("GET", path, params=params, timeout=20)
     resp.raise_for_status()
     return resp.json()
 
 
 def strapi_post(path: str, data: dict) -> dict:
-    resp = requests.post(f"{STRAPI_URL}{path}", headers=_headers(), json=data, timeout=20)
+    resp = _strapi.request("POST", path, json=data, timeout=20)
     if not resp.ok:
         raise Exception(f"POST {path} → {resp.status_code}: {resp.text[:300]}")
     return resp.json()
@@ -447,33 +350,64 @@ def strapi_post(path: str, data: dict) -> dict:
 _author_cache:   dict = {}
 _category_cache: dict = {}
 _existing_ids:   set  = set()
+# Po preload_names() jsou v cache všichni autoři a kategorie – co v ní
+# není, je nové a rovnou se zakládá (bez hledání podle jména)
+_names_preloaded = False
+# --shard i/N: tento proces importuje jen svou část záznamů
+_shard: Optional[Shard] = None
+_store: Optional[RecordStore] = None    # lokální zrcadlo OAI záznamů (mimo dry-run)
 
 
 def load_existing_mlp_ids() -> set:
-    ids = set()
-    page = 1
-    while True:
-        try:
-            res = strapi_get("/api/books", {
-                "fields[0]": "mlpId",
-                "filters[mlpId][$notNull]": "true",
-                "pagination[page]": str(page),
-                "pagination[pageSize]": "200",
-            })
-            data = res.get("data", [])
-            if not data:
-                break
-            for book in data:
-                mid = book.get("mlpId")
-                if mid:
-                    ids.add(mid)
-            if page >= res.get("meta", {}).get("pagination", {}).get("pageCount", 1):
-                break
-            page += 1
-        except Exception as e:
-            print(f"  ⚠ Chyba načítání mlpId: {e}", flush=True)
-            break
-    return ids
+    """mlpId knih ve Strapi z lokálního indexu (mlp_index.py) obnoveného o změny od minula."""
+    try:
+        with BookIndex() as index:
+            index.refresh(_strapi)
+            return index.mlp_ids()
+    except Exception as e:
+        print(f"  ⚠ Chyba načítání mlpId: {e}", flush=True)
+        return set()
+
+
+def preload_names() -> None:
+    """Načte všechny autory a kategorie (jméno → documentId) stránkami jen s polem name."""
+    global _names_preloaded
+    _author_cache.update(load_name_map(_strapi, "/api/authors"))
+    _category_cache.update(load_name_map(_strapi, "/api/categories"))
+    _names_preloaded = True
+    print(f"  ✓ {len(_author_cache)} autorů, {len(_category_cache)} kategorií načteno", flush=True)
+
+
+def missing_names(books) -> tuple[set, set]:
+    """Autoři a kategorie knih, které ještě nejsou ve Strapi, chybějící v cache."""
+    authors, categories = set(), set()
+    for book in books:
+        title = book.title.strip()
+        if not title or book.mlp_id in _existing_ids:
+            continue
+        if book.author:
+            authors.add(book.author)
+        categories.add(pick_category(book.topics, author=book.author, title=title))
+    return authors - _author_cache.keys(), categories - _category_cache.keys()
+
+
+def create_names(authors: set, categories: set, batch: int = BULK_SIZE) -> None:
+    """
+    Založí chybějící autory a kategorie po dávkách – v plánovací fázi pro
+    shardy, jinak pro každou dávku knih ve fázi "jména" (create_job_names).
+    """
+    for collection, cache, names in (("authors", _author_cache, authors),
+                                     ("categories", _category_cache, categories)):
+        names = sorted(names)
+        writer = BulkWriter(_strapi, collection, size=batch)
+        results = writer.write([{"name": name, "slug": slugify(name), "publishedAt": now_iso()}
+                                for name in names])
+        for name, (doc_id, error) in zip(names, results):
+            if doc_id:
+                cache[name] = doc_id
+                print(f"    ✓ Založeno: {name}", flush=True)
+            else:
+                print(f"    ✗ Nelze vytvořit '{name}': {describe_error(error)}", flush=True)
 
 
 def find_or_create_author(name: str, dry_run: bool = False) -> Optional[str]:
@@ -482,15 +416,16 @@ def find_or_create_author(name: str, dry_run: bool = False) -> Optional[str]:
     if dry_run:
         _author_cache[name] = f"dry-{slugify(name)}"
         return _author_cache[name]
-    try:
-        res = strapi_get("/api/authors", {"filters[name][$eq]": name, "fields[0]": "name"})
-        if res.get("data"):
-            doc_id = res["data"][0]["documentId"]
-            _author_cache[name] = doc_id
-            return doc_id
-    except Exception as e:
-        print(f"    ⚠ Autor lookup '{name}': {e}", flush=True)
-        return None
+    if not _names_preloaded:
+        try:
+            res = strapi_get("/api/authors", {"filters[name][$eq]": name, "fields[0]": "name"})
+            if res.get("data"):
+                doc_id = res["data"][0]["documentId"]
+                _author_cache[name] = doc_id
+                return doc_id
+        except Exception as e:
+            print(f"    ⚠ Autor lookup '{name}': {e}", flush=True)
+            return None
     try:
         res = strapi_post("/api/authors", {"data": {"name": name, "slug": slugify(name), "publishedAt": now_iso()}})
         doc_id = res["data"]["documentId"]
@@ -510,14 +445,15 @@ def find_or_create_category(name: str, dry_run: bool = False) -> Optional[str]:
     if dry_run:
         _category_cache[name] = f"dry-cat-{slugify(name)}"
         return _category_cache[name]
-    try:
-        res = strapi_get("/api/categories", {"filters[name][$eq]": name, "fields[0]": "name"})
-        if res.get("data"):
-            doc_id = res["data"][0]["documentId"]
-            _category_cache[name] = doc_id
-            return doc_id
-    except Exception:
-        pass
+    if not _names_preloaded:
+        try:
+            res = strapi_get("/api/categories", {"filters[name][$eq]": name, "fields[0]": "name"})
+            if res.get("data"):
+                doc_id = res["data"][0]["documentId"]
+                _category_cache[name] = doc_id
+                return doc_id
+        except Exception:
+            pass
     try:
         res = strapi_post("/api/categories", {"data": {"name": name, "slug": slugify(name), "publishedAt": now_iso()}})
         doc_id = res["data"]["documentId"]
@@ -529,69 +465,172 @@ def find_or_create_category(name: str, dry_run: bool = False) -> Optional[str]:
         return None
 
 
-def make_unique_slug(base_slug: str) -> str:
-    slug = base_slug
-    counter = 1
-    while True:
-        try:
-            res = strapi_get("/api/books", {"filters[slug][$eq]": slug, "fields[0]": "slug"})
-            if not res.get("data"):
-                return slug
-        except Exception:
-            return slug
-        slug = f"{base_slug}-{counter}"
-        counter += 1
-
+# Import jedné knihy = fáze pipeline (mlp_pipeline.py): příprava → autor →
+# kategorie → slug → POST. Fáze vrátí None (pokračovat) nebo 'ok' | 'skip' | 'error'.
 
-def import_book(book: dict, dry_run: bool) -> str:
-    """Importuje jednu knihu. Vrátí 'ok' | 'skip' | 'error'."""
-    mlp_id = book.get("mlpId", "")
-    title  = book.get("title", "").strip()
+def prepare_book(job: BookJob, dry_run: bool) -> Optional[str]:
+    book   = job.book
+    mlp_id = book.mlp_id or ""
+    title  = book.title.strip()
     if not title:
         return "error"
 
-    if mlp_id and mlp_id in _existing_ids:
-        return "skip"
+    # mlpId se zabere hned – stejný záznam nezaloží dva souběžné POSTy
+    if mlp_id:
+        if mlp_id in _existing_ids:
+            return "skip"
+        if not dry_run:
+            _existing_ids.add(mlp_id)
+            job.claimed = True
+
+    job.category = pick_category(book.topics, author=book.author, title=title)
+    return None
+
+
+def create_job_names(jobs: list[BookJob], batch: int) -> list[None]:
+    """
+    Chybějící autory a kategorie dávky knih založí jedním hromadným
+    zápisem ještě před fázemi autor/kategorie – ty je pak najdou v cache
+    (find_or_create_* zůstává jen pro souběh a neúspěšné založení).
+    """
+    authors = {job.book.author for job in jobs if job.book.author} - _author_cache.keys()
+    categories = {job.category for job in jobs if job.category} - _category_cache.keys()
+    if authors or categories:
+        create_names(authors, categories, batch)
+    return [None] * len(jobs)
+
+
+def resolve_author(job: BookJob, dry_run: bool) -> Optional[str]:
+    name = job.book.author
+    if not name:
+        return None
+    if _shard and not dry_run and name not in _author_cache:
+        return _missing_name(job, f"autor '{name}'")
+    job.author_id = find_or_create_author(name, dry_run)
+    return None
+
+
+def resolve_category(job: BookJob, dry_run: bool) -> Optional[str]:
+    if _shard and not dry_run and job.category not in _category_cache:
+        return _missing_name(job, f"kategorie '{job.category}'")
+    job.category_id = find_or_create_category(job.category, dry_run)
+    return None
+
 
-    author_name   = book.get("author")
-    category_name = pick_category(book.get("topics", []),
-                                  author=author_name, title=title)
+def _missing_name(job: BookJob, what: str) -> str:
+    # Shard jména nezakládá – jiný shard by mohl založit totéž souběžně
+    release_book(job, dry_run=False)
+    job.message = f"  ✗ {job.book.title[:45]}: {what} chybí – spusť nejdřív --plan"
+    return "error"
 
-    author_id   = find_or_create_author(author_name, dry_run) if author_name else None
-    category_id = find_or_create_category(category_name, dry_run)
 
-    base_slug = book.get("slug") or slugify(title)
-    slug      = base_slug if dry_run else make_unique_slug(base_slug)
+def allocate_slug(job: BookJob, dry_run: bool) -> None:
+    book  = job.book
+    title = book.title.strip()
+    job.base_slug = book.slug or slugify(title)
+    slug          = job.base_slug if dry_run else _slugs.allocate(job.base_slug)
 
     data = {
         "title":            title,
         "slug":             slug,
-        "description":      book.get("description") or "",
+        "description":      book.description or "",
         "isFree":           True,
         "isFeatured":       False,
         "downloads":        0,
-        "externalLinks":    book.get("links", []),
+        "externalLinks":    book.link_dicts(),
         "coverExternalUrl": None,
-        "mlpId":            mlp_id,
+        "mlpId":            book.mlp_id or "",
     }
-    if author_id:
-        data["author"] = author_id
-    if category_id:
-        data["category"] = category_id
+    if job.author_id:
+        data["author"] = job.author_id
+    if job.category_id:
+        data["category"] = job.category_id
+    job.data = data
+
 
+def create_book(job: BookJob, dry_run: bool) -> str:
+    title = job.data["title"]
     if dry_run:
-        print(f"  [DRY] {title[:55]:<55} | {category_name}", flush=True)
+        job.message = f"  [DRY] {title[:55]:<55} | {job.category}"
         return "ok"
 
     try:
-        strapi_post("/api/books", {"data": data})
-        _existing_ids.add(mlp_id)
+        _slugs.create("/api/books", job.data, job.base_slug)
         return "ok"
     except Exception as e:
-        print(f"  ✗ {title[:45]}: {e}", flush=True)
+        _existing_ids.discard(job.book.mlp_id)
+        job.message = f"  ✗ {title[:45]}: {e}"
         return "error"
 
 
+def create_books(jobs: list[BookJob], dry_run: bool) -> list[str]:
+    """Dávka knih jedním hromadným zápisem; chyba se hlásí u každé knihy zvlášť."""
+    if dry_run:
+        return [create_book(job, dry_run) for job in jobs]
+
+    results = _slugs.create_many(_bulk, [(job.data, job.base_slug) for job in jobs])
+    outcome = []
+    for job, (doc_id, error) in zip(jobs, results):
+        if doc_id:
+            outcome.append("ok")
+            continue
+        _existing_ids.discard(job.book.mlp_id)
+        job.message = f"  ✗ {job.data['title'][:45]}: {describe_error(error)}"
+        outcome.append("error")
+    return outcome
+
+
+def release_book(job: BookJob, dry_run: bool) -> None:
+    """Kniha skončila chybou před POST – uvolnit mlpId z přípravy a přidělený slug."""
+    if job.claimed:
+        _existing_ids.discard(job.book.mlp_id)
+        job.claimed = False
+    if job.data and not dry_run:
+        _slugs.release(job.data["slug"])
+
+
+def book_stages(dry_run: bool, workers: int = WORKERS, batch: int = BULK_SIZE) -> list[Stage]:
+    """
+    Fáze importu; jména, autory a kategorie řeší jeden worker (bez
+    duplicit). Shardy jména nezakládají (viz --plan), dry-run nic nezapíše.
+    """
+    if batch > 1:
+        post = Stage("POST", partial(create_books, dry_run=dry_run), workers=workers, batch=batch)
+    else:
+        post = Stage("POST", partial(create_book, dry_run=dry_run), workers=workers)
+    names = []
+    if not dry_run and not _shard:
+        names = [Stage("jména", partial(create_job_names, batch=batch), batch=BULK_SIZE)]
+    return [
+        Stage("příprava",  partial(prepare_book, dry_run=dry_run), blocking=False),
+        *names,
+        Stage("autor",     partial(resolve_author, dry_run=dry_run)),
+        Stage("kategorie", partial(resolve_category, dry_run=dry_run)),
+        Stage("slug",      partial(allocate_slug, dry_run=dry_run), blocking=False),
+        post,
+    ]
+
+
+def print_merged_stats(count: int) -> None:
+    """Souhrn posledních běhů shardů 1/N … N/N (--merge-stats N)."""
+    total, parts, missing = load_shard_stats(SCRIPT_DIR / "mlp_sync", count)
+    print("=" * 65, flush=True)
+    print(f"  MLP Auto-sync – souhrn {count} shardů", flush=True)
+    print("=" * 65, flush=True)
+    for stats in parts:
+        print(f"  Shard {stats['shard']:>7}: {stats.get('ok', 0):>5} OK, "
+              f"{stats.get('skip', 0):>5} skip, {stats.get('err', 0):>4} err"
+              f"  ({stats.get('finished', '?')})", flush=True)
+    if missing:
+        print(f"  ⚠ Chybí statistiky shardů: {', '.join(f'{i}/{count}' for i in missing)}",
+              flush=True)
+    print(flush=True)
+    print(f"  ✓ Importováno:  {total.get('ok', 0)}", flush=True)
+    print(f"  ⏭  Přeskočeno:  {total.get('skip', 0)}  (již existuje)", flush=True)
+    print(f"  ✗ Chyby:        {total.get('err', 0)}", flush=True)
+    print("=" * 65, flush=True)
+
+
 # ── Hlavní program ────────────────────────────────────────────────────────────
 
 def main():
@@ -601,18 +640,50 @@ def main():
     parser.add_argument("--token",    default="",
                         help="Strapi API token (přepíše env STRAPI_TOKEN)")
     parser.add_argument("--from",     dest="from_date", default="",
-                        help="Datum od (YYYY-MM-DD), přepíše uložený stav")
+                        help="Datum od (YYYY-MM-DD nebo YYYY-MM-DDThh:mm:ssZ), přepíše uložený stav")
     parser.add_argument("--dry-run",  action="store_true",
                         help="Simulace – nestahuje ani nezapisuje")
     parser.add_argument("--days",     type=int, default=7,
                         help="Kolik dní zpět hledat při prvním spuštění (default: 7)")
+    parser.add_argument("--resume",   action="store_true",
+                        help="Navázat na přerušený harvest (checkpoint ve stavovém souboru)")
+    parser.add_argument("--diff",     action="store_true",
+                        help="Projít jen hlavičky (ListIdentifiers) a stáhnout nové/změněné záznamy")
+    parser.add_argument("--category-cache", default="", metavar="FILE",
+                        help="Uložit/načíst výsledky kategorizace mezi běhy "
+                             "(zneplatní se při změně pravidel)")
+    parser.add_argument("--workers",  type=int, default=WORKERS,
+                        help=f"Souběžně zakládaných knih/dávek (default: {WORKERS})")
+    parser.add_argument("--batch",    type=int, default=BULK_SIZE, metavar="N",
+                        help=f"Dokumentů v jednom hromadném zápisu, 1 = po jednom "
+                             f"(default: {BULK_SIZE})")
+    parser.add_argument("--shard",    type=parse_shard, default=None, metavar="i/N",
+                        help="Importovat jen část i z N (podle hashe mlpId); vlastní stavový "
+                             "soubor, nejdřív jednou spusť --plan")
+    parser.add_argument("--plan",     action="store_true",
+                        help="Plánovací fáze pro shardy: projít záznamy a jen založit "
+                             "chybějící autory a kategorie")
+    parser.add_argument("--merge-stats", type=int, default=0, metavar="N",
+                        help="Vypsat souhrn posledních běhů N shardů a skončit")
     args = parser.parse_args()
-
-    global STRAPI_URL, STRAPI_TOKEN
+    if args.merge_stats:
+        print_merged_stats(args.merge_stats)
+        return
+    mlp_oai.LIMITER.reset(OAI_DELAY)
+    if args.category_cache:
+        CATEGORIZER.load_cache(args.category_cache)
+
+    global STRAPI_URL, STRAPI_TOKEN, STATE_FILE, _store, _strapi, _slugs, _bulk, _shard
+    _shard = args.shard
+    if _shard:
+        # Každý shard má vlastní watermark a checkpoint harvestu
+        STATE_FILE = STATE_FILE.with_name(f"{STATE_FILE.stem}.{_shard.suffix}.json")
     if args.url:
         STRAPI_URL = args.url
     if args.token:
         STRAPI_TOKEN = args.token
+    _strapi = StrapiClient(STRAPI_URL, STRAPI_TOKEN)
+    _bulk = BulkWriter(_strapi, "books", size=args.batch)
 
     # ── Hlavička logu ─────────────────────────────────────────────────────────
     run_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -622,23 +693,43 @@ def main():
     print(f"  Strapi:   {STRAPI_URL}", flush=True)
     print(f"  Token:    {'nastaven ✓' if STRAPI_TOKEN else '⚠ NENÍ nastaven'}", flush=True)
     print(f"  Dry-run:  {'ANO' if args.dry_run else 'NE'}", flush=True)
-
-    # ── Určení data "od" ──────────────────────────────────────────────────────
+    print(f"  Workery:  {args.workers}", flush=True)
+    print(f"  Dávka:    {args.batch}", flush=True)
+    if _shard:
+        print(f"  Shard:    {_shard}  (stav: {STATE_FILE.name})", flush=True)
+    if args.plan:
+        print("  Režim:    plán (jen autoři a kategorie)", flush=True)
+
+    # ── Určení okna "od" – "do" ───────────────────────────────────────────────
     state = load_state()
-
-    if args.from_date:
+    granularity = repository_granularity(state)
+    run_start   = datetime.now(timezone.utc)
+    until       = format_datestamp(run_start, granularity)
+    checkpoint  = state.get("harvest") if args.resume and not args.plan else None
+    if args.resume and not checkpoint:
+        print("  Resume:   žádný rozpracovaný harvest – běžný sync", flush=True)
+
+    if checkpoint:
+        from_date = checkpoint["from"]
+        until     = checkpoint.get("until")
+        print(f"  Od:       {from_date}  (navázání, stránka {checkpoint.get('page', 0) + 1})",
+              flush=True)
+    elif args.from_date:
         from_date = args.from_date
         print(f"  Od:       {from_date}  (ruční přepis)", flush=True)
+    elif state.get("last_datestamp"):
+        from_date = next_datestamp(state["last_datestamp"], granularity)
+        print(f"  Od:       {from_date}  (za posledním viděným záznamem)", flush=True)
     elif state.get("last_sync_date"):
         from_date = state["last_sync_date"]
         print(f"  Od:       {from_date}  (poslední sync)", flush=True)
     else:
         # První spuštění – jdi N dní zpět
         from datetime import timedelta
-        from_dt   = datetime.now(timezone.utc) - timedelta(days=args.days)
-        from_date = from_dt.strftime("%Y-%m-%d")
+        from_dt   = run_start - timedelta(days=args.days)
+        from_date = format_datestamp(from_dt, granularity)
         print(f"  Od:       {from_date}  (první spuštění, {args.days} dní zpět)", flush=True)
-
+    print(f"  Do:       {until or '—'}  (granularita {granularity})", flush=True)
     print(flush=True)
 
     # ── Test připojení ke Strapi ──────────────────────────────────────────────
@@ -657,16 +748,157 @@ def main():
         # Načíst existující mlpId pro rychlý duplicate check
         print("  Načítám existující záznamy ze Strapi...", flush=True)
         _existing_ids.update(load_existing_mlp_ids())
-        print(f"  ✓ {len(_existing_ids)} existujících knih v databázi\n", flush=True)
+        print(f"  ✓ {len(_existing_ids)} existujících knih v databázi", flush=True)
+        _slugs = SlugRegistry(_strapi)
+        print(f"  ✓ {_slugs.load()} obsazených slugů", flush=True)
+        preload_names()
+        print(flush=True)
+
+    # ── Stažení a průběžný import nových záznamů z OAI-PMH ───────────────────
+    # Zrcadlo se otevře, jen když se použije: zápis při běžném importu,
+    # čtení v --diff. Dry-run, shardy a plán ho nepřepisují (--diff
+    # ostatních shardů by pak změněné záznamy už nenašel).
+    store = None
+    if not args.dry_run and not args.plan and not _shard:
+        store = _store = RecordStore()
+    elif args.diff and STORE_FILE.exists():
+        store = RecordStore(readonly=True)
+    ok = skip = err = 0
+    imported = set(checkpoint.get("imported", [])) if checkpoint else set()
+    watermark = checkpoint.get("max_datestamp") if checkpoint else state.get("last_datestamp")
+
+    def update_watermark(harvest: OAIHarvest) -> None:
+        nonlocal watermark
+        if harvest.max_datestamp and (watermark is None or harvest.max_datestamp > watermark):
+            watermark = harvest.max_datestamp
+
+    def report(job: BookJob) -> None:
+        """Výsledek knihy – volá pipeline v pořadí harvestu."""
+        nonlocal ok, skip, err
+        book = job.book
+        if job.message:
+            print(job.message, flush=True)
+        if job.result == "ok":
+            ok += 1
+            imported.add(book.mlp_id)
+            if not args.dry_run:
+                title = book.title[:55]
+                print(f"  ✓ {title:<55} | {job.category}", flush=True)
+        elif job.result == "skip":
+            skip += 1
+        else:
+            err += 1
 
-    # ── Stažení nových záznamů z OAI-PMH ─────────────────────────────────────
-    print(f"  Stahuji záznamy z MLP (od {from_date})...", flush=True)
-    new_books = fetch_new_records(from_date)
-    print(f"  ✓ OAI vrátil {len(new_books)} záznamů\n", flush=True)
+    # Souběžně nejvýš --workers zakládaných knih, výsledky v pořadí harvestu
+    pipeline = ImportPipeline(book_stages(args.dry_run, args.workers, args.batch),
+                              on_result=report,
+                              on_error=partial(release_book, dry_run=args.dry_run))
+
+    def save_checkpoint(harvest: OAIHarvest) -> None:
+        """Po každé stránce: token další stránky + co už je naimportováno."""
+        update_watermark(harvest)
+        if args.dry_run:
+            return
+        token, page, max_datestamp = harvest.token, harvest.page, watermark
+
+        def write() -> None:
+            state["harvest"] = {
+                "from":     from_date,
+                "until":    until,
+                "token":    token,
+                "page":     page,
+                "imported": sorted(imported),
+                "max_datestamp": max_datestamp,
+                "updated":  now_iso(),
+            }
+            save_state(state)
+            if store is not None:
+                store.commit()
+
+        # Knihy stránky můžou být ještě rozpracované – uložit až po nich
+        pipeline.after_reported(write)
+
+    if args.diff:
+        # Celý seznam hlaviček (nebo od --from), porovnání s lokálním indexem
+        diff_from = args.from_date or None
+        print(f"  Porovnávám hlavičky MLP s lokálním zrcadlem "
+              f"({store.count() if store else 0} známých záznamů)...", flush=True)
+        books = fetch_changed_records(store, diff_from, until, on_page=update_watermark)
+    else:
+        print(f"  Stahuji záznamy z MLP (od {from_date})...", flush=True)
+        books = fetch_new_records(from_date, until, resume=checkpoint,
+                                  on_page=update_watermark if args.plan else save_checkpoint)
 
-    if not new_books:
+    if args.plan:
+        # Plánovací fáze: jména pro všechny shardy, stav se neukládá
+        try:
+            authors, categories = missing_names(books)
+        except OAIError:
+            print("  ✗ Harvest přerušen – plán nedokončen", flush=True)
+            sys.exit(1)
+        finally:
+            if store is not None:
+                store.close()
+        if args.dry_run:
+            print(f"  [DRY] Založil bych {len(authors)} autorů a {len(categories)} kategorií",
+                  flush=True)
+        else:
+            create_names(authors, categories, args.batch)
+            print(f"  ✓ Plán hotov ({len(authors)} autorů, {len(categories)} kategorií) – "
+                  f"spusť shardy se stejným --from", flush=True)
+        print("=" * 65, flush=True)
+        return
+
+    resumed = 0     # už importované před přerušením (--resume)
+    others  = 0     # záznamy jiných shardů
+
+    def pending() -> Iterator[tuple[Book, None]]:
+        nonlocal resumed, others
+        for book in books:
+            if _shard and book not in _shard:
+                others += 1
+                continue
+            if book.mlp_id in imported:
+                resumed += 1
+                continue
+            yield book, None
+
+    try:
+        pipeline.run(pending())
+    except OAIError:
+        skip += resumed
+        if args.diff:
+            print(f"  ✗ Harvest přerušen ({ok} importováno) – hranice se neposunula, "
+                  f"spusť --diff znovu", flush=True)
+        else:
+            print(f"  ✗ Harvest přerušen ({ok} importováno) – checkpoint uložen, "
+                  f"pokračuj s --resume", flush=True)
+        sys.exit(1)
+    finally:
+        # close() zapíše i rozpracované záznamy (i při přerušení)
+        if store is not None:
+            store.close()
+
+    skip += resumed
+    if args.category_cache:
+        CATEGORIZER.save_cache(args.category_cache)
+
+    total = ok + skip + err
+    if _shard:
+        print(f"  ✓ OAI vrátil {total + others} záznamů, shardu {_shard} patří {total}\n",
+              flush=True)
+        if not args.dry_run:
+            save_shard_stats(SCRIPT_DIR / "mlp_sync", _shard,
+                             {"ok": ok, "skip": skip, "err": err, "others": others})
+    else:
+        print(f"  ✓ OAI vrátil {total} záznamů\n", flush=True)
+
+    if not total:
         print("  Žádné nové knihy – sync dokončen.", flush=True)
         if not args.dry_run:
+            state.pop("harvest", None)
+            if watermark:
+                state["last_datestamp"] = watermark
             state["last_sync_date"] = today_iso()
             state["last_run"]       = run_time
             state["last_new_count"] = 0
@@ -674,26 +906,6 @@ def main():
         print("=" * 65, flush=True)
         return
 
-    # ── Import ────────────────────────────────────────────────────────────────
-    ok = skip = err = 0
-
-    for book in new_books:
-        result = import_book(book, args.dry_run)
-        if result == "ok":
-            ok += 1
-            if not args.dry_run:
-                title = (book.get("title") or "")[:55]
-                cat   = pick_category(book.get("topics", []),
-                                      author=book.get("author"),
-                                      title=book.get("title"))
-                print(f"  ✓ {title:<55} | {cat}", flush=True)
-        elif result == "skip":
-            skip += 1
-        else:
-            err += 1
-        if not args.dry_run and result != "skip":
-            time.sleep(DELAY)
-
     # ── Výsledek ──────────────────────────────────────────────────────────────
     print(flush=True)
     print("=" * 65, flush=True)
@@ -704,6 +916,9 @@ def main():
 
     # ── Uložit stav ───────────────────────────────────────────────────────────
     if not args.dry_run:
+        state.pop("harvest", None)
+        if watermark:
+            state["last_datestamp"] = watermark
         state["last_sync_date"] = today_iso()
         state["last_run"]       = run_time
         state["last_new_count"] = ok
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+MLP datové typy
+===============
+Kompaktní záznamy, kterými knihy putují scraperem, syncem a importy
+(parse_record → JSON → import_book). Místo slovníků jsou to frozen
+dataclassy se __slots__:
+
+    Link – odkaz ke stažení (url, format, ext, label)
+    Book – kniha; `links` (prioritní formáty) sdílí instance Link
+           s `all_links`, takže se odkazy v paměti neduplikují
+
+Formát, přípona a popisek odkazu se internují (sys.intern) – v celém
+katalogu je jich jen pár desítek různých.
+
+JSON layout zůstává stejný jako dřív (mlpId, title, slug, author, …,
+links, allLinks); převádí ho Book.from_dict / Book.to_dict. Soubory knih
+(JSON pole nebo JSON Lines, volitelně .gz) čte iter_books / load_books
+a průběžně zapisuje BookWriter. JSONL se dá číst od libovolné knihy:
+book_offsets drží sidecar index bajtových offsetů, iter_jsonl od offsetu
+pokračuje.
+"""
+
+import gzip
+import json
+import os
+import sys
+from array import array
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterator, Optional
+
+_intern = sys.intern
+
+
+@dataclass(frozen=True, slots=True)
+class Link:
+    """Odkaz ke stažení jednoho formátu knihy."""
+
+    url: str
+    format: str
+    ext: str
+    label: str = ""
+
+    @classmethod
+    def create(cls, url: str, format: str, ext: str, label: str = "") -> "Link":
+        return cls(url, _intern(format), _intern(ext), _intern(label))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Link":
+        return cls.create(data["url"], data.get("format", ""), data.get("ext", ""),
+                          data.get("label") or "")
+
+    def to_dict(self) -> dict:
+        return {"url": self.url, "format": self.format, "ext": self.ext, "label": self.label}
+
+
+@dataclass(frozen=True, slots=True)
+class Book:
+    """Kniha z MLP. `slug` je None, dokud ho nedoplní volající skript."""
+
+    mlp_id: Optional[str]
+    title: str
+    author: Optional[str] = None
+    description: Optional[str] = None
+    year: Optional[int] = None
+    topics: tuple[str, ...] = ()
+    cover_url: Optional[str] = None
+    links: tuple[Link, ...] = ()        # jen EPUB, PDF, PRC, MOBI
+    all_links: tuple[Link, ...] = ()    # kompletní seznam pro referenci
+    slug: Optional[str] = None
+
+    def with_slug(self, slug: str) -> "Book":
+        return replace(self, slug=slug)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Book":
+        """Kniha z JSON layoutu scraperu; `links` sdílí instance s `allLinks`."""
+        all_links = tuple(Link.from_dict(d) for d in data.get("allLinks") or ())
+        shared = {link: link for link in all_links}
+        links = tuple(shared.get(link, link)
+                      for link in map(Link.from_dict, data.get("links") or ()))
+        return cls(
+            mlp_id=data.get("mlpId"),
+            title=data.get("title") or "",
+            author=data.get("author"),
+            description=data.get("description"),
+            year=data.get("year"),
+            topics=tuple(data.get("topics") or ()),
+            cover_url=data.get("coverUrl"),
+            links=links,
+            all_links=all_links,
+            slug=data.get("slug"),
+        )
+
+    def to_dict(self, slug: bool = True) -> dict:
+        """JSON layout scraperu (slug hned za názvem, pokud je a `slug`=True)."""
+        data = {"mlpId": self.mlp_id, "title": self.title}
+        if slug and self.slug is not None:
+            data["slug"] = self.slug
+        data.update({
+            "author": self.author,
+            "description": self.description,
+            "year": self.year,
+            "topics": list(self.topics),
+            "coverUrl": self.cover_url,
+            "links": [link.to_dict() for link in self.links],
+            "allLinks": [link.to_dict() for link in self.all_links],
+        })
+        return data
+
+    def link_dicts(self) -> list[dict]:
+        """Prioritní odkazy jako seznam dictů (pole externalLinks ve Strapi)."""
+        return [link.to_dict() for link in self.links]
+
+
+# BookWriter: po kolika knihách flushnout soubor na disk
+FLUSH_EVERY = 100
+
+
+def book_format(path) -> str:
+    """Formát souboru knih podle přípony: "jsonl" (.jsonl, .jsonl.gz) nebo "json"."""
+    name = str(path)
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "jsonl" if name.endswith(".jsonl") else "json"
+
+
+def open_books(path, mode: str = "r"):
+    """Otevře soubor knih jako text (UTF-8); přípona .gz znamená gzip."""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _open_binary(path):
+    return gzip.open(path, "rb") if str(path).endswith(".gz") else open(path, "rb")
+
+
+def iter_books(path) -> Iterator[Book]:
+    """Knihy ze souboru postupně – JSONL čte po řádcích, JSON pole celé."""
+    if book_format(path) == "jsonl":
+        for book, _ in iter_jsonl(path):
+            yield book
+        return
+    with open_books(path) as f:
+        yield from map(Book.from_dict, json.load(f))
+
+
+def iter_jsonl(path, offset: int = 0) -> Iterator[tuple[Book, int]]:
+    """
+    Knihy z JSONL souboru od bajtu `offset` (začátek řádku, viz book_offsets).
+    Ke každé knize vrací offset následujícího řádku – od něj se dá navázat.
+    U .gz jde o offset v rozbaleném proudu (seek pak soubor jen rozbalí,
+    JSON předchozích knih se neparsuje).
+    """
+    with _open_binary(path) as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            if line.strip():
+                yield Book.from_dict(json.loads(line)), offset
+
+
+# Sidecar index JSONL souboru: <soubor>.idx = pole uint64
+# [velikost souboru, mtime_ns, offset knihy 0, offset knihy 1, …]
+_INDEX_SUFFIX = ".idx"
+
+
+def _file_key(path) -> list[int]:
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def book_offsets(path) -> array:
+    """
+    Bajtové offsety začátků knih v JSONL souboru. Načte je ze sidecar
+    indexu <soubor>.idx; chybí-li nebo se soubor od té doby změnil, projde
+    soubor jednou po řádcích (bez parsování JSON) a index zapíše.
+    """
+    key = _file_key(path)
+    index_file = Path(str(path) + _INDEX_SUFFIX)
+    offsets = array("Q")
+    try:
+        offsets.frombytes(index_file.read_bytes())
+        if offsets[:2].tolist() == key:
+            return offsets[2:]
+    except (OSError, ValueError):
+        pass
+
+    offsets = array("Q", key)
+    pos = 0
+    with _open_binary(path) as f:
+        for line in f:
+            if line.strip():
+                offsets.append(pos)
+            pos += len(line)
+    try:
+        tmp = index_file.with_name(index_file.name + ".tmp")
+        tmp.write_bytes(offsets.tobytes())
+        os.replace(tmp, index_file)
+    except OSError as e:
+        print(f"  ⚠ Index {index_file} nelze uložit ({e}) – použiji ho jen v paměti")
+    return offsets[2:]
+
+
+def load_books(path) -> list[Book]:
+    """Načte soubor knih (výstup scraperu; JSON, JSONL, případně .gz)."""
+    return list(iter_books(path))
+
+
+class BookWriter:
+    """
+    Průběžný zápis knih – každá kniha se zapíše hned po zparsování,
+    v paměti nezůstává nic. Na disk se soubor flushne každých
+    `flush_every` knih (u .gz je každý flush sync flush, který zhoršuje
+    kompresi), takže pád přijde nejvýš o posledních `flush_every` knih.
+    Formát "json" je pole odsazené jako json.dump(indent=2), "jsonl"
+    jedna kniha na řádek. Soubor s příponou .gz se komprimuje.
+    """
+
+    def __init__(self, path, format: Optional[str] = None, indent: int = 2,
+                 flush_every: int = FLUSH_EVERY):
+        self.format = format or book_format(path)
+        self.pad = " " * indent
+        self.indent = indent
+        self.flush_every = max(1, flush_every)
+        self.count = 0
+        self.f = open_books(path, "w")
+
+    def __enter__(self) -> "BookWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, book: Book) -> None:
+        data = book.to_dict()
+        if self.format == "jsonl":
+            self.f.write(json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n")
+        else:
+            item = json.dumps(data, ensure_ascii=False, indent=self.indent)
+            self.f.write(("[\n" if not self.count else ",\n")
+                         + self.pad + item.replace("\n", "\n" + self.pad))
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.f.flush()
+
+    def close(self) -> None:
+        if self.f.closed:
+            return
+        if self.format == "json":
+            self.f.write("\n]" if self.count else "[]")
+        self.f.close()
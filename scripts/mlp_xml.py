@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+MLP XML backend
+===============
+Vrstva nad XML parserem pro OAI-PMH/MARC21: s nainstalovaným lxml
+(`pip install lxml`) parsuje stránky lxml – iterparse v C s filtrem tagů
+a předkompilované XPath dotazy místo skládání cest při každém volání –,
+jinak použije standardní xml.etree.ElementTree. Výstup (knihy) je pro oba
+backendy stejný, ověřuje to `python3 mlp_bench.py --check`.
+
+Volba backendu:
+    MLP_XML_BACKEND=lxml | etree    # vynutit (výchozí: lxml, je-li k dispozici)
+    mlp_xml.use("etree")            # přepnout za běhu (benchmark, kontrola)
+
+Funkce find/findtext/tostring poznají backend podle elementu, takže se dají
+míchat – např. záznam z GetRecord parsovaný přes ET.fromstring.
+"""
+
+import os
+import xml.etree.ElementTree as ET
+from typing import Iterable, Iterator, Optional
+
+try:
+    from lxml import etree as _lxml
+except ImportError:      # lxml je volitelné
+    _lxml = None
+
+# XML namespaces
+NS_OAI = "http://www.openarchives.org/OAI/2.0/"
+NS_MARC = "http://www.loc.gov/MARC21/slim"
+
+# Dotazy používané parserem: klíč → (ElementPath pro ET, XPath pro lxml).
+# XPath míří na obvyklé místo v OAI odpovědi; když nic nenajde, použije se
+# i u lxml ElementPath, takže výsledek je vždy stejný jako u ET.
+_QUERIES = {
+    "header":     (f"{{{NS_OAI}}}header",       "oai:header"),
+    "identifier": (f"{{{NS_OAI}}}identifier",   "oai:identifier"),
+    "datestamp":  (f"{{{NS_OAI}}}datestamp",    "oai:datestamp"),
+    "marc":       (f".//{{{NS_MARC}}}record",   "oai:metadata/marc:record"),
+}
+
+if _lxml is not None:
+    _XPATH = {key: _lxml.XPath(f"({xpath})[1]", namespaces={"oai": NS_OAI, "marc": NS_MARC},
+                               smart_strings=False)
+              for key, (_, xpath) in _QUERIES.items()}
+    ParseError = (ET.ParseError, _lxml.XMLSyntaxError)
+else:
+    _XPATH = {}
+    ParseError = (ET.ParseError,)
+
+BACKENDS = ("lxml", "etree") if _lxml is not None else ("etree",)
+
+
+def _default_backend() -> str:
+    wanted = os.getenv("MLP_XML_BACKEND", "").strip().lower()
+    if wanted == "lxml" and _lxml is None:
+        print("  ⚠ MLP_XML_BACKEND=lxml, ale lxml není nainstalované – používám etree",
+              flush=True)
+        return "etree"
+    if wanted in BACKENDS:
+        return wanted
+    return BACKENDS[0]
+
+
+BACKEND = _default_backend()
+
+
+def use(backend: str) -> None:
+    """Přepne backend pro další parsování ("lxml" nebo "etree")."""
+    global BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"XML backend '{backend}' není k dispozici (k dispozici: {BACKENDS})")
+    BACKEND = backend
+
+
+def _is_lxml(el) -> bool:
+    return _lxml is not None and not isinstance(el, ET.Element)
+
+
+def iterparse(source, tags: Iterable[str], containers: Iterable[str] = ()) -> Iterator[tuple]:
+    """
+    Průběžně parsuje `source` a vrací (element, rodič) po uzavření každého
+    elementu s tagem z `tags`. Rodiče zná lxml přímo; u ElementTree je to
+    poslední otevřený element z `containers` (stačí pro uvolňování záznamů).
+    """
+    tags = set(tags)
+    if BACKEND == "lxml":
+        for _, el in _lxml.iterparse(source, events=("end",), tag=tags,
+                                     resolve_entities=False, no_network=True):
+            yield el, el.getparent()
+        return
+
+    containers = set(containers)
+    container = None
+    for event, el in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if el.tag in containers:
+                container = el
+        elif el.tag in tags:
+            yield el, container
+
+
+def release(el, parent) -> None:
+    """Uvolní zpracovaný element (paměť zůstává konstantní i u velkých stránek)."""
+    el.clear()
+    if parent is not None:
+        parent.remove(el)
+
+
+_DATAFIELD = f"{{{NS_MARC}}}datafield"
+if _lxml is not None:
+    _XPATH_DATAFIELDS = _lxml.XPath(".//marc:datafield", namespaces={"marc": NS_MARC})
+
+
+def datafields(record, tags: Optional[frozenset] = None) -> list:
+    """
+    MARC21 datafieldy záznamu (jen s tagem z `tags`, je-li zadán) v pořadí
+    dokumentu. U lxml je vybere předkompilovaný XPath (predikát na @tag
+    je v lxml pomalejší než filtr v Pythonu).
+    """
+    fields = _XPATH_DATAFIELDS(record) if _is_lxml(record) else record.iter(_DATAFIELD)
+    if tags:
+        return [field for field in fields if field.get("tag") in tags]
+    return list(fields)
+
+
+def find(el, query: str):
+    """První element pro dotaz z _QUERIES ("header", "marc", ...) nebo None."""
+    if _is_lxml(el):
+        found = _XPATH[query](el)
+        if found:
+            return found[0]
+    return el.find(_QUERIES[query][0])
+
+
+def findtext(el, query: str) -> Optional[str]:
+    found = find(el, query)
+    return None if found is None else (found.text or "")
+
+
+def tostring(el) -> str:
+    """Element jako XML řetězec (unicode)."""
+    if _is_lxml(el):
+        return _lxml.tostring(el, encoding="unicode")
+    return ET.tostring(el, encoding="unicode")
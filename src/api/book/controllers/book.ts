@@ -1,5 +1,25 @@
 import { factories } from '@strapi/strapi';
 
+// Kolekce, do kterých smí psát hromadný zápis (POST /api/books/bulk)
+const BULK_UIDS: Record<string, any> = {
+  books: 'api::book.book',
+  authors: 'api::author.author',
+  categories: 'api::category.category',
+};
+
+// Nejvýš dokumentů v jednom požadavku (všechny v jedné transakci)
+const BULK_MAX = 100;
+
+// Chyba položky ve stejném tvaru jako error v odpovědi REST API
+function bulkError(err: any) {
+  return {
+    status: err?.status ?? 400,
+    name: err?.name ?? 'Error',
+    message: err?.message ?? String(err),
+    details: err?.details ?? {},
+  };
+}
+
 export default factories.createCoreController('api::book.book', ({ strapi }) => ({
   async incrementDownload(ctx) {
     const { id } = ctx.params;
@@ -22,4 +42,88 @@ export default factories.createCoreController('api::book.book', ({ strapi }) =>
 
     ctx.body = { success: true };
   },
+
+  // POST /api/books/bulk?status=draft
+  // Body: { collection: 'books' | 'authors' | 'categories', data: [{ ...pole }, ...] }
+  // Položka s documentId dokument aktualizuje, ostatní se vytvoří. Vše běží
+  // v jedné transakci: při chybě se nezapíše nic a odpověď 400 označí vadnou
+  // položku ({ error }) a ostatní jako nezapsané ({ skipped: true }).
+  async bulkWrite(ctx) {
+    const { collection = 'books', data } = ctx.request.body as {
+      collection?: string;
+      data?: Record<string, unknown>[];
+    };
+
+    const uid = BULK_UIDS[collection];
+    if (!uid) {
+      return ctx.badRequest(`Neznámá kolekce '${collection}'`);
+    }
+    if (!Array.isArray(data) || data.length === 0) {
+      return ctx.badRequest('data musí být neprázdné pole');
+    }
+    if (data.length > BULK_MAX) {
+      return ctx.badRequest(`Nejvýš ${BULK_MAX} dokumentů v jednom požadavku`);
+    }
+
+    // Oprávnění k book.bulkWrite nestačí – token musí smět v cílové kolekci
+    // i běžný create/update (stejná kontrola jako u POST/PUT /api/<kolekce>)
+    const actions = new Set(data.map((item) => (item?.documentId ? 'update' : 'create')));
+    for (const action of actions) {
+      try {
+        await strapi.get('auth').verify(ctx.state.auth, { scope: [`${uid}.${action}`] });
+      } catch {
+        return ctx.forbidden(`Token nemá oprávnění ${uid}.${action}`);
+      }
+    }
+
+    const status = ctx.query.status === 'draft' ? 'draft' : 'published';
+    const schema = strapi.getModel(uid);
+    const results: any[] = data.map(() => ({ skipped: true }));
+    let failed = false;
+
+    try {
+      await strapi.db.transaction(async () => {
+        for (const [i, item] of data.entries()) {
+          const { documentId, ...fields } = item as { documentId?: string };
+          try {
+            const input = await strapi.contentAPI.sanitize.input(fields, schema, {
+              auth: ctx.state.auth,
+            });
+            const doc = documentId
+              ? await strapi.documents(uid).update({ documentId, data: input as any, status })
+              : await strapi.documents(uid).create({ data: input as any, status });
+            if (!doc) {
+              throw Object.assign(new Error(`Dokument ${documentId} nenalezen`), {
+                status: 404,
+                name: 'NotFoundError',
+              });
+            }
+            results[i] = { documentId: doc.documentId };
+          } catch (err) {
+            failed = true;
+            results[i] = { error: bulkError(err) };
+            throw err;
+          }
+        }
+      });
+    } catch (err) {
+      if (!failed) throw err;
+    }
+
+    if (failed) {
+      // Transakce se vrátila – nezapsané jsou i položky před chybou
+      ctx.status = 400;
+      ctx.body = {
+        data: results.map((r) => ('error' in r ? r : { skipped: true })),
+        error: {
+          status: 400,
+          name: 'BulkWriteError',
+          message: 'Hromadný zápis se nezdařil – nic nebylo zapsáno',
+        },
+      };
+      return;
+    }
+
+    ctx.body = { data: results };
+  },
 }));
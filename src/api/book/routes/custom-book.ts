@@ -9,5 +9,15 @@ export default {
         policies: [],
       },
     },
+    {
+      // Hromadný zápis pro importní skripty – vyžaduje API token s oprávněním
+      // bulkWrite a create/update v cílové kolekci (kontroluje controller)
+      method: 'POST',
+      path: '/books/bulk',
+      handler: 'book.bulkWrite',
+      config: {
+        policies: [],
+      },
+    },
   ],
 };